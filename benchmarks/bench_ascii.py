@@ -0,0 +1,86 @@
+"""
+TYPE A conversion benchmark: RETR/STOR data-path throughput over loopback
+with LF<->CRLF conversion (send_ascii/receive_ascii) against the raw
+buffered copy (_send_buffered/receive_file), on text with typical line
+lengths. "slowdown" is ascii time divided by raw time.
+
+    python benchmarks/bench_ascii.py --size 256M
+"""
+import argparse
+import io
+import json
+import os
+import random
+import socket
+import threading
+import time
+
+from common import REPO_ROOT  # noqa: F401  (puts the repo on sys.path)
+from bench_retr import parse_size
+from ftpserver.utils import transfer
+
+
+def make_text(size, crlf=False):
+    rng = random.Random(0)
+    words = [b"alpha", b"beta", b"gamma", b"delta", b"2026-10-18", b"INFO", b"GET", b"/api/v1/items", b"200"]
+    eol = b"\r\n" if crlf else b"\n"
+    lines = [b" ".join(rng.choice(words) for _ in range(rng.randrange(3, 15))) + eol for _ in range(50000)]
+    block = b"".join(lines)
+    return (block * (size // len(block) + 1))[:size]
+
+
+def timed_transfer(send, receive):
+    """Runs send(conn) and receive(conn) on the two ends of a loopback connection."""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+
+    def server():
+        conn, _ = listener.accept()
+        with conn:
+            receive(conn)
+
+    reader = threading.Thread(target=server)
+    reader.start()
+    start = time.perf_counter()
+    with socket.create_connection(listener.getsockname()) as conn:
+        send(conn)
+    reader.join()
+    listener.close()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=parse_size, default=parse_size("256M"))
+    args = parser.parse_args()
+
+    lf_text = make_text(args.size)
+    crlf_text = make_text(args.size, crlf=True)
+    with open(os.devnull, "wb") as sink:
+        def drain(conn):
+            transfer.receive_file(conn, sink)
+
+        raw = timed_transfer(
+            lambda c: transfer._send_buffered(c, io.BytesIO(lf_text), 0, None, transfer.TRANSFER_BUFFER_SIZE),
+            drain)
+        converted = timed_transfer(lambda c: transfer.send_ascii(c, io.BytesIO(lf_text)), drain)
+        results = [_row("retr (LF to CRLF)", args.size, raw, converted)]
+
+        raw = timed_transfer(lambda c: c.sendall(crlf_text), drain)
+        converted = timed_transfer(lambda c: c.sendall(crlf_text), lambda c: transfer.receive_ascii(c, sink))
+        results.append(_row("stor (CRLF to LF)", args.size, raw, converted))
+    print(json.dumps(results, indent=2))
+
+
+def _row(name, size, raw, converted):
+    return {
+        "path": name,
+        "raw_mb_per_s": round(size / raw / (1 << 20), 1),
+        "ascii_mb_per_s": round(size / converted / (1 << 20), 1),
+        "slowdown": round(converted / raw, 2),
+    }
+
+
+if __name__ == "__main__":
+    main()
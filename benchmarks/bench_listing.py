@@ -0,0 +1,84 @@
+"""
+LS-L on huge directories: time-to-first-byte, total time and peak Python
+memory for the inline (control connection) rendering against the streamed
+scandir listing over a data connection.
+
+    python benchmarks/bench_listing.py --entries 10000 100000 500000
+"""
+import argparse
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from common import REPO_ROOT  # noqa: F401  (puts the repo on sys.path)
+from ftpserver.commands.directory_ops import LsLongCommand, iter_long_listing
+from ftpserver.utils.transfer import send_lines
+
+
+def populate(directory, count):
+    for i in range(count):
+        open(os.path.join(directory, f"file-{i:07d}.dat"), "wb").close()
+
+
+def _first_byte(sock, result):
+    start = time.perf_counter()
+    first = None
+    total = 0
+    while True:
+        data = sock.recv(1 << 20)
+        if not data:
+            break
+        if first is None:
+            first = time.perf_counter() - start
+        total += len(data)
+    result.update(ttfb=first, bytes=total)
+
+
+def measure(directory, method):
+    a, b = socket.socketpair()
+    result = {}
+    reader = threading.Thread(target=_first_byte, args=(b, result))
+    tracemalloc.start()
+    reader.start()
+    start = time.perf_counter()
+    with a:
+        if method == "inline":
+            a.sendall(LsLongCommand.render(directory).encode())
+        else:
+            send_lines(a, iter_long_listing(directory))
+    reader.join()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    b.close()
+    return {
+        "method": method,
+        "ttfb_ms": round(result["ttfb"] * 1000, 2),
+        "seconds": round(elapsed, 3),
+        "peak_python_mb": round(peak / (1 << 20), 2),
+        "bytes": result["bytes"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dir", default=None)
+    args = parser.parse_args()
+    results = []
+    for count in args.entries:
+        with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+            populate(tmp, count)
+            for method in ("inline", "streamed"):
+                row = {"entries": count}
+                row.update(measure(tmp, method))
+                results.append(row)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+MODE Z benchmark: effective throughput (uncompressed bytes per second),
+compression ratio and CPU seconds per GB for each deflate level, sending a
+log-like file over loopback through send_deflated and receive_inflated.
+"raw" is the uncompressed send_file path for comparison.
+
+Each case runs in a fresh child process so its CPU time is its own.
+
+    python benchmarks/bench_modez.py --size 256M --levels 0 1 6 9
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+
+from common import REPO_ROOT  # noqa: F401  (puts the repo on sys.path)
+from bench_retr import parse_size
+from ftpserver.utils import transfer
+
+
+def make_log_file(directory, size):
+    """Writes access-log style lines, which compress roughly 10:1 like real logs."""
+    rng = random.Random(0)
+    paths = ["/", "/index.html", "/api/v1/items", "/static/app.js", "/login", "/files/report.csv"]
+    agents = ["curl/8.5.0", "Mozilla/5.0 (X11; Linux x86_64)", "python-requests/2.31"]
+    lines = []
+    for i in range(20000):
+        lines.append(
+            f"10.0.{rng.randrange(256)}.{rng.randrange(256)} - - [18/Oct/2026:10:{i // 600 % 60:02d}:{i // 10 % 60:02d} +0000] "
+            f"\"GET {rng.choice(paths)}?id={rng.randrange(100000)} HTTP/1.1\" {rng.choice((200, 200, 200, 304, 404))} "
+            f"{rng.randrange(100, 50000)} \"-\" \"{rng.choice(agents)}\"\n"
+        )
+    block = "".join(lines).encode()
+    path = os.path.join(directory, f"access-{size}.log")
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining:
+            n = min(remaining, len(block))
+            f.write(block[:n])
+            remaining -= n
+    return path
+
+
+def _receive(listener, level, result):
+    conn, _ = listener.accept()
+    with conn, open(os.devnull, "wb") as out:
+        if level is None:
+            result.append(transfer.receive_file(conn, out))
+        else:
+            result.append(transfer.receive_inflated(conn, out))
+
+
+def run_case(path, level, queue):
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    received = []
+    reader = threading.Thread(target=_receive, args=(listener, level, received))
+    reader.start()
+    conn = socket.create_connection(listener.getsockname())
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    with conn, open(path, "rb") as f:
+        if level is None:
+            wire = transfer.send_file(conn, f)
+        else:
+            wire = transfer.send_deflated(conn, f, level)
+    reader.join()
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    listener.close()
+    size = received[0]
+    queue.put({
+        "bytes": size,
+        "wire_bytes": wire,
+        "ratio": round(size / wire, 2) if wire else None,
+        "seconds": round(elapsed, 4),
+        "effective_mb_per_s": round(size / elapsed / (1 << 20), 1),
+        "cpu_s_per_gb": round(cpu / (size / (1 << 30)), 2),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=parse_size, default=parse_size("256M"))
+    parser.add_argument("--levels", nargs="+", default=["raw", "0", "1", "3", "6", "9"],
+                        help='zlib levels to run; "raw" is the uncompressed path')
+    parser.add_argument("--dir", default=None, help="where to create the test file")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("fork")
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        path = make_log_file(tmp, args.size)
+        for level_text in args.levels:
+            level = None if level_text == "raw" else int(level_text)
+            queue = ctx.Queue()
+            proc = ctx.Process(target=run_case, args=(path, level, queue))
+            proc.start()
+            proc.join()
+            row = {"level": level_text}
+            row.update(queue.get() if proc.exitcode == 0 else {"error": f"exit code {proc.exitcode}"})
+            results.append(row)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
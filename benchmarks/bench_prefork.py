@@ -0,0 +1,104 @@
+"""
+Pre-fork scaling: login rate (bcrypt-bound) and MODE Z RETR throughput
+(zlib-bound) against the number of server worker processes.
+
+Clients run in their own processes so the load generator is not limited by
+one GIL either. On a machine with fewer cores than workers the numbers stay
+flat; that is expected.
+
+    python benchmarks/bench_prefork.py --processes 1 2 4 8 --clients 16
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+from common import free_port, start_server, stop_server
+from bench_retr import parse_size
+from ftpserver.client.ftp_client import FTPClient
+
+
+def _logins(port, user, password, count, queue):
+    for _ in range(count):
+        with FTPClient("127.0.0.1", port) as client:
+            client.login(user, password)
+    queue.put(count)
+
+
+def _downloads(port, user, password, count, queue):
+    received = 0
+    with FTPClient("127.0.0.1", port) as client:
+        client.login(user, password)
+        client.command("MODE Z")
+        for _ in range(count):
+            data_sock = client.pasv()
+            with data_sock:
+                client.sock.sendall(b"RETR bench.log\r\n")
+                while True:
+                    chunk = data_sock.recv(1 << 20)
+                    if not chunk:
+                        break
+                    received += len(chunk)
+            client.read_reply()
+    queue.put(received)
+
+
+def run_clients(target, clients, args):
+    queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=target, args=(*args, queue)) for _ in range(clients)]
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    results = [queue.get() for _ in procs]
+    elapsed = time.perf_counter() - start
+    for proc in procs:
+        proc.join()
+    return results, elapsed
+
+
+def make_log(path, size):
+    line = b"10.0.0.1 - - [18/Oct/2026:10:00:00 +0000] \"GET /api/v1/items?id=%d HTTP/1.1\" 200 512\n"
+    with open(path, "wb") as f:
+        written = i = 0
+        while written < size:
+            chunk = b"".join(line % (i + k) for k in range(1000))
+            f.write(chunk)
+            written += len(chunk)
+            i += 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=8, help="logins per client")
+    parser.add_argument("--downloads", type=int, default=4, help="MODE Z downloads per client")
+    parser.add_argument("--file-size", type=parse_size, default=parse_size("16M"))
+    parser.add_argument("--user", default="admin")
+    parser.add_argument("--password", default="123")
+    args = parser.parse_args()
+
+    results = []
+    for processes in args.processes:
+        port = free_port()
+        proc, workdir = start_server(port, "--processes", str(processes), "--max-per-ip", "0")
+        try:
+            make_log(os.path.join(workdir, "server_files", "users", "bench.log"), args.file_size)
+            counts, elapsed = run_clients(_logins, args.clients, (port, args.user, args.password, args.logins))
+            logins_per_s = sum(counts) / elapsed
+            sizes, elapsed = run_clients(_downloads, args.clients, (port, args.user, args.password, args.downloads))
+            served = args.file_size * args.clients * args.downloads
+            results.append({
+                "processes": processes,
+                "logins_per_s": round(logins_per_s, 1),
+                "retr_mode_z_mb_per_s": round(served / elapsed / (1 << 20), 1),
+                "wire_mb": round(sum(sizes) / (1 << 20), 1),
+            })
+        finally:
+            stop_server(proc)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
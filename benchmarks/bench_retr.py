@@ -0,0 +1,123 @@
+"""
+RETR send-path benchmark: whole-file read + sendall (the old RetrCommand)
+against the streaming send_file path, over a loopback TCP connection.
+
+Each case runs in a fresh child process so its peak RSS is its own.
+
+    python benchmarks/bench_retr.py --sizes 1M 100M 2G
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import socket
+import tempfile
+import threading
+import time
+
+from common import REPO_ROOT  # noqa: F401  (puts the repo on sys.path)
+from ftpserver.utils import transfer
+
+UNITS = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def parse_size(text):
+    text = text.upper()
+    if text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def make_file(directory, size):
+    path = os.path.join(directory, f"retr-{size}.bin")
+    block = os.urandom(1 << 20)
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining:
+            n = min(remaining, len(block))
+            f.write(block[:n])
+            remaining -= n
+    return path
+
+
+def _drain(listener, result):
+    conn, _ = listener.accept()
+    total = 0
+    buf = bytearray(1 << 20)
+    with conn:
+        while True:
+            n = conn.recv_into(buf)
+            if not n:
+                break
+            total += n
+    result.append(total)
+
+
+def legacy_send(conn, path):
+    with open(path, "rb") as f:
+        data = f.read()
+        conn.sendall(data)
+
+
+def streaming_send(conn, path, buffer_size=None, zero_copy=True):
+    with open(path, "rb") as f:
+        if zero_copy:
+            transfer.send_file(conn, f, buffer_size=buffer_size)
+        else:
+            transfer._send_buffered(conn, f, 0, None, buffer_size or transfer.TRANSFER_BUFFER_SIZE)
+
+
+def run_case(method, path, buffer_size, queue):
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    received = []
+    reader = threading.Thread(target=_drain, args=(listener, received))
+    reader.start()
+    conn = socket.create_connection(listener.getsockname())
+    start = time.perf_counter()
+    with conn:
+        if method == "legacy":
+            legacy_send(conn, path)
+        else:
+            streaming_send(conn, path, buffer_size, zero_copy=(method == "sendfile"))
+    reader.join()
+    elapsed = time.perf_counter() - start
+    listener.close()
+    queue.put({
+        "bytes": received[0],
+        "seconds": round(elapsed, 4),
+        "mb_per_s": round(received[0] / elapsed / (1 << 20), 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["1M", "100M", "2G"])
+    parser.add_argument("--buffer-size", type=parse_size, default=transfer.TRANSFER_BUFFER_SIZE)
+    parser.add_argument("--methods", nargs="+", default=["legacy", "buffered", "sendfile"])
+    parser.add_argument("--dir", default=None, help="where to create the test files")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("fork")
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        for size_text in args.sizes:
+            size = parse_size(size_text)
+            path = make_file(tmp, size)
+            for method in args.methods:
+                queue = ctx.Queue()
+                proc = ctx.Process(target=run_case, args=(method, path, args.buffer_size, queue))
+                proc.start()
+                proc.join()
+                row = {"size": size_text, "method": method}
+                row.update(queue.get() if proc.exitcode == 0 else {"error": f"exit code {proc.exitcode}"})
+                results.append(row)
+            os.remove(path)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Idle control-connection load test.
+
+Opens N idle sessions against the threaded and the asyncio server and reports
+how many were accepted (greeted with 220) and how many refused, plus the
+server's RSS and thread count per accepted session.
+
+    python benchmarks/bench_sessions.py --connections 2000
+"""
+import argparse
+import json
+import socket
+import time
+
+from common import (raise_fd_limit, free_port, start_server, stop_server,
+                    rss_kb, thread_count)
+
+
+def measure(mode, connections):
+    port = free_port()
+    proc, _ = start_server(port, "--mode", mode, "--max-per-ip", "0", "--max-sessions", "0")
+    try:
+        time.sleep(0.2)
+        base_rss = rss_kb(proc.pid)
+        base_threads = thread_count(proc.pid)
+        socks = []
+        refused = 0
+        for _ in range(connections):
+            try:
+                s = socket.create_connection(('127.0.0.1', port), timeout=5)
+            except OSError:
+                break
+            try:
+                greeting = s.recv(64)
+            except OSError:
+                greeting = b""
+            if greeting.startswith(b"220"):
+                socks.append(s)
+            else:
+                s.close()
+                refused += 1
+        time.sleep(0.5)
+        # Sessions must still answer once they are all open.
+        for s in socks[:: max(1, len(socks) // 20)]:
+            s.sendall(b"NOOP\r\n")
+            s.recv(64)
+        rss = rss_kb(proc.pid)
+        threads = thread_count(proc.pid)
+        for s in socks:
+            s.close()
+        opened = len(socks)
+        return {
+            "mode": mode,
+            "connections": opened,
+            "refused": refused,
+            "rss_kb": rss,
+            "rss_kb_per_session": round((rss - base_rss) / opened, 2) if opened else None,
+            "threads": threads,
+            "threads_per_session": round((threads - base_threads) / opened, 3) if opened else None,
+        }
+    finally:
+        stop_server(proc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--modes", nargs="+", default=["threaded", "asyncio"])
+    args = parser.parse_args()
+    raise_fd_limit()
+    print(json.dumps([measure(mode, args.connections) for mode in args.modes], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+STOR receive-path benchmark: the old recv(1024) + write loop against the
+recv_into/atomic_upload path at several buffer sizes, over loopback TCP.
+
+    python benchmarks/bench_stor.py --size 1G --buffers 64K 256K 1M
+"""
+import argparse
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from common import REPO_ROOT  # noqa: F401  (puts the repo on sys.path)
+from bench_retr import parse_size
+from ftpserver.utils import transfer
+
+
+def _send(listener, size):
+    conn, _ = listener.accept()
+    block = memoryview(os.urandom(1 << 20))
+    with conn:
+        remaining = size
+        while remaining:
+            n = min(remaining, len(block))
+            conn.sendall(block[:n])
+            remaining -= n
+
+
+def legacy_receive(conn, path):
+    with open(path, 'wb') as f:
+        while True:
+            data = conn.recv(1024)
+            if not data:
+                break
+            f.write(data)
+
+
+def streaming_receive(conn, path, buffer_size, allocate):
+    with transfer.atomic_upload(path, allocate) as f:
+        transfer.receive_file(conn, f, buffer_size)
+
+
+def run_case(directory, size, method, buffer_size, preallocate):
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    sender = threading.Thread(target=_send, args=(listener, size))
+    sender.start()
+    path = os.path.join(directory, "upload.bin")
+    start = time.perf_counter()
+    with socket.create_connection(listener.getsockname()) as conn:
+        if method == "legacy":
+            legacy_receive(conn, path)
+        else:
+            streaming_receive(conn, path, buffer_size, size if preallocate else None)
+    elapsed = time.perf_counter() - start
+    sender.join()
+    listener.close()
+    assert os.path.getsize(path) == size
+    os.remove(path)
+    return round(size / elapsed / (1 << 20), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=parse_size, default=parse_size("512M"))
+    parser.add_argument("--buffers", nargs="+", default=["64K", "256K", "1M"])
+    parser.add_argument("--dir", default=None, help="where to write the uploads")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        results.append({"method": "legacy", "buffer": "1K",
+                        "mb_per_s": run_case(tmp, args.size, "legacy", 1024, False)})
+        for buffer_text in args.buffers:
+            for preallocate in (False, True):
+                results.append({
+                    "method": "recv_into",
+                    "buffer": buffer_text,
+                    "preallocate": preallocate,
+                    "mb_per_s": run_case(tmp, args.size, "recv_into", parse_size(buffer_text), preallocate),
+                })
+    print(json.dumps({"size": args.size, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
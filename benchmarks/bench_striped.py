@@ -0,0 +1,88 @@
+"""
+Striped RETR-RANGE download: aggregate throughput against stream count on a
+simulated long-fat link.
+
+Each data stream is made window-limited the way TCP is on a high-latency
+path: the client accepts at most --window bytes per --rtt-ms round trip,
+so a single stream tops out at window/RTT and more streams should scale
+aggregate throughput until the server or the loopback saturates.
+
+    python benchmarks/bench_striped.py --size 64M --streams 1 2 4 8 --rtt-ms 50
+"""
+import argparse
+import json
+import os
+import socket
+import tempfile
+import time
+
+from common import free_port, start_server, stop_server
+from bench_retr import parse_size
+from ftpserver.client.ftp_client import FTPClient
+from ftpserver.client.striped import striped_download
+
+
+def delayed_client(rtt, window):
+    class DelayedLinkClient(FTPClient):
+        def receive_into(self, data_sock, fd, offset, buffer_size=256 * 1024):
+            data_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, window)
+            buf = bytearray(window)
+            view = memoryview(buf)
+            received = 0
+            while True:
+                start = time.perf_counter()
+                got = 0
+                while got < window:
+                    n = data_sock.recv_into(view[got:])
+                    if not n:
+                        break
+                    got += n
+                os.pwrite(fd, view[:got], offset + received)
+                received += got
+                if got < window:
+                    return received
+                # Wait out the rest of the round trip before opening the window again.
+                remaining = rtt - (time.perf_counter() - start)
+                if remaining > 0:
+                    time.sleep(remaining)
+    return DelayedLinkClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=parse_size, default=parse_size("64M"))
+    parser.add_argument("--streams", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--rtt-ms", type=float, default=50.0)
+    parser.add_argument("--window", type=parse_size, default=parse_size("256K"))
+    parser.add_argument("--user", default="admin")
+    parser.add_argument("--password", default="123")
+    args = parser.parse_args()
+
+    port = free_port()
+    proc, workdir = start_server(port)
+    try:
+        jail = os.path.join(workdir, "server_files", "users")
+        with open(os.path.join(jail, "striped.bin"), "wb") as f:
+            f.write(os.urandom(args.size))
+        client_cls = delayed_client(args.rtt_ms / 1000, args.window)
+        results = []
+        with tempfile.TemporaryDirectory() as tmp:
+            local = os.path.join(tmp, "striped.bin")
+            for streams in args.streams:
+                start = time.perf_counter()
+                total = striped_download('127.0.0.1', port, args.user, args.password,
+                                         "striped.bin", local, streams, client_factory=client_cls)
+                elapsed = time.perf_counter() - start
+                results.append({
+                    "streams": streams,
+                    "bytes": total,
+                    "seconds": round(elapsed, 3),
+                    "mb_per_s": round(total / elapsed / (1 << 20), 2),
+                })
+        print(json.dumps({"rtt_ms": args.rtt_ms, "window": args.window, "results": results}, indent=2))
+    finally:
+        stop_server(proc)
+
+
+if __name__ == "__main__":
+    main()
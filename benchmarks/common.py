@@ -0,0 +1,102 @@
+"""
+Shared helpers for the benchmark scripts: launching a server in a child
+process with its own jail, and sampling that process from /proc.
+"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def raise_fd_limit():
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, *server_args, workdir=None):
+    """Runs `python -m ftpserver.core.server` in a child process and waits for it to listen."""
+    workdir = workdir or tempfile.mkdtemp(prefix="ftpbench-")
+    os.makedirs(os.path.join(workdir, "server_files", "users"), exist_ok=True)
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    code = (
+        "import resource, sys\n"
+        "s, h = resource.getrlimit(resource.RLIMIT_NOFILE)\n"
+        "resource.setrlimit(resource.RLIMIT_NOFILE, (h, h))\n"
+        "from ftpserver.core.server import main\n"
+        "main(sys.argv[1:])\n"
+    )
+    cmd = [sys.executable, "-c", code, "--host", "127.0.0.1", "--port", str(port), *server_args]
+    proc = subprocess.Popen(cmd, cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1) as s:
+                s.recv(64)
+            return proc, workdir
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def _proc_status(pid, field):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def process_tree(pid):
+    """pid and all of its descendants (pre-forked workers), from /proc."""
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def rss_kb(pid):
+    return _proc_status(pid, "VmRSS")
+
+
+def thread_count(pid):
+    return _proc_status(pid, "Threads")
+
+
+def cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    return (int(fields[11]) + int(fields[12])) / ticks
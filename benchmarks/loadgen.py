@@ -0,0 +1,304 @@
+"""
+Load generator: drives a real server on localhost with many client processes
+and reports, per scenario, p50/p99 latency, ops/s, MB/s and the server's CPU
+time and peak RSS (summed over pre-forked workers) as JSON.
+
+Scenarios:
+  login     connect, USER/PASS, QUIT per op (bcrypt-bound)
+  metadata  CD, LS, STAT and PWD on one logged-in session per client
+  small     STOR then RETR of small files, one transfer per op
+  large     RETR of one large file, one whole file per op
+
+    python benchmarks/loadgen.py --clients 16 --duration 10 --output run.json
+    python benchmarks/loadgen.py --mode asyncio --baseline run.json
+
+With --baseline the run is compared against an earlier JSON report and the
+script exits with status 1 if ops/s dropped or p99 latency grew by more than
+--tolerance.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+from common import free_port, start_server, stop_server, process_tree, rss_kb, cpu_seconds
+from bench_retr import parse_size
+from ftpserver.client.ftp_client import FTPClient, FTPClientError
+
+SCENARIOS = ("login", "metadata", "small", "large")
+NOOP_REPLY = "200 NOOP command successful."
+META_DIR = "bench-meta"
+LARGE_FILE = "bench-large.bin"
+
+
+def framed(client, line):
+    """
+    Sends a command followed by NOOP and returns the reply lines before the
+    NOOP reply, since multi-line replies (LS, STAT) carry no end marker.
+    """
+    client.sock.sendall(line.encode() + b"\r\nNOOP\r\n")
+    lines = []
+    while True:
+        reply = client.read_reply()
+        if reply == NOOP_REPLY:
+            return lines
+        lines.append(reply)
+
+
+def drain(data_sock, buf):
+    received = 0
+    with data_sock:
+        while True:
+            n = data_sock.recv_into(buf)
+            if not n:
+                return received
+            received += n
+
+
+def retrieve(client, path, buf):
+    data_sock = client.pasv()
+    client.sock.sendall(f"RETR {path}\r\n".encode())
+    received = drain(data_sock, buf)
+    reply = client.read_reply()
+    if reply != "file sent":
+        raise FTPClientError(reply)
+    return received
+
+
+def store(client, path, payload):
+    data_sock = client.pasv()
+    with data_sock:
+        client.sock.sendall(f"STOR {path}\r\n".encode())
+        data_sock.sendall(payload)
+    reply = client.read_reply()
+    if reply != "file stored":
+        raise FTPClientError(reply)
+    return len(payload)
+
+
+# Each generator yields None once its session is set up, then the bytes moved
+# by each operation; only operations are timed.
+
+def login_ops(port, args, index):
+    yield None
+    while True:
+        with FTPClient("127.0.0.1", port) as client:
+            client.login(args.user, args.password)
+            client.command("QUIT")
+        yield 0
+
+
+def metadata_ops(port, args, index):
+    with FTPClient("127.0.0.1", port) as client:
+        client.login(args.user, args.password)
+        yield None
+        n = 0
+        while True:
+            for line in (f"CD {META_DIR}", "LS", f"STAT f{n % args.meta_files}.txt", "PWD", "CD .."):
+                replies = framed(client, line)
+                if replies and replies[0].startswith(("permission denied", "Invalid", "login required", "cd:")):
+                    raise FTPClientError(replies[0])
+                yield 0
+            n += 1
+
+
+def small_ops(port, args, index):
+    payload = os.urandom(args.small_size)
+    buf = bytearray(1 << 16)
+    with FTPClient("127.0.0.1", port) as client:
+        client.login(args.user, args.password)
+        yield None
+        n = 0
+        while True:
+            name = f"{META_DIR}/small-{index}-{n % 16}.bin"
+            yield store(client, name, payload)
+            yield retrieve(client, name, buf)
+            n += 1
+
+
+def large_ops(port, args, index):
+    buf = bytearray(1 << 20)
+    with FTPClient("127.0.0.1", port) as client:
+        client.login(args.user, args.password)
+        yield None
+        while True:
+            yield retrieve(client, LARGE_FILE, buf)
+
+
+OPS = {"login": login_ops, "metadata": metadata_ops, "small": small_ops, "large": large_ops}
+
+
+def client_process(scenario, port, args, index, start_at, queue):
+    latencies, moved, errors = [], 0, 0
+    deadline = start_at + args.duration
+    time.sleep(max(0.0, start_at - time.time()))
+    while time.time() < deadline:
+        ops = OPS[scenario](port, args, index)
+        try:
+            next(ops)
+            while time.time() < deadline:
+                started = time.perf_counter()
+                moved += next(ops)
+                latencies.append(time.perf_counter() - started)
+        except (OSError, FTPClientError):
+            errors += 1
+            time.sleep(0.01)  # Do not spin if the server keeps refusing us
+        finally:
+            ops.close()
+    queue.put((latencies, moved, errors))
+
+
+class ServerSampler:
+    """Tracks CPU seconds and peak RSS of the server and its workers while a scenario runs."""
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        rss = cpu = 0
+        for pid in process_tree(self.pid):
+            try:
+                rss += rss_kb(pid)
+                cpu += cpu_seconds(pid)
+            except OSError:
+                pass  # A worker exited between listing and reading it.
+        self.peak_rss_kb = max(self.peak_rss_kb, rss)
+        return cpu
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        self.cpu_start = self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.cpu_seconds = self._sample() - self.cpu_start
+        self.wall_seconds = time.monotonic() - self.started  # Includes operations still running at the deadline
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(p * (len(sorted_values) - 1))))]
+
+
+def run_scenario(scenario, port, server_pid, args):
+    queue = multiprocessing.Queue()
+    start_at = time.time() + 0.5
+    procs = [multiprocessing.Process(target=client_process, args=(scenario, port, args, i, start_at, queue))
+             for i in range(args.clients)]
+    for proc in procs:
+        proc.start()
+    time.sleep(max(0.0, start_at - time.time()))
+    with ServerSampler(server_pid) as sampler:
+        results = [queue.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    latencies = sorted(latency for result in results for latency in result[0])
+    moved = sum(result[1] for result in results)
+    elapsed = args.duration
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "scenario": scenario,
+        "clients": args.clients,
+        "ops": len(latencies),
+        "errors": sum(result[2] for result in results),
+        "ops_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "mb_per_s": round(moved / elapsed / (1 << 20), 2),
+        "server_cpu_s": round(sampler.cpu_seconds, 2),
+        "server_cpu_pct": round(sampler.cpu_seconds / sampler.wall_seconds * 100, 1),
+        "server_rss_peak_kb": sampler.peak_rss_kb,
+    }
+
+
+def prepare(workdir, args):
+    root = os.path.join(workdir, "server_files", "users")
+    meta = os.path.join(root, META_DIR)
+    os.makedirs(meta, exist_ok=True)
+    for i in range(args.meta_files):
+        with open(os.path.join(meta, f"f{i}.txt"), "wb") as f:
+            f.write(b"x" * 100)
+    if "large" in args.scenarios:
+        block = os.urandom(1 << 20)
+        with open(os.path.join(root, LARGE_FILE), "wb") as f:
+            remaining = args.large_size
+            while remaining:
+                f.write(block[:min(remaining, len(block))])
+                remaining -= min(remaining, len(block))
+
+
+def regressions(report, baseline, tolerance):
+    """Lines describing scenarios that got slower than the baseline by more than tolerance."""
+    before = {entry["scenario"]: entry for entry in baseline["scenarios"]}
+    found = []
+    for entry in report["scenarios"]:
+        old = before.get(entry["scenario"])
+        if not old:
+            continue
+        if old["ops_per_s"] and entry["ops_per_s"] < old["ops_per_s"] * (1 - tolerance):
+            found.append(f"{entry['scenario']}: ops/s {old['ops_per_s']} -> {entry['ops_per_s']}")
+        if old["p99_ms"] and entry["p99_ms"] and entry["p99_ms"] > old["p99_ms"] * (1 + tolerance):
+            found.append(f"{entry['scenario']}: p99 {old['p99_ms']}ms -> {entry['p99_ms']}ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--clients", type=int, default=8, help="client processes per scenario")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--mode", choices=("threaded", "asyncio"), default="threaded")
+    parser.add_argument("--processes", type=int, default=1, help="server worker processes")
+    parser.add_argument("--meta-files", type=int, default=200)
+    parser.add_argument("--small-size", type=parse_size, default=parse_size("4K"))
+    parser.add_argument("--large-size", type=parse_size, default=parse_size("64M"))
+    parser.add_argument("--user", default="admin")
+    parser.add_argument("--password", default="123")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    port = free_port()
+    proc, workdir = start_server(port, "--mode", args.mode, "--processes", str(args.processes),
+                                 "--max-per-ip", "0", "--audit-log", "")
+    try:
+        prepare(workdir, args)
+        scenarios = [run_scenario(scenario, port, proc.pid, args) for scenario in args.scenarios]
+    finally:
+        stop_server(proc)
+    report = {
+        "server": {"mode": args.mode, "processes": args.processes, "cpus": os.cpu_count(),
+                   "python": sys.version.split()[0], "hostname": socket.gethostname()},
+        "scenarios": scenarios,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if found else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import os
+import socket
+import tempfile
+from ftpserver.client.ftp_client import FTPClient, FTPClientError
+from ftpserver.utils.delta import (
+    DELTA_BLOCK_SIZE, Signature, encode_signature, file_signature,
+    generate_delta, read_delta_header, apply_delta,
+)
+
+
+def _recv_all(sock):
+    chunks = []
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            return b"".join(chunks)
+        chunks.append(data)
+
+
+class _CountingReader:
+    """Wraps a binary stream and counts the bytes read through it."""
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def read(self, n):
+        data = self.stream.read(n)
+        self.count += len(data)
+        return data
+
+
+def delta_download(client, remote, local):
+    """
+    Brings `local` up to date with `remote` using DELTA-RETR, transferring
+    only the blocks the local copy lacks. Returns the delta size in bytes.
+    """
+    base_path = local if os.path.exists(local) else os.devnull
+    if base_path == local:
+        signature = file_signature(local)
+    else:
+        signature = encode_signature([], DELTA_BLOCK_SIZE, 0, 0)
+    directory = os.path.dirname(os.path.abspath(local))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(local)}.", suffix=".part", dir=directory)
+    try:
+        os.fchmod(fd, os.stat(local).st_mode & 0o7777 if base_path == local else 0o644)
+        data_sock = client.pasv()
+        with data_sock, os.fdopen(fd, 'wb') as out, open(base_path, 'rb') as base:
+            client.sock.sendall(f"DELTA-RETR {remote}\r\n".encode())
+            data_sock.sendall(signature)
+            data_sock.shutdown(socket.SHUT_WR)
+            with data_sock.makefile('rb') as raw:
+                stream = _CountingReader(raw)
+                block_size, base_size, _ = read_delta_header(stream)
+                apply_delta(stream, base, out, block_size, base_size)
+        reply = client.read_reply()
+        if reply != "delta sent":
+            raise FTPClientError(reply)
+        os.replace(tmp_path, local)
+        return stream.count
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def delta_upload(client, local, remote):
+    """
+    Updates `remote` from `local` with DELTA-SIG and DELTA-STOR, sending
+    only the blocks the server copy lacks. Returns the delta size in bytes.
+    """
+    data_sock = client.pasv()
+    with data_sock:
+        client.sock.sendall(f"DELTA-SIG {remote}\r\n".encode())
+        signature = Signature(_recv_all(data_sock))
+    reply = client.read_reply()
+    if reply != "signature sent":
+        raise FTPClientError(reply)
+    sent = 0
+    data_sock = client.pasv()
+    with data_sock, open(local, 'rb') as f:
+        client.sock.sendall(f"DELTA-STOR {remote}\r\n".encode())
+        for chunk in generate_delta(f, signature):
+            data_sock.sendall(chunk)
+            sent += len(chunk)
+    reply = client.read_reply()
+    if reply != "file stored":
+        raise FTPClientError(reply)
+    return sent
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synchronize one file, transferring only changed blocks")
+    parser.add_argument("direction", choices=("get", "put"))
+    parser.add_argument("host")
+    parser.add_argument("port", type=int)
+    parser.add_argument("username")
+    parser.add_argument("password")
+    parser.add_argument("remote")
+    parser.add_argument("local")
+    args = parser.parse_args(argv)
+    with FTPClient(args.host, args.port) as client:
+        client.login(args.username, args.password)
+        if args.direction == "get":
+            total = delta_download(client, args.remote, args.local)
+        else:
+            total = delta_upload(client, args.local, args.remote)
+    print(f"{total} delta bytes transferred")
+
+
+if __name__ == "__main__":
+    main()
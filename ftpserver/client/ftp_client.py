@@ -0,0 +1,98 @@
+import os
+import socket
+
+
+class FTPClientError(Exception):
+    pass
+
+
+class FTPClient:
+    """
+    Minimal blocking client for this server's control protocol.
+    command() sends one line and returns one reply line, which covers the
+    login, PASV and transfer commands the helpers need.
+    """
+    def __init__(self, host, port, timeout=30):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.sock = None
+        self._rfile = None
+
+    def connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._rfile = self.sock.makefile('rb')
+        return self.read_reply()
+
+    def close(self):
+        if self._rfile:
+            self._rfile.close()
+        if self.sock:
+            self.sock.close()
+        self.sock = self._rfile = None
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read_reply(self):
+        line = self._rfile.readline()
+        if not line:
+            raise FTPClientError("connection closed by server")
+        return line.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    def command(self, line):
+        self.sock.sendall(line.encode() + b"\r\n")
+        return self.read_reply()
+
+    def login(self, username, password):
+        reply = self.command(f"USER {username}")
+        if "accepted" not in reply:
+            raise FTPClientError(reply)
+        reply = self.command(f"PASS {password}")
+        if "logged in" not in reply:
+            raise FTPClientError(reply)
+        return reply
+
+    def size(self, path):
+        reply = self.command(f"SIZE {path}")
+        if not reply.startswith("213"):
+            raise FTPClientError(reply)
+        return int(reply.split()[1])
+
+    def pasv(self):
+        """Enters passive mode and returns a connected data socket."""
+        reply = self.command("PASV")
+        if not reply.startswith("227"):
+            raise FTPClientError(reply)
+        nums = reply[reply.index('(') + 1:reply.index(')')].split(',')
+        host = '.'.join(nums[:4])
+        if host == '0.0.0.0':
+            host = self.host
+        port = (int(nums[4]) << 8) + int(nums[5])
+        return socket.create_connection((host, port), timeout=self.timeout)
+
+    def retrieve_range(self, path, offset, length, fd):
+        """Downloads `length` bytes at `offset` of a remote file into the same offset of fd."""
+        data_sock = self.pasv()
+        with data_sock:
+            self.sock.sendall(f"RETR-RANGE {path} {offset} {length}\r\n".encode())
+            received = self.receive_into(data_sock, fd, offset)
+        reply = self.read_reply()
+        if reply != "file sent":
+            raise FTPClientError(reply)
+        return received
+
+    def receive_into(self, data_sock, fd, offset, buffer_size=256 * 1024):
+        buf = bytearray(buffer_size)
+        view = memoryview(buf)
+        received = 0
+        while True:
+            n = data_sock.recv_into(buf)
+            if not n:
+                return received
+            os.pwrite(fd, view[:n], offset + received)
+            received += n
@@ -0,0 +1,71 @@
+"""
+Striped (multi-stream) download helper.
+
+Splits a remote file into N contiguous segments and fetches each over its
+own control session and data connection with RETR-RANGE, writing straight
+into the right offset of the local file. On long fat links this fills the
+pipe where a single TCP stream is window-limited.
+
+    python -m ftpserver.client.striped HOST PORT USER PASS remote.iso local.iso --streams 8
+"""
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from ftpserver.client.ftp_client import FTPClient
+
+
+def split_segments(size, streams):
+    """Returns [(offset, length), ...] covering size bytes in at most `streams` pieces."""
+    streams = max(1, min(streams, size)) if size else 1
+    base, extra = divmod(size, streams)
+    segments = []
+    offset = 0
+    for i in range(streams):
+        length = base + (1 if i < extra else 0)
+        segments.append((offset, length))
+        offset += length
+    return segments
+
+
+def striped_download(host, port, username, password, remote, local, streams=4,
+                     client_factory=FTPClient):
+    with client_factory(host, port) as client:
+        client.login(username, password)
+        size = client.size(remote)
+
+    def fetch(segment):
+        offset, length = segment
+        with client_factory(host, port) as client:
+            client.login(username, password)
+            received = client.retrieve_range(remote, offset, length, fd)
+        if received != length:
+            raise IOError(f"segment at {offset}: expected {length} bytes, got {received}")
+        return received
+
+    fd = os.open(local, os.O_WRONLY | os.O_CREAT, 0o666)
+    try:
+        os.ftruncate(fd, size)
+        segments = split_segments(size, streams)
+        with ThreadPoolExecutor(max_workers=len(segments)) as pool:
+            return sum(pool.map(fetch, segments))
+    finally:
+        os.close(fd)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download a file over several parallel streams")
+    parser.add_argument("host")
+    parser.add_argument("port", type=int)
+    parser.add_argument("username")
+    parser.add_argument("password")
+    parser.add_argument("remote")
+    parser.add_argument("local")
+    parser.add_argument("--streams", type=int, default=4)
+    args = parser.parse_args(argv)
+    total = striped_download(args.host, args.port, args.username, args.password,
+                             args.remote, args.local, args.streams)
+    print(f"{total} bytes received")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,21 +2,42 @@
 User Access Control (RBAC)
 -------------------------
 - All users are stored in users.json with roles and permissions.
+- users.json is cached in memory (UserStore) and reloaded only when the file changes.
 - Admins can add/remove users, set roles, and grant/revoke permissions.
 - Passwords are hashed using bcrypt.
 - Each command checks user permissions before execution.
 - Invalid password hashes are logged and skipped.
 - When a user enters their password, it is hashed and compared to the stored hash using bcrypt.
+- bcrypt checks run on a bounded worker pool; PASS answers 421 when it is saturated.
+- Bandwidth limits (bytes/s) live in users.json too: a top-level "limits" object
+  with "global" and per-role "roles" rates, and an optional "rate_limit" per user.
 """
 import os
+import copy
 import json
 import bcrypt
 import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:  # Not on POSIX: writes are only serialized within this process.
+    fcntl = None
 from ftpserver.utils.filesystem import BASE_DIR
+from ftpserver.utils.auth_pool import PasswordVerifier, VerifierBusy
+from ftpserver.utils.throttle import bandwidth, parse_rate
 
 USER_DB_PATH = os.path.join(os.path.dirname(__file__), '../config/users.json')
 logger = logging.getLogger("ftpserver.access_control")
 
+# Password verification pool: bcrypt checks run on AUTH_WORKERS threads, with at
+# most AUTH_MAX_PENDING more queued before PASS is answered with 421.
+AUTH_WORKERS = os.cpu_count() or 2
+AUTH_MAX_PENDING = 64
+# Seconds a successful (username, password) check is remembered; 0 disables the cache.
+AUTH_CACHE_TTL = 0
+
 # Helper functions for user DB
 
 def is_valid_bcrypt_hash(hash_str):
@@ -26,29 +47,142 @@ def is_valid_bcrypt_hash(hash_str):
     except Exception:
         return False
 
+class UserStore:
+    """
+    Process-wide view of users.json, indexed by username, plus its
+    top-level "limits" object.
+    The file is parsed once and re-read only when its inode, mtime or size
+    changes. Writes go through transaction() or limits_transaction(), which
+    hold a lock and replace the file atomically (temp file + rename). The
+    lock includes an flock on a side file, so pre-forked workers sharing one
+    users.json never overwrite each other's changes.
+    """
+    def __init__(self, path, on_reload=None):
+        self.path = path
+        self.on_reload = on_reload
+        self._lock = threading.RLock()
+        self._users = {}
+        self._limits = {}
+        self._stamp = None
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _refresh(self):
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            stamp = self._file_stamp()
+            if stamp == self._stamp:
+                return
+            users = {}
+            data = {}
+            if stamp is not None:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                for user in data.get('users', []):
+                    if not is_valid_bcrypt_hash(user.get('password', '')):
+                        # logger.warning(f"Skipping user {user.get('username', '<unknown>')}: invalid bcrypt hash.")
+                        continue
+                    users[user['username']] = user
+            self._users = users
+            self._limits = data.get('limits', {})
+            self._stamp = stamp
+            if self.on_reload:
+                self.on_reload()
+
+    def get(self, username):
+        """Returns the stored user dict (treat as read-only) or None."""
+        self._refresh()
+        return self._users.get(username)
+
+    def all(self):
+        self._refresh()
+        return list(self._users.values())
+
+    def limits(self):
+        """Returns the "limits" object (treat as read-only)."""
+        self._refresh()
+        return self._limits
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Yields a private copy of the users dict; changes are written to disk
+        and published only if the block finishes without raising and actually
+        modified something.
+        """
+        with self._write_lock():
+            self._refresh()
+            users = copy.deepcopy(self._users)
+            yield users
+            if users == self._users:
+                return
+            self._write(users, self._limits)
+            self._users = users
+            self._stamp = self._file_stamp()
+
+    @contextmanager
+    def limits_transaction(self):
+        """Like transaction(), for the top-level "limits" object."""
+        with self._write_lock():
+            self._refresh()
+            limits = copy.deepcopy(self._limits)
+            yield limits
+            if limits == self._limits:
+                return
+            self._write(self._users, limits)
+            self._limits = limits
+            self._stamp = self._file_stamp()
+
+    def _write(self, users, limits):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.users-', suffix='.json', dir=directory)
+        try:
+            if os.path.exists(self.path):
+                os.chmod(tmp_path, os.stat(self.path).st_mode & 0o777)
+            with os.fdopen(fd, 'w') as f:
+                document = {'limits': limits} if limits else {}
+                document['users'] = list(users.values())
+                json.dump(document, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+user_store = UserStore(USER_DB_PATH)
+
 def load_users():
-    if not os.path.exists(USER_DB_PATH):
-        return []
-    with open(USER_DB_PATH, 'r') as f:
-        data = json.load(f)
-        users = []
-        for user in data.get('users', []):
-            if not is_valid_bcrypt_hash(user.get('password', '')):
-                # logger.warning(f"Skipping user {user.get('username', '<unknown>')}: invalid bcrypt hash.")
-                continue
-            users.append(user)
-        return users
+    return user_store.all()
 
 def save_users(users):
-    with open(USER_DB_PATH, 'w') as f:
-        json.dump({'users': users}, f, indent=2)
+    with user_store.transaction() as current:
+        current.clear()
+        current.update((u['username'], u) for u in users)
 
 def find_user(username):
-    users = load_users()
-    for user in users:
-        if user['username'] == username:
-            return user
-    return None
+    return user_store.get(username)
 
 def check_password(stored_hash, password):
     """
@@ -65,6 +199,24 @@ def check_password(stored_hash, password):
 def hash_password(password):
     return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
 
+password_verifier = PasswordVerifier(check_password, workers=AUTH_WORKERS,
+                                     max_pending=AUTH_MAX_PENDING, cache_ttl=AUTH_CACHE_TTL)
+# Edits made to users.json behind our back may change any password.
+user_store.on_reload = password_verifier.clear
+
+def transfer_throttle(session):
+    """
+    Returns the Throttle for a RETR/STOR by this session's user, or None when
+    no limit applies. A user's own rate_limit overrides their role's rate;
+    the global rate applies on top of either.
+    """
+    limits = user_store.limits()
+    user = user_store.get(session.username)
+    user_rate = user.get('rate_limit') if user else None
+    if user_rate is None and user:
+        user_rate = limits.get('roles', {}).get(user.get('role'))
+    return bandwidth.throttle(session.username, limits.get('global'), user_rate)
+
 # RBAC Command Handlers
 class UserCommand:
     def handle(self, args, session):
@@ -89,14 +241,17 @@ class PassCommand:
         user = session.user_obj
         try:
             # User enters plaintext password; we compare it to the stored hash using bcrypt
-            if user and check_password(user['password'], args[0]):
+            if user and password_verifier.verify(user['username'], user['password'], args[0]):
                 session.logged_in = True
                 session.role = user['role']
-                session.permissions = user.get('permissions', [])
+                session.permissions = frozenset(user.get('permissions', []))
                 return f"user logged in as {session.role}\n"
             else:
                 session.logged_in = False
                 return "pass: incorrect password\n"
+        except VerifierBusy:
+            session.logged_in = False
+            return "421 Too many pending logins, try again later\r\n"
         except Exception as e:
             logger.error(f"Authentication error: {e}")
             session.logged_in = False
@@ -116,14 +271,17 @@ class AddUserCommand:
         username, password, role = args[:3]
         if find_user(username):
             return "adduser: user already exists\n"
-        users = load_users()
-        users.append({
-            'username': username,
-            'password': hash_password(password),
-            'role': role,
-            'permissions': [] if role == 'admin' else ["RETR", "STOR", "LS"]
-        })
-        save_users(users)
+        password_hash = hash_password(password)
+        with user_store.transaction() as users:
+            if username in users:
+                return "adduser: user already exists\n"
+            users[username] = {
+                'username': username,
+                'password': password_hash,
+                'role': role,
+                'permissions': [] if role == 'admin' else ["RETR", "STOR", "LS"]
+            }
+        password_verifier.invalidate(username)
         return f"user {username} added\n"
 
 class DelUserCommand:
@@ -133,9 +291,9 @@ class DelUserCommand:
         if not args:
             return "deluser: usage: DELUSER <username>\n"
         username = args[0]
-        users = load_users()
-        users = [u for u in users if u['username'] != username]
-        save_users(users)
+        with user_store.transaction() as users:
+            users.pop(username, None)
+        password_verifier.invalidate(username)
         return f"user {username} deleted\n"
 
 class SetRoleCommand:
@@ -145,17 +303,58 @@ class SetRoleCommand:
         if len(args) < 2:
             return "setrole: usage: SETROLE <username> <role>\n"
         username, role = args[:2]
-        users = load_users()
-        for u in users:
-            if u['username'] == username:
-                u['role'] = role
-                save_users(users)
-                return f"role for {username} set to {role}\n"
-        return "setrole: user not found\n"
+        with user_store.transaction() as users:
+            u = users.get(username)
+            if u is None:
+                return "setrole: user not found\n"
+            u['role'] = role
+        password_verifier.invalidate(username)
+        return f"role for {username} set to {role}\n"
+
+class SetLimitCommand:
+    """SETLIMIT GLOBAL|ROLE <role>|USER <username> <rate|off>: bandwidth limits, e.g. 512K or 10M bytes/s."""
+    USAGE = "setlimit: usage: SETLIMIT GLOBAL|ROLE <role>|USER <username> <rate|off>\n"
+
+    def handle(self, args, session):
+        if not (session.logged_in and session.role == 'admin'):
+            return "permission denied\n"
+        scope = args[0].upper() if args else ""
+        if not ((scope == "GLOBAL" and len(args) == 2) or (scope in ("ROLE", "USER") and len(args) == 3)):
+            return self.USAGE
+        try:
+            rate = parse_rate(args[-1])
+        except ValueError:
+            return f"setlimit: invalid rate '{args[-1]}'\n"
+        if scope == "USER":
+            target = f"user {args[1]}"
+            with user_store.transaction() as users:
+                u = users.get(args[1])
+                if u is None:
+                    return "setlimit: user not found\n"
+                if rate is None:
+                    u.pop('rate_limit', None)
+                else:
+                    u['rate_limit'] = rate
+        else:
+            target = "global" if scope == "GLOBAL" else f"role {args[1]}"
+            with user_store.limits_transaction() as limits:
+                if scope == "GLOBAL":
+                    table, key = limits, 'global'
+                else:
+                    table, key = limits.setdefault('roles', {}), args[1]
+                if rate is None:
+                    table.pop(key, None)
+                else:
+                    table[key] = rate
+                if not limits.get('roles', True):
+                    del limits['roles']
+        if rate is None:
+            return f"limit for {target} removed\n"
+        return f"limit for {target} set to {rate} bytes/s\n"
 
 # List of valid commands that can be granted/revoked (non-admin commands only)
 GRANTABLE_COMMANDS = {
-    "NOOP", "PWD", "CD", "LS", "NLST", "PORT", "PASV", "RETR", "STOR", "CAT", "MKDIR", "RMDIR", "RM", "RM-R", "CP", "MV", "LS-L", "STAT", "TOUCH", "ECHO"
+    "NOOP", "PWD", "CD", "LS", "NLST", "PORT", "PASV", "TYPE", "MODE", "OPTS", "RETR", "RETR-RANGE", "STOR", "ALLO", "REST", "SIZE", "MDTM", "CAT", "MKDIR", "RMDIR", "RM", "RM-R", "CP", "MV", "LS-L", "MLSD", "STAT", "MLST", "HASH", "TREE", "DELTA-SIG", "DELTA-RETR", "DELTA-STOR", "TOUCH", "ECHO"
 }
 
 class GrantCommand:
@@ -168,14 +367,13 @@ class GrantCommand:
         command = command.upper()
         if command not in GRANTABLE_COMMANDS:
             return f"grant: invalid command '{command}'. Allowed: {', '.join(sorted(GRANTABLE_COMMANDS))}\n"
-        users = load_users()
-        for u in users:
-            if u['username'] == username:
-                if command not in u['permissions']:
-                    u['permissions'].append(command)
-                    save_users(users)
-                return f"granted {command} to {username}\n"
-        return "grant: user not found\n"
+        with user_store.transaction() as users:
+            u = users.get(username)
+            if u is None:
+                return "grant: user not found\n"
+            if command not in u['permissions']:
+                u['permissions'].append(command)
+        return f"granted {command} to {username}\n"
 
 class RevokeCommand:
     def handle(self, args, session):
@@ -187,11 +385,10 @@ class RevokeCommand:
         command = command.upper()
         if command not in GRANTABLE_COMMANDS:
             return f"revoke: invalid command '{command}'. Allowed: {', '.join(sorted(GRANTABLE_COMMANDS))}\n"
-        users = load_users()
-        for u in users:
-            if u['username'] == username:
-                if command in u['permissions']:
-                    u['permissions'].remove(command)
-                    save_users(users)
-                return f"revoked {command} from {username}\n"
-        return "revoke: user not found\n"
\ No newline at end of file
+        with user_store.transaction() as users:
+            u = users.get(username)
+            if u is None:
+                return "revoke: user not found\n"
+            if command in u['permissions']:
+                u['permissions'].remove(command)
+        return f"revoked {command} from {username}\n"
\ No newline at end of file
@@ -0,0 +1,108 @@
+import os
+import socket
+from ftpserver.utils.filesystem import resolve_path
+from ftpserver.utils.transfer import atomic_upload
+from ftpserver.utils.listing_cache import listing_cache
+from ftpserver.utils.hash_index import content_index
+from ftpserver.utils.delta import Signature, DeltaError, generate_delta, read_delta_header, apply_delta
+
+# Largest client signature DELTA-RETR accepts (about 100 GB of file at the default block size).
+MAX_SIGNATURE_SIZE = 64 * 1024 * 1024
+
+
+def read_signature(conn):
+    """Reads a signature until the client half-closes the data connection."""
+    chunks = []
+    total = 0
+    while True:
+        data = conn.recv(65536)
+        if not data:
+            return Signature(b"".join(chunks))
+        total += len(data)
+        if total > MAX_SIGNATURE_SIZE:
+            raise DeltaError("signature too large")
+        chunks.append(data)
+
+
+class DeltaSigCommand:
+    """
+    DELTA-SIG <file>: sends the block signature of a server file (see
+    utils.delta) over the data connection. Signatures come from the
+    persistent content index, so an unchanged file is never re-read.
+    """
+    def handle(self, args, session):
+        if not session.logged_in:
+            return "login required\n"
+        if not args:
+            return "delta-sig: missing file operand\n"
+        if not session.data_channel.mode:
+            return "425 Use PORT or PASV first\r\n"
+        try:
+            signature = content_index.signature(resolve_path(session.cwd, args[0]))
+            conn = session.data_channel.open()
+            session.data_channel.close()
+            with conn:
+                conn.sendall(signature)
+            return "signature sent\n"
+        except Exception as e:
+            return f"delta-sig: {e}\n"
+
+
+class DeltaRetrCommand:
+    """
+    DELTA-RETR <file>: the client writes the signature of its local copy to
+    the data connection and shuts down its write side; the server answers on
+    the same connection with a delta that turns that copy into <file>.
+    """
+    def handle(self, args, session):
+        if not session.logged_in:
+            return "login required\n"
+        if not args:
+            return "delta-retr: missing file operand\n"
+        if not session.data_channel.mode:
+            return "425 Use PORT or PASV first\r\n"
+        try:
+            file_path = resolve_path(session.cwd, args[0])
+            with open(file_path, 'rb') as f:
+                conn = session.data_channel.open()
+                session.data_channel.close()
+                with conn:
+                    signature = read_signature(conn)
+                    for chunk in generate_delta(f, signature):
+                        conn.sendall(chunk)
+            return "delta sent\n"
+        except Exception as e:
+            return f"delta-retr: {e}\n"
+
+
+class DeltaStorCommand:
+    """
+    DELTA-STOR <file>: the client sends a delta against the signature it got
+    from DELTA-SIG. The delta is refused if <file> changed since then; the
+    rebuilt file replaces <file> atomically, as with STOR.
+    """
+    def handle(self, args, session):
+        if not session.logged_in:
+            return "login required\n"
+        if not args:
+            return "delta-stor: missing file operand\n"
+        if not session.data_channel.mode:
+            return "425 Use PORT or PASV first\r\n"
+        try:
+            file_path = resolve_path(session.cwd, args[0])
+            with open(file_path, 'rb') as base:
+                st = os.fstat(base.fileno())
+                conn = session.data_channel.open()
+                session.data_channel.close()
+                with conn, conn.makefile('rb') as stream:
+                    block_size, base_size, base_mtime_ns = read_delta_header(stream)
+                    if (base_size, base_mtime_ns) != (st.st_size, st.st_mtime_ns):
+                        conn.shutdown(socket.SHUT_RDWR)
+                        return "delta-stor: file changed since its signature was taken\n"
+                    with atomic_upload(file_path) as out:
+                        apply_delta(stream, base, out, block_size, base_size)
+            listing_cache.invalidate(file_path)
+            content_index.file_changed(file_path)
+            return "file stored\n"
+        except Exception as e:
+            return f"delta-stor: {e}\n"
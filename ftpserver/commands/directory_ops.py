@@ -1,6 +1,13 @@
 import os
 import shutil
-from ftpserver.utils.filesystem import resolve_path, list_dir, change_directory
+import stat
+import time
+from ftpserver.utils.filesystem import resolve_path, list_dir, change_directory, path_resolver
+from ftpserver.utils.listing_cache import listing_cache
+from ftpserver.utils.hash_index import content_index
+from ftpserver.utils.transfer import send_lines
+from ftpserver.utils.hashing import file_hasher, normalize_algorithm
+from collections import deque
 import errno
 
 class PwdCommand:
@@ -31,24 +38,28 @@ class ListCommand:
             return "login required\n"
         try:
             path = resolve_path(session.cwd, args[0] if args else ".")
-            files = list_dir(path)
-            data = "\n".join(files)
-            return data + "\n"
+            return listing_cache.get(path, "LS", self.render)
         except Exception as e:
             return f"ls: {e}\n"
 
+    @staticmethod
+    def render(path):
+        return "\n".join(list_dir(path)) + "\n"
+
 class NlstCommand:
     def handle(self, args, session):
         if not session.logged_in:
             return "login required\n"
         try:
             path = resolve_path(session.cwd, args[0] if args else ".")
-            files = list_dir(path)
-            data = "\n".join(f for f in files if not f.startswith('.'))
-            return data + "\n"
+            return listing_cache.get(path, "NLST", self.render)
         except Exception as e:
             return f"nlst: {e}\n"
 
+    @staticmethod
+    def render(path):
+        return "\n".join(f for f in list_dir(path) if not f.startswith('.')) + "\n"
+
 class MkdirCommand:
     def handle(self, args, session):
         if not session.logged_in:
@@ -58,6 +69,7 @@ class MkdirCommand:
         try:
             dir_path = resolve_path(session.cwd, args[0])
             os.makedirs(dir_path, exist_ok=False)
+            listing_cache.invalidate(dir_path)
             return "directory created\n"
         except FileExistsError:
             return f"mkdir: cannot create directory '{args[0]}': File exists\n"
@@ -73,6 +85,9 @@ class RmdirCommand:
         try:
             dir_path = resolve_path(session.cwd, args[0])
             os.rmdir(dir_path)
+            path_resolver.invalidate()
+            listing_cache.invalidate(dir_path, recursive=True)
+            content_index.removed(dir_path)
             return "directory removed\n"
         except FileNotFoundError:
             return f"rmdir: failed to remove '{args[0]}': No such file or directory\n"
@@ -89,33 +104,203 @@ class RmRecursiveCommand:
             return "rm -r: missing operand\n"
         try:
             dir_path = resolve_path(session.cwd, args[0])
-            shutil.rmtree(dir_path)
+            try:
+                shutil.rmtree(dir_path)
+            finally:
+                path_resolver.invalidate()
+                listing_cache.invalidate(dir_path, recursive=True)
+                content_index.removed(dir_path)
             return "directory and contents removed\n"
         except FileNotFoundError:
             return f"rm -r: cannot remove '{args[0]}': No such file or directory\n"
         except Exception as e:
             return f"rm -r: cannot remove '{args[0]}': {e}\n"
 
+def send_listing(session, path, kind, iter_lines):
+    """
+    Sends a listing of `path` over the session's data connection, streaming
+    iter_lines(path) as it is generated unless a fresh cached rendering exists.
+    """
+    if not os.path.isdir(path):
+        raise NotADirectoryError(f"Not a directory: '{path}'")
+    cached = listing_cache.lookup(path, kind)
+    conn = session.data_channel.open()
+    session.data_channel.close()
+    with conn:
+        if cached is not None:
+            conn.sendall(cached.encode())
+        else:
+            send_lines(conn, iter_lines(path))
+
+def render_lines(lines):
+    return "".join(line + "\n" for line in lines) or "\n"
+
+def entry_stat(entry):
+    try:
+        return entry.stat()
+    except FileNotFoundError:
+        # Dangling symlink: describe the link itself.
+        return entry.stat(follow_symlinks=False)
+
 class LsLongCommand:
+    """
+    LS-L [dir]: long listing. Without a data channel the listing comes back
+    on the control connection (and is cached); after PORT/PASV it is streamed
+    over the data connection as it is generated, so huge directories start
+    arriving immediately and are never held in memory as a whole.
+    """
     def handle(self, args, session):
         if not session.logged_in:
             return "login required\n"
-        import stat, time
         try:
             path = resolve_path(session.cwd, args[0] if args else ".")
-            files = os.listdir(path)
-            lines = []
-            for f in files:
-                fp = os.path.join(path, f)
-                st = os.stat(fp)
-                perms = stat.filemode(st.st_mode)
-                nlink = st.st_nlink
-                owner = st.st_uid if hasattr(st, 'st_uid') else 0
-                group = st.st_gid if hasattr(st, 'st_gid') else 0
-                size = st.st_size
-                mtime = time.strftime('%b %d %H:%M', time.localtime(st.st_mtime))
-                lines.append(f"{perms} {nlink} {owner} {group} {size} {mtime} {f}")
-            data = "\n".join(lines)
-            return data + "\n"
+            if not session.data_channel.mode:
+                return listing_cache.get(path, "LS-L", self.render)
+            send_listing(session, path, "LS-L", iter_long_listing)
+            return "listing sent\n"
         except Exception as e:
             return f"ls -l: {e}\n"
+
+    @staticmethod
+    def render(path):
+        return render_lines(iter_long_listing(path))
+
+def iter_long_listing(path):
+    """Yields one `ls -l` style line per entry, using each DirEntry's stat."""
+    minutes = {}  # The timestamp has minute resolution; format each minute once.
+    with os.scandir(path) as entries:
+        for entry in entries:
+            st = entry_stat(entry)
+            perms = stat.filemode(st.st_mode)
+            nlink = st.st_nlink
+            owner = st.st_uid if hasattr(st, 'st_uid') else 0
+            group = st.st_gid if hasattr(st, 'st_gid') else 0
+            size = st.st_size
+            minute = int(st.st_mtime) // 60
+            mtime = minutes.get(minute)
+            if mtime is None:
+                mtime = minutes[minute] = time.strftime('%b %d %H:%M', time.localtime(st.st_mtime))
+            yield f"{perms} {nlink} {owner} {group} {size} {mtime} {entry.name}"
+
+class MlsdCommand:
+    """
+    MLSD [dir]: RFC 3659 machine-readable listing, one
+    "type=..;size=..;modify=..;perm=..;unique=..; name" line per entry, built
+    from a single scandir pass. Streams over the data connection like LS-L.
+    """
+    def handle(self, args, session):
+        if not session.logged_in:
+            return "login required\n"
+        try:
+            path = resolve_path(session.cwd, args[0] if args else ".")
+            if not session.data_channel.mode:
+                return listing_cache.get(path, "MLSD", self.render)
+            send_listing(session, path, "MLSD", iter_mlsd)
+            return "listing sent\n"
+        except Exception as e:
+            return f"mlsd: {e}\n"
+
+    @staticmethod
+    def render(path):
+        return render_lines(iter_mlsd(path))
+
+def iter_mlsd(path):
+    dir_writable = os.access(path, os.W_OK)
+    with os.scandir(path) as entries:
+        for entry in entries:
+            yield mlsx_facts(entry_stat(entry), dir_writable) + " " + entry.name
+
+def mlsx_facts(st, parent_writable):
+    """Formats the RFC 3659 fact list for one stat result (modify is UTC)."""
+    is_dir = stat.S_ISDIR(st.st_mode)
+    mode = st.st_mode
+    if st.st_uid == _EUID:
+        readable, writable = mode & stat.S_IRUSR, mode & stat.S_IWUSR
+    else:
+        readable, writable = mode & stat.S_IROTH, mode & stat.S_IWOTH
+    perm = ""
+    if is_dir:
+        if readable:
+            perm += "el"
+        if writable:
+            perm += "cmp"
+    else:
+        if readable:
+            perm += "r"
+        if writable:
+            perm += "aw"
+    if parent_writable:
+        perm += "df"
+    modify = time.strftime('%Y%m%d%H%M%S', time.gmtime(st.st_mtime))
+    return (f"type={'dir' if is_dir else 'file'};size={st.st_size};modify={modify};"
+            f"perm={perm};unique={st.st_dev:x}g{st.st_ino:x};")
+
+_EUID = os.geteuid() if hasattr(os, 'geteuid') else -1
+
+# Hashes TREE keeps in flight on the hashing pool while it streams.
+TREE_HASH_WINDOW = 64
+
+class TreeCommand:
+    """
+    TREE <dir> [algo]: recursive manifest streamed over the data connection,
+    one "path<TAB>size<TAB>modify[<TAB>digest]" line per regular file, paths
+    relative to <dir>. Digests are computed on the hashing pool a window
+    ahead of the output and cached, so an unchanged tree costs only stats.
+    """
+    def handle(self, args, session):
+        if not session.logged_in:
+            return "login required\n"
+        if not session.data_channel.mode:
+            return "425 Use PORT or PASV first\r\n"
+        try:
+            algorithm = normalize_algorithm(args[1]) if len(args) > 1 else None
+        except ValueError as e:
+            return f"504 {e}\r\n"
+        try:
+            path = resolve_path(session.cwd, args[0] if args else ".")
+            if not os.path.isdir(path):
+                raise NotADirectoryError(f"Not a directory: '{args[0]}'")
+            conn = session.data_channel.open()
+            session.data_channel.close()
+            with conn:
+                send_lines(conn, iter_tree(path, algorithm))
+            return "manifest sent\n"
+        except Exception as e:
+            return f"tree: {e}\n"
+
+def walk_files(root):
+    """Yields (relative path, full path, stat) for regular files under root; symlinks are skipped."""
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        with os.scandir(os.path.join(root, rel_dir)) as entries:
+            subdirs = []
+            for entry in sorted(entries, key=lambda e: e.name):
+                rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if entry.is_symlink():
+                    continue
+                if entry.is_dir():
+                    subdirs.append(rel)
+                elif entry.is_file():
+                    yield rel, entry.path, entry.stat()
+            stack.extend(reversed(subdirs))
+
+def iter_tree(root, algorithm=None):
+    pending = deque()
+    for rel, full, st in walk_files(root):
+        future = file_hasher.submit(full, algorithm, st) if algorithm else None
+        pending.append((rel, st, future))
+        if len(pending) >= TREE_HASH_WINDOW:
+            yield _tree_line(*pending.popleft())
+    while pending:
+        yield _tree_line(*pending.popleft())
+
+def _tree_line(rel, st, future):
+    modify = time.strftime('%Y%m%d%H%M%S', time.gmtime(st.st_mtime))
+    line = f"{rel}\t{st.st_size}\t{modify}"
+    if future is not None:
+        try:
+            line += "\t" + future.result()
+        except OSError:
+            line += "\t-"  # Vanished or unreadable since the walk.
+    return line
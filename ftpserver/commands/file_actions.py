@@ -1,4 +1,48 @@
-from ftpserver.utils.filesystem import resolve_path
+from ftpserver.utils.filesystem import resolve_path, BASE_DIR
+from ftpserver.utils.transfer import (
+    send_file, receive_file, atomic_upload, send_deflated, receive_inflated, is_precompressed,
+    send_ascii, receive_ascii, LineEndingTranslator, free_space, MAX_ALLOCATE_SIZE,
+)
+from ftpserver.utils.listing_cache import listing_cache
+from ftpserver.utils.hash_index import content_index
+from ftpserver.commands.access_control import transfer_throttle
+from ftpserver.commands.directory_ops import mlsx_facts
+from ftpserver.utils.hashing import file_hasher, normalize_algorithm, DEFAULT_ALGORITHM
+from ftpserver.utils.logger import audit
+from ftpserver.utils.metrics import observe_transfer
+
+def send_for_session(session, conn, f, file_path, offset=0):
+    """
+    Sends a file honouring the session's TYPE (A converts line endings), MODE
+    (Z deflates) and the user's bandwidth limits.
+    """
+    text = session.transfer_type == "A"
+    throttle = transfer_throttle(session)
+    if session.transfer_mode == "Z":
+        level = 0 if is_precompressed(file_path) else session.deflate_level
+        translator = LineEndingTranslator(outbound=True) if text else None
+        return send_deflated(conn, f, level, offset, translator=translator, throttle=throttle)
+    if text:
+        return send_ascii(conn, f, offset, throttle=throttle)
+    return send_file(conn, f, offset, throttle=throttle)
+
+def receive_for_session(session, conn, f):
+    """Receives an upload honouring the session's TYPE, MODE and limits; see send_for_session."""
+    text = session.transfer_type == "A"
+    throttle = transfer_throttle(session)
+    if session.transfer_mode == "Z":
+        translator = LineEndingTranslator(outbound=False) if text else None
+        return receive_inflated(conn, f, translator=translator, throttle=throttle)
+    if text:
+        return receive_ascii(conn, f, throttle=throttle)
+    return receive_file(conn, f, throttle=throttle)
+
+def record_transfer(session, command, file_path, size, started, offset=0):
+    """Metrics and audit record for a finished transfer started at time.monotonic() `started`."""
+    elapsed = time.monotonic() - started
+    observe_transfer(command, size, elapsed)
+    audit("transfer", user=session.username, command=command, path=file_path, bytes=size, offset=offset,
+          duration=round(elapsed, 6), type=session.transfer_type, mode=session.transfer_mode)
 
 class RetrCommand:
     def handle(self, args, session):
@@ -6,23 +50,60 @@ class RetrCommand:
             return "login required\n"
         if not args:
             return "retr: missing file operand\n"
+        offset, session.rest_offset = session.rest_offset, 0
         try:
             file_path = resolve_path(session.cwd, args[0])
             with open(file_path, 'rb') as f:
+                if offset > os.fstat(f.fileno()).st_size:
+                    return "retr: restart offset beyond end of file\n"
                 conn = session.data_channel.open()
                 session.data_channel.close()
-                data = f.read()
-                conn.sendall(data)
-                conn.close()
+                started = time.monotonic()
+                with conn:
+                    sent = send_for_session(session, conn, f, file_path, offset)
+                record_transfer(session, "RETR", file_path, sent, started, offset)
             return "file sent\n"
         except Exception as e:
             return f"retr: {e}\n"
 
+class RetrRangeCommand:
+    """
+    RETR-RANGE <file> <offset> <length>: sends one byte range of a file.
+    Clients open several sessions and fetch disjoint ranges in parallel
+    (see ftpserver.client.striped).
+    """
+    def handle(self, args, session):
+        if not session.logged_in:
+            return "login required\n"
+        if len(args) < 3:
+            return "retr-range: usage: RETR-RANGE <file> <offset> <length>\n"
+        try:
+            offset, length = int(args[1]), int(args[2])
+        except ValueError:
+            return "retr-range: offset and length must be integers\n"
+        if offset < 0 or length < 0:
+            return "retr-range: offset and length must not be negative\n"
+        try:
+            file_path = resolve_path(session.cwd, args[0])
+            with open(file_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if offset > size:
+                    return "retr-range: offset beyond end of file\n"
+                conn = session.data_channel.open()
+                session.data_channel.close()
+                started = time.monotonic()
+                with conn:
+                    sent = send_file(conn, f, offset, min(length, size - offset), throttle=transfer_throttle(session))
+                record_transfer(session, "RETR-RANGE", file_path, sent, started, offset)
+            return "file sent\n"
+        except Exception as e:
+            return f"retr-range: {e}\n"
+
 import os
 import shutil
 import stat
 import time
-from ftpserver.utils.filesystem import resolve_path
+from ftpserver.utils.filesystem import resolve_path, path_resolver
 
 class StorCommand:
     def handle(self, args, session):
@@ -33,19 +114,88 @@ class StorCommand:
         try:
             file_path = resolve_path(session.cwd, args[0])
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            allocate, session.allocate_size = session.allocate_size, None
+            offset, session.rest_offset = session.rest_offset, 0
+            if offset:
+                return self._resume(file_path, offset, session)
             conn = session.data_channel.open()
             session.data_channel.close()
-            with open(file_path, 'wb') as f:
-                while True:
-                    data = conn.recv(1024)
-                    if not data:
-                        break
-                    f.write(data)
-            conn.close()
+            started = time.monotonic()
+            with conn, atomic_upload(file_path, allocate) as f:
+                received = receive_for_session(session, conn, f)
+            record_transfer(session, "STOR", file_path, received, started)
+            listing_cache.invalidate(file_path)
+            content_index.file_changed(file_path)
             return "file stored\n"
         except Exception as e:
             return f"stor: {e}\n"
-        
+
+    def _resume(self, file_path, offset, session):
+        # Resuming appends to the partial file in place: it is already visible
+        # to readers, and copying gigabytes into a temp file would defeat REST.
+        with open(file_path, 'r+b') as f:
+            if offset > os.fstat(f.fileno()).st_size:
+                return "stor: restart offset beyond end of file\n"
+            f.seek(offset)
+            f.truncate()
+            conn = session.data_channel.open()
+            session.data_channel.close()
+            started = time.monotonic()
+            with conn:
+                received = receive_for_session(session, conn, f)
+        record_transfer(session, "STOR", file_path, received, started, offset=offset)
+        listing_cache.invalidate(file_path)
+        content_index.file_changed(file_path)
+        return "file stored\n"
+
+class RestCommand:
+    def handle(self, args, session):
+        if not session.logged_in:
+            return "login required\n"
+        if not args or not args[0].isdigit():
+            return "501 Syntax error: REST <offset>\r\n"
+        session.rest_offset = int(args[0])
+        return f"350 Restarting at {session.rest_offset}. Send RETR or STOR to resume.\r\n"
+
+class SizeCommand:
+    def handle(self, args, session):
+        if not session.logged_in:
+            return "login required\n"
+        if not args:
+            return "501 Syntax error: SIZE <file>\r\n"
+        try:
+            st = os.stat(resolve_path(session.cwd, args[0]))
+            if stat.S_ISDIR(st.st_mode):
+                return f"550 {args[0]}: not a regular file\r\n"
+            return f"213 {st.st_size}\r\n"
+        except Exception as e:
+            return f"550 {args[0]}: {e}\r\n"
+
+class MdtmCommand:
+    def handle(self, args, session):
+        if not session.logged_in:
+            return "login required\n"
+        if not args:
+            return "501 Syntax error: MDTM <file>\r\n"
+        try:
+            st = os.stat(resolve_path(session.cwd, args[0]))
+            return time.strftime('213 %Y%m%d%H%M%S\r\n', time.gmtime(st.st_mtime))
+        except Exception as e:
+            return f"550 {args[0]}: {e}\r\n"
+
+class AlloCommand:
+    def handle(self, args, session):
+        if not session.logged_in:
+            return "login required\n"
+        if not args or not args[0].isdigit():
+            return "501 Syntax error: ALLO <size>\r\n"
+        size = int(args[0])
+        if size > MAX_ALLOCATE_SIZE or size > free_space(BASE_DIR):
+            session.allocate_size = None
+            return "552 Requested allocation exceeds available storage\r\n"
+        session.allocate_size = size
+        return "200 ALLO size recorded\r\n"
+
 class CatCommand:
     def handle(self, args, session):
         if not session.logged_in:
@@ -71,6 +221,8 @@ class RmCommand:
         try:
             file_path = resolve_path(session.cwd, args[0])
             os.remove(file_path)
+            listing_cache.invalidate(file_path)
+            content_index.removed(file_path)
             return "file removed\n"
         except FileNotFoundError:
             return f"rm: cannot remove '{args[0]}': No such file or directory\n"
@@ -88,10 +240,16 @@ class CpCommand:
         try:
             src = resolve_path(session.cwd, args[0])
             dst = resolve_path(session.cwd, args[1])
-            if os.path.isdir(src):
-                shutil.copytree(src, dst)
-            else:
-                shutil.copy2(src, dst)
+            try:
+                if os.path.isdir(src):
+                    # Links are copied as links (and checked when used), never read through.
+                    shutil.copytree(src, dst, symlinks=True)
+                else:
+                    shutil.copy2(src, dst)
+            finally:
+                path_resolver.invalidate()  # The copy may contain relative links that now lead elsewhere
+                listing_cache.invalidate(dst, recursive=True)
+                content_index.file_changed(dst)
             return "file copied\n"
         except FileNotFoundError:
             return f"cp: cannot stat '{args[0]}': No such file or directory\n"
@@ -108,6 +266,10 @@ class MvCommand:
             src = resolve_path(session.cwd, args[0])
             dst = resolve_path(session.cwd, args[1])
             os.rename(src, dst)
+            path_resolver.invalidate()
+            listing_cache.invalidate(src, recursive=True)
+            listing_cache.invalidate(dst, recursive=True)
+            content_index.moved(src, dst)
             return "file moved\n"
         except FileNotFoundError:
             return f"mv: cannot stat '{args[0]}': No such file or directory\n"
@@ -134,6 +296,41 @@ class StatCommand:
         except Exception as e:
             return f"stat: {e}\n"
 
+class MlstCommand:
+    """MLST [path]: RFC 3659 facts for a single file or directory, on the control connection."""
+    def handle(self, args, session):
+        if not session.logged_in:
+            return "login required\n"
+        name = args[0] if args else "."
+        try:
+            path = resolve_path(session.cwd, name)
+            st = os.stat(path)
+            facts = mlsx_facts(st, os.access(os.path.dirname(path), os.W_OK))
+            return f"250-Listing {name}\r\n {facts} {name}\r\n250 End\r\n"
+        except Exception as e:
+            return f"550 {name}: {e}\r\n"
+
+class HashCommand:
+    """HASH <file> [algo]: content digest (SHA-256, SHA-1 or CRC32), reply as in draft-bryan-ftp-hash."""
+    def handle(self, args, session):
+        if not session.logged_in:
+            return "login required\n"
+        if not args:
+            return "501 Syntax error: HASH <file> [SHA-256|SHA-1|CRC32]\r\n"
+        try:
+            algorithm = normalize_algorithm(args[1] if len(args) > 1 else DEFAULT_ALGORITHM)
+        except ValueError as e:
+            return f"504 {e}\r\n"
+        try:
+            path = resolve_path(session.cwd, args[0])
+            st = os.stat(path)
+            if not stat.S_ISREG(st.st_mode):
+                return f"550 {args[0]}: not a regular file\r\n"
+            digest = file_hasher.digest(path, algorithm, st)
+            return f"213 {algorithm} 0-{st.st_size} {digest} {args[0]}\r\n"
+        except Exception as e:
+            return f"550 {args[0]}: {e}\r\n"
+
 class TouchCommand:
     def handle(self, args, session):
         if not session.logged_in:
@@ -144,6 +341,8 @@ class TouchCommand:
             file_path = resolve_path(session.cwd, args[0])
             with open(file_path, 'a'):
                 os.utime(file_path, None)
+            listing_cache.invalidate(file_path)
+            content_index.file_changed(file_path)
             return "file touched\n"
         except Exception as e:
             return f"touch: cannot touch '{args[0]}': {e}\n"
@@ -165,6 +364,8 @@ class EchoCommand:
                 file_path = resolve_path(session.cwd, filename)
                 with open(file_path, 'w', encoding='utf-8') as f:
                     f.write(content.strip('"'))
+                listing_cache.invalidate(file_path)
+                content_index.file_changed(file_path)
                 return "echoed to file\n"
             except Exception as e:
                 return f"echo: cannot write to '{filename}': {e}\n"
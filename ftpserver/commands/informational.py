@@ -1,3 +1,7 @@
+from ftpserver.core.session_registry import sessions
+from ftpserver.utils.metrics import registry
+from ftpserver.utils.profiling import PROFILERS, start_profiling, stop_profiling
+
 class NoopCommand:
     def handle(self, args, session):
         return "200 NOOP command successful.\r\n"
@@ -21,14 +25,78 @@ class HelpCommand:
             "RM-R <dir>              - Remove directory and contents recursively\r\n"
             "CP <src> <dst>          - Copy file or directory\r\n"
             "MV <src> <dst>          - Move or rename file or directory\r\n"
+            "TYPE A|I                - ASCII (CRLF line endings) or binary RETR/STOR\r\n"
+            "MODE S|Z                - Stream or deflate-compressed RETR/STOR\r\n"
+            "OPTS MODE Z LEVEL <n>   - Compression level (0-9) for MODE Z\r\n"
             "RETR <file>             - Retrieve (download) file\r\n"
+            "RETR-RANGE <f> <o> <n>  - Retrieve n bytes of a file from offset o\r\n"
             "STOR <file>             - Store (upload) file\r\n"
+            "ALLO <size>             - Announce upload size before STOR\r\n"
+            "REST <offset>           - Resume the next RETR/STOR at a byte offset\r\n"
+            "SIZE <file>             - Show file size in bytes\r\n"
+            "MDTM <file>             - Show file modification time (UTC)\r\n"
             "CAT <file>              - Display file contents\r\n"
             "STAT <file|dir>         - Show file or directory statistics\r\n"
+            "MLSD [dir]              - Machine-readable listing (RFC 3659)\r\n"
+            "MLST [path]             - Machine-readable facts for one entry\r\n"
+            "HASH <file> [algo]      - File digest: SHA-256 (default), SHA-1, CRC32\r\n"
+            "TREE <dir> [algo]       - Recursive manifest over the data connection\r\n"
+            "DELTA-SIG <file>        - Block signature of a file over the data connection\r\n"
+            "DELTA-RETR <file>       - Send your signature, receive only the changed blocks\r\n"
+            "DELTA-STOR <file>       - Upload only the changed blocks against DELTA-SIG\r\n"
             "TOUCH <file>            - Create or update file timestamp\r\n"
             "ECHO <text>             - Echo text to output\r\n"
             "ECHO <text> > <file>    - Write text to file\r\n"
             "HELP                    - Show this help message\r\n"
             "End of HELP\r\n"
         )
-        return help_text
\ No newline at end of file
+        return help_text
+
+class StatsCommand:
+    """STATS (admin): the server's metrics, as also served on the Prometheus endpoint."""
+    def handle(self, args, session):
+        if not (session.logged_in and session.role == 'admin'):
+            return "permission denied\n"
+        return "".join(line + "\r\n" for line in registry.summary()) + "End of STATS\r\n"
+
+class ProfileCommand:
+    """
+    PROFILE <user|session-id> on [cprofile|sample] | off (admin): profiles the
+    commands of one session, or of every session of a user, and writes pstats
+    or collapsed stacks under server_files/profiles. PROFILE alone lists the
+    live sessions.
+    """
+    USAGE = "profile: usage: PROFILE <user|session-id> on [cprofile|sample] | off\n"
+
+    def handle(self, args, session):
+        if not (session.logged_in and session.role == 'admin'):
+            return "permission denied\n"
+        if not args:
+            lines = [f"{sid} {d.session.username or '-'}{' profiling' if d.profiler else ''}"
+                     for sid, d in sessions.all()]
+            return "".join(line + "\r\n" for line in lines) + "End of PROFILE\r\n"
+        action = args[1].lower() if len(args) > 1 else ""
+        kind = args[2].lower() if len(args) > 2 else "cprofile"
+        if action not in ("on", "off") or kind not in PROFILERS or len(args) > 3:
+            return self.USAGE
+        targets = sessions.find(args[0])
+        if not targets:
+            return "profile: no such session\n"
+        if action == "on":
+            started = [d for d in targets if d.profiler is None]
+            for d in started:
+                start_profiling(d, kind)
+            if not started:
+                return "profile: already profiling\n"
+            return f"profiling session {', '.join(str(d.session.id) for d in started)}\n"
+        replies = []
+        for d in targets:
+            if d.profiler is None:
+                continue
+            try:
+                replies.append(f"profile written to {stop_profiling(d)}\n")
+            except OSError as e:
+                replies.append(f"profile: {e}\n")
+        if not replies:
+            return "profile: not profiling\n"
+        return "".join(replies)
@@ -1,4 +1,8 @@
-import socket
+from ftpserver.core.passive_ports import PoolExhausted
+
+TRANSFER_MODES = ("S", "Z")
+# TYPE arguments and the session.transfer_type they select; L 8 is binary too.
+TRANSFER_TYPES = {"A": "A", "A N": "A", "I": "I", "L 8": "I"}
 
 class PortCommand:
     def handle(self, args, session):
@@ -19,7 +23,49 @@ class PasvCommand:
     def handle(self, args, session):
         if not session.logged_in:
             return "530 Not logged in\r\n"
-        ip, port = session.data_channel.set_passive()
+        try:
+            ip, port = session.data_channel.set_passive()
+        except PoolExhausted:
+            return "425 Can't open passive connection: no free ports\r\n"
         ip_str = ip.replace('.', ',')
         p1, p2 = port >> 8, port & 0xFF
-        return f"227 Entering Passive Mode ({ip_str},{p1},{p2})\r\n"
\ No newline at end of file
+        return f"227 Entering Passive Mode ({ip_str},{p1},{p2})\r\n"
+
+class TypeCommand:
+    """TYPE A|I: ASCII (CRLF line endings on the wire) or binary (image) transfers."""
+    def handle(self, args, session):
+        if not session.logged_in:
+            return "530 Not logged in\r\n"
+        if not args:
+            return "501 Syntax error: TYPE A|I\r\n"
+        requested = " ".join(args).upper()
+        if requested not in TRANSFER_TYPES:
+            return f"504 TYPE {' '.join(args)} not supported\r\n"
+        session.transfer_type = TRANSFER_TYPES[requested]
+        return f"200 Type set to {session.transfer_type}\r\n"
+
+class ModeCommand:
+    """MODE S|Z: stream mode, or deflate-compressed transfers for RETR and STOR."""
+    def handle(self, args, session):
+        if not session.logged_in:
+            return "530 Not logged in\r\n"
+        if not args:
+            return "501 Syntax error: MODE S|Z\r\n"
+        mode = args[0].upper()
+        if mode not in TRANSFER_MODES:
+            return f"504 MODE {args[0]} not supported\r\n"
+        session.transfer_mode = mode
+        return f"200 Mode set to {mode}\r\n"
+
+class OptsCommand:
+    """OPTS MODE Z LEVEL <0-9>: compression level for later MODE Z transfers."""
+    def handle(self, args, session):
+        if not session.logged_in:
+            return "530 Not logged in\r\n"
+        words = [a.upper() for a in args]
+        if words[:3] != ["MODE", "Z", "LEVEL"] or len(words) != 4:
+            return "501 Syntax error: OPTS MODE Z LEVEL <0-9>\r\n"
+        if not words[3].isdigit() or int(words[3]) > 9:
+            return "501 LEVEL must be between 0 and 9\r\n"
+        session.deflate_level = int(words[3])
+        return f"200 MODE Z LEVEL set to {session.deflate_level}\r\n"
\ No newline at end of file
@@ -0,0 +1,76 @@
+import collections
+import errno
+import threading
+
+# Most control connections served at once; further clients get a 421.
+MAX_SESSIONS = 1000
+# Most control connections from one source address.
+MAX_SESSIONS_PER_IP = 32
+# Kernel queue of connections not yet accepted.
+LISTEN_BACKLOG = 128
+# Seconds a control connection may sit between commands before it is closed.
+IDLE_TIMEOUT = 300
+# Seconds the accept loop backs off after running out of file descriptors.
+ACCEPT_BACKOFF = 0.1
+
+TOO_MANY_SESSIONS = b"421 Too many connections, try again later\r\n"
+TOO_MANY_FROM_IP = b"421 Too many connections from your address\r\n"
+IDLE_TIMEOUT_REPLY = b"421 Idle timeout, closing control connection\r\n"
+
+# accept() errors that mean "out of resources right now", not "listener broken".
+RESOURCE_ERRNOS = frozenset({errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM})
+
+
+class AdmissionController:
+    """
+    Counts live control connections in total and per source IP.
+    The accept loop calls admit() before it creates a thread or coroutine for
+    a client, so a rejected connection costs one non-blocking send and a
+    close. Every admitted connection must be paired with one release().
+    """
+    def __init__(self, max_sessions=MAX_SESSIONS, max_per_ip=MAX_SESSIONS_PER_IP):
+        self.max_sessions = max_sessions
+        self.max_per_ip = max_per_ip
+        self._lock = threading.Lock()
+        self._per_ip = collections.Counter()
+        self.active = 0
+        self.metrics = {"admitted": 0, "rejected_total": 0, "rejected_per_ip": 0}
+
+    def admit(self, ip):
+        """Returns None if the client may proceed, else the 421 reply to send it."""
+        with self._lock:
+            if self.max_sessions and self.active >= self.max_sessions:
+                self.metrics["rejected_total"] += 1
+                return TOO_MANY_SESSIONS
+            if self.max_per_ip and self._per_ip[ip] >= self.max_per_ip:
+                self.metrics["rejected_per_ip"] += 1
+                return TOO_MANY_FROM_IP
+            self.active += 1
+            self._per_ip[ip] += 1
+            self.metrics["admitted"] += 1
+            return None
+
+    def release(self, ip):
+        with self._lock:
+            self.active -= 1
+            self._per_ip[ip] -= 1
+            if self._per_ip[ip] <= 0:
+                del self._per_ip[ip]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics)
+            stats["active"] = self.active
+            stats["addresses"] = len(self._per_ip)
+        return stats
+
+
+def reject(sock, reply):
+    """Best-effort 421 to a client we are not going to serve, without ever blocking."""
+    try:
+        sock.setblocking(False)
+        sock.send(reply)
+    except OSError:
+        pass
+    finally:
+        sock.close()
@@ -0,0 +1,152 @@
+import asyncio
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from ftpserver.core.session import FTPSession
+from ftpserver.core.command_dispatcher import CommandDispatcher
+from ftpserver.core.line_reader import LineReader, LineTooLong
+from ftpserver.core.admission import (
+    AdmissionController, reject, LISTEN_BACKLOG, IDLE_TIMEOUT, IDLE_TIMEOUT_REPLY, ACCEPT_BACKOFF, RESOURCE_ERRNOS,
+)
+from ftpserver.utils.logger import logger
+
+# Upper bound on worker threads shared by all sessions for blocking handlers.
+DEFAULT_EXECUTOR_WORKERS = 32
+
+RECV_SIZE = 65536
+
+# Commands that never touch the disk, a data connection or bcrypt, so they are
+# cheap enough to run directly on the event loop. Everything else (RETR, STOR,
+# PASS, listings, file operations) goes to the bounded executor.
+INLINE_COMMANDS = frozenset({"NOOP", "PWD", "HELP", "QUIT", "PORT"})
+
+
+class AsyncFTPServer:
+    """
+    Control-connection engine on asyncio.
+    Each client is a coroutine sharing one event loop, so idle sessions cost a
+    few KB instead of a whole thread stack. The accept loop is our own rather
+    than asyncio.start_server's, so admission is decided before a stream or
+    task is created for the client.
+    """
+    def __init__(self, host='0.0.0.0', port=21, workers=DEFAULT_EXECUTOR_WORKERS,
+                 admission=None, backlog=LISTEN_BACKLOG, idle_timeout=IDLE_TIMEOUT, reuse_port=False):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.admission = admission or AdmissionController()
+        self.backlog = backlog
+        self.idle_timeout = idle_timeout or None
+        self.reuse_port = reuse_port
+        self.executor = None
+        self._loop = None
+        self._accept_task = None
+        self._clients = set()
+
+    def start(self):
+        asyncio.run(self.serve())
+
+    def stop(self):
+        """Stops accepting connections (thread-safe); running sessions are left to finish."""
+        if self._loop is not None and self._accept_task is not None:
+            self._loop.call_soon_threadsafe(self._accept_task.cancel)
+
+    async def serve(self):
+        self._loop = asyncio.get_running_loop()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ftp-worker")
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        listener.bind((self.host, self.port))
+        listener.listen(self.backlog)
+        listener.setblocking(False)
+        logger.info("Server is listening for connections (asyncio mode)...")
+        self._accept_task = asyncio.current_task()
+        try:
+            await self.accept_loop(listener)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            listener.close()
+            if self._clients:
+                await asyncio.gather(*self._clients, return_exceptions=True)
+            self.executor.shutdown(wait=False)
+
+    async def accept_loop(self, listener):
+        while True:
+            try:
+                conn, addr = await self._loop.sock_accept(listener)
+            except OSError as e:
+                if e.errno not in RESOURCE_ERRNOS:
+                    raise
+                logger.warning(f"accept failed ({e}); backing off")
+                await asyncio.sleep(ACCEPT_BACKOFF)
+                continue
+            reply = self.admission.admit(addr[0])
+            if reply is not None:
+                reject(conn, reply)
+                continue
+            task = self._loop.create_task(self._serve_connection(conn, addr))
+            self._clients.add(task)
+            task.add_done_callback(self._clients.discard)
+
+    async def _serve_connection(self, conn, addr):
+        try:
+            reader, writer = await asyncio.open_connection(sock=conn)
+            await self.handle_client(reader, writer)
+        finally:
+            self.admission.release(addr[0])
+
+    async def handle_client(self, reader, writer):
+        addr = writer.get_extra_info('peername')
+        logger.info(f"Connection from {addr}")
+        loop = asyncio.get_running_loop()
+        session = FTPSession()
+        dispatcher = CommandDispatcher(session)
+        try:
+            writer.write(b"220 Welcome to FTPServer\r\n")
+            await writer.drain()
+            lines = LineReader()
+            closing = False
+            while not closing:
+                try:
+                    data = await asyncio.wait_for(reader.read(RECV_SIZE), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    writer.write(IDLE_TIMEOUT_REPLY)
+                    await writer.drain()
+                    break
+                if not data:
+                    break
+                try:
+                    batch = lines.feed(data)
+                except LineTooLong:
+                    writer.write(b"500 Command line too long\r\n")
+                    await writer.drain()
+                    break
+                # Replies for one read burst go out together; see ClientHandler.process.
+                pending = []
+                for line in batch:
+                    if pending and session.data_channel.mode:
+                        writer.write("".join(pending).encode())
+                        await writer.drain()
+                        pending = []
+                    parts = line.split(None, 1)
+                    cmd = parts[0].upper() if parts else ""
+                    if cmd in INLINE_COMMANDS:
+                        response = dispatcher.dispatch(line)
+                    else:
+                        response = await loop.run_in_executor(self.executor, dispatcher.dispatch, line)
+                    pending.append(response)
+                    if response.startswith("221"):
+                        closing = True
+                        break
+                if pending:
+                    writer.write("".join(pending).encode())
+                    await writer.drain()
+        except ConnectionError as e:
+            logger.info(f"Client {addr} dropped: {e}")
+        except Exception as e:
+            logger.error(f"Client error: {e}")
+        finally:
+            session.data_channel.close()
+            writer.close()
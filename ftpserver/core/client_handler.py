@@ -1,29 +1,71 @@
 from ftpserver.core.session import FTPSession
 from ftpserver.core.command_dispatcher import CommandDispatcher
-from ftpserver.core.session import FTPSession
-from ftpserver.core.command_dispatcher import CommandDispatcher
+from ftpserver.core.line_reader import LineReader, LineTooLong
+from ftpserver.core.admission import IDLE_TIMEOUT_REPLY
+from ftpserver.utils.logger import logger
+import socket
 import threading
 
+RECV_SIZE = 65536
+
 class ClientHandler(threading.Thread):
-    def __init__(self, client_socket, address):
+    def __init__(self, client_socket, address, idle_timeout=None, on_close=None):
         super().__init__()
         self.client_socket = client_socket
         self.address = address
+        self.idle_timeout = idle_timeout
+        self.on_close = on_close  # Called once the connection is closed (admission release)
         self.session = FTPSession()
         self.dispatcher = CommandDispatcher(self.session)
 
     def run(self):
         try:
             self.client_socket.sendall(b"220 Welcome to FTPServer\r\n")
+            reader = LineReader()
             while True:
-                data = self.client_socket.recv(1024).decode('utf-8')
+                self.client_socket.settimeout(self.idle_timeout)
+                try:
+                    data = self.client_socket.recv(RECV_SIZE)
+                except socket.timeout:
+                    self.client_socket.sendall(IDLE_TIMEOUT_REPLY)
+                    break
+                self.client_socket.settimeout(None)
                 if not data:
                     break
-                response = self.dispatcher.dispatch(data)
-                self.client_socket.sendall(response.encode())
-                if response.startswith("221"):
+                try:
+                    lines = reader.feed(data)
+                except LineTooLong:
+                    self.client_socket.sendall(b"500 Command line too long\r\n")
+                    break
+                if self.process(lines):
                     break
+        except ConnectionError as e:
+            logger.info(f"Client {self.address} dropped: {e}")
         except Exception as e:
-            print(f"Client error: {e}")
+            logger.error(f"Client error: {e}")
         finally:
+            self.session.data_channel.close()
             self.client_socket.close()
+            if self.on_close:
+                self.on_close()
+
+    def process(self, lines):
+        """
+        Dispatches every command from one read burst and sends the replies in
+        a single sendall. Pending replies are flushed early before a command
+        that may use the data connection, so a client waiting on the PASV
+        reply is not deadlocked. Returns True when the session should end.
+        """
+        pending = []
+        for line in lines:
+            if pending and self.session.data_channel.mode:
+                self.client_socket.sendall("".join(pending).encode())
+                pending = []
+            response = self.dispatcher.dispatch(line)
+            pending.append(response)
+            if response.startswith("221"):
+                self.client_socket.sendall("".join(pending).encode())
+                return True
+        if pending:
+            self.client_socket.sendall("".join(pending).encode())
+        return False
@@ -1,58 +1,101 @@
-from ftpserver.commands import access_control, informational, directory_ops, transfer_modes, file_actions
+import time
+from types import MappingProxyType
+from ftpserver.commands import access_control, informational, directory_ops, transfer_modes, file_actions, delta_sync
+from ftpserver.core.session_registry import sessions
+from ftpserver.utils.logger import audit
+from ftpserver.utils.metrics import command_latency
+
+# Command name -> (handler, checked). Built once at import and shared by every
+# session; handlers keep no state of their own, so one instance each is
+# enough. Unchecked commands (login, HELP and the admin commands, which check
+# the role themselves) skip the RBAC check.
+COMMANDS = MappingProxyType({
+    "USER": (access_control.UserCommand(), False),
+    "PASS": (access_control.PassCommand(), False),
+    "QUIT": (access_control.QuitCommand(), False),
+    "NOOP": (informational.NoopCommand(), True),
+    "PWD": (directory_ops.PwdCommand(), True),
+    "CD": (directory_ops.CwdCommand(), True),
+    "LS": (directory_ops.ListCommand(), True),
+    "NLST": (directory_ops.NlstCommand(), True),
+    "PORT": (transfer_modes.PortCommand(), True),
+    "PASV": (transfer_modes.PasvCommand(), True),
+    "TYPE": (transfer_modes.TypeCommand(), True),
+    "MODE": (transfer_modes.ModeCommand(), True),
+    "OPTS": (transfer_modes.OptsCommand(), True),
+    "RETR": (file_actions.RetrCommand(), True),
+    "RETR-RANGE": (file_actions.RetrRangeCommand(), True),
+    "STOR": (file_actions.StorCommand(), True),
+    "ALLO": (file_actions.AlloCommand(), True),
+    "REST": (file_actions.RestCommand(), True),
+    "SIZE": (file_actions.SizeCommand(), True),
+    "MDTM": (file_actions.MdtmCommand(), True),
+    "CAT": (file_actions.CatCommand(), True),
+    "MKDIR": (directory_ops.MkdirCommand(), True),
+    "RMDIR": (directory_ops.RmdirCommand(), True),
+    "RM": (file_actions.RmCommand(), True),
+    "RM-R": (directory_ops.RmRecursiveCommand(), True),
+    "CP": (file_actions.CpCommand(), True),
+    "MV": (file_actions.MvCommand(), True),
+    "LS-L": (directory_ops.LsLongCommand(), True),
+    "MLSD": (directory_ops.MlsdCommand(), True),
+    "STAT": (file_actions.StatCommand(), True),
+    "MLST": (file_actions.MlstCommand(), True),
+    "HASH": (file_actions.HashCommand(), True),
+    "TREE": (directory_ops.TreeCommand(), True),
+    "DELTA-SIG": (delta_sync.DeltaSigCommand(), True),
+    "DELTA-RETR": (delta_sync.DeltaRetrCommand(), True),
+    "DELTA-STOR": (delta_sync.DeltaStorCommand(), True),
+    "TOUCH": (file_actions.TouchCommand(), True),
+    "ECHO": (file_actions.EchoCommand(), True),
+    "HELP": (informational.HelpCommand(), False),
+    # Admin commands
+    "ADDUSER": (access_control.AddUserCommand(), False),
+    "DELUSER": (access_control.DelUserCommand(), False),
+    "SETROLE": (access_control.SetRoleCommand(), False),
+    "GRANT": (access_control.GrantCommand(), False),
+    "REVOKE": (access_control.RevokeCommand(), False),
+    "SETLIMIT": (access_control.SetLimitCommand(), False),
+    "STATS": (informational.StatsCommand(), False),
+    "PROFILE": (informational.ProfileCommand(), False),
+})
+
+# Logins, admin commands and commands that change files get an audit record
+# (transfers are recorded by RETR/STOR themselves, with their byte counts).
+AUDITED_COMMANDS = frozenset({
+    "PASS", "MKDIR", "RMDIR", "RM", "RM-R", "CP", "MV", "TOUCH", "ECHO", "DELTA-STOR",
+    "ADDUSER", "DELUSER", "SETROLE", "GRANT", "REVOKE", "SETLIMIT",
+})
 
 class CommandDispatcher:
+    commands = COMMANDS
+
     def __init__(self, session):
         self.session = session
-        self.commands = {
-            "USER": access_control.UserCommand(),
-            "PASS": access_control.PassCommand(),
-            "QUIT": access_control.QuitCommand(),
-            "NOOP": informational.NoopCommand(),
-            "PWD": directory_ops.PwdCommand(),
-            "CD": directory_ops.CwdCommand(),
-            "LS": directory_ops.ListCommand(),
-            "NLST": directory_ops.NlstCommand(),
-            "PORT": transfer_modes.PortCommand(),
-            "PASV": transfer_modes.PasvCommand(),
-            "RETR": file_actions.RetrCommand(),
-            "STOR": file_actions.StorCommand(),
-            "CAT": file_actions.CatCommand(),
-            "MKDIR": directory_ops.MkdirCommand(),
-            "RMDIR": directory_ops.RmdirCommand(),
-            "RM": file_actions.RmCommand(),
-            "RM-R": directory_ops.RmRecursiveCommand(),
-            "CP": file_actions.CpCommand(),
-            "MV": file_actions.MvCommand(),
-            "LS-L": directory_ops.LsLongCommand(),
-            "STAT": file_actions.StatCommand(),
-            "TOUCH": file_actions.TouchCommand(),
-            "ECHO": file_actions.EchoCommand(),
-            "HELP": informational.HelpCommand(),
-            # Admin commands
-            "ADDUSER": access_control.AddUserCommand(),
-            "DELUSER": access_control.DelUserCommand(),
-            "SETROLE": access_control.SetRoleCommand(),
-            "GRANT": access_control.GrantCommand(),
-            "REVOKE": access_control.RevokeCommand(),
-        }
+        self.profiler = None  # Set while PROFILE is on; see utils.profiling
+        session.id = sessions.add(self)
 
     def dispatch(self, command_line):
-        if not command_line.strip():
+        parts = command_line.split()
+        if not parts:
             return "500 Empty command\r\n"
-
-        parts = command_line.strip().split()
         cmd = parts[0].upper()
-        args = parts[1:] if len(parts) > 1 else []
-
-        handler = self.commands.get(cmd)
-        # Allow login and admin commands without permission check
-        admin_cmds = {"USER", "PASS", "QUIT", "HELP", "ADDUSER", "DELUSER", "SETROLE", "GRANT", "REVOKE"}
-        if handler:
-            if cmd in admin_cmds:
-                return handler.handle(args, self.session)
-            # RBAC: check if user has permission for this command
-            if not (self.session.logged_in and (cmd in getattr(self.session, 'permissions', []) or getattr(self.session, 'role', None) == 'admin')):
-                return f"permission denied for {cmd}\r\n"
-            return handler.handle(args, self.session)
-        else:
+        entry = COMMANDS.get(cmd)
+        if entry is None:
             return "Invalid command\r\n"
+        handler, checked = entry
+        session = self.session
+        # RBAC: session.permissions is a frozenset set at login by PASS
+        if checked and not (session.logged_in and (cmd in session.permissions or session.role == 'admin')):
+            audit("denied", user=session.username, command=cmd)
+            return f"permission denied for {cmd}\r\n"
+        started = time.perf_counter()
+        reply = handler.handle(parts[1:], session)
+        elapsed = time.perf_counter() - started
+        command_latency.observe(elapsed, (cmd,))
+        if cmd in AUDITED_COMMANDS:
+            # Only the first argument is recorded: the rest may be a password.
+            target = parts[1] if len(parts) > 1 and cmd != "PASS" else None
+            audit("command", user=session.username, command=cmd, path=target,
+                  result=reply.strip(), duration=round(elapsed, 6))
+        return reply
@@ -1,37 +1,47 @@
 import socket
+import time
+from ftpserver.core import passive_ports
+from ftpserver.utils.metrics import data_connection_wait
+
+# Seconds RETR/STOR wait to connect to the client in active (PORT) mode; the
+# passive-mode equivalent is passive_ports.PASV_ACCEPT_TIMEOUT.
+ACTIVE_CONNECT_TIMEOUT = 30
 
 class DataChannel:
     def __init__(self):
         self.mode = None
-        self.data_socket = None
+        self.lease = None  # PassiveLease held while in passive mode
         self.client_addr = None  # (host, port)
 
     def set_active(self, host, port):
+        self._release()
         self.mode = "ACTIVE"
         self.client_addr = (host, port)
 
     def set_passive(self):
+        self._release()
+        self.lease = passive_ports.passive_pool.acquire()
         self.mode = "PASSIVE"
-        self.data_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.data_socket.bind(('', 0))  # Bind to random port
-        self.data_socket.listen(1)
-        ip, port = self.data_socket.getsockname()
-        return ip, port
+        return self.lease.address()
 
     def open(self):
+        started = time.monotonic()
         if self.mode == "ACTIVE":
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.connect(self.client_addr)
-            return sock
+            sock = socket.create_connection(self.client_addr, timeout=ACTIVE_CONNECT_TIMEOUT)
+            sock.settimeout(None)
         elif self.mode == "PASSIVE":
-            conn, _ = self.data_socket.accept()
-            return conn
+            sock = self.lease.accept()
         else:
             raise Exception("Data connection mode not set")
+        data_connection_wait.observe(time.monotonic() - started, (self.mode.lower(),))
+        return sock
+
+    def _release(self):
+        if self.lease:
+            self.lease.release()
+            self.lease = None
 
     def close(self):
-        if self.data_socket:
-            self.data_socket.close()
-            self.data_socket = None
+        self._release()
         self.client_addr = None
         self.mode = None
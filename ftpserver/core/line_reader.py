@@ -0,0 +1,36 @@
+# Longest control line accepted from a client, terminator excluded.
+MAX_LINE_LENGTH = 8192
+
+
+class LineTooLong(Exception):
+    pass
+
+
+class LineReader:
+    """
+    Splits a control-connection byte stream into command lines.
+    Accepts CRLF or bare LF terminators, any number of lines per read, and
+    lines split across reads. Raises LineTooLong once an unterminated line
+    grows past max_length.
+    """
+    def __init__(self, max_length=MAX_LINE_LENGTH):
+        self.max_length = max_length
+        self._buf = bytearray()
+
+    def feed(self, data):
+        """Adds received bytes and returns the list of complete lines (as str)."""
+        self._buf += data
+        end = self._buf.rfind(b"\n")
+        if end < 0:
+            if len(self._buf) > self.max_length:
+                raise LineTooLong()
+            return []
+        complete = bytes(self._buf[:end])
+        del self._buf[:end + 1]
+        if len(self._buf) > self.max_length:
+            raise LineTooLong()
+        lines = complete.split(b"\n")
+        for line in lines:
+            if len(line) > self.max_length + 1:
+                raise LineTooLong()
+        return [line.rstrip(b"\r").decode('utf-8', errors='replace') for line in lines]
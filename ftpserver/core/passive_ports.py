@@ -0,0 +1,206 @@
+import collections
+import socket
+import threading
+import time
+from ftpserver.utils.metrics import registry
+
+# Inclusive (first, last) port range for PASV listeners; None lets the OS pick
+# an ephemeral port for every PASV.
+PASV_PORT_RANGE = None
+# Seconds RETR/STOR wait for the client to connect to the passive port.
+PASV_ACCEPT_TIMEOUT = 30
+# Seconds after which a lease that was never used is reclaimed.
+PASV_LEASE_TIMEOUT = 120
+# Seconds PASV waits for a port to free up when the range is exhausted.
+PASV_WAIT_TIMEOUT = 5
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+class PassiveLease:
+    """A listening socket on one passive port, held by a single session."""
+    def __init__(self, pool, sock, port):
+        self.pool = pool
+        self.sock = sock
+        self.port = port
+        self.leased_at = time.monotonic()
+        self.accepting = False
+        self.released = False
+
+    def address(self):
+        return self.sock.getsockname()[:2]
+
+    def accept(self):
+        with self.pool._cond:
+            if self.released:
+                raise ConnectionError("passive data connection expired")
+            self.accepting = True
+        try:
+            self.sock.settimeout(self.pool.accept_timeout)
+            try:
+                conn, _ = self.sock.accept()
+            except socket.timeout:
+                raise TimeoutError("timed out waiting for passive data connection")
+            conn.settimeout(None)
+            return conn
+        finally:
+            self.accepting = False
+
+    def release(self):
+        self.pool.release(self)
+
+
+class PassivePortPool:
+    """
+    Hands out passive-mode listening sockets.
+    With a port range, each port is bound once and its listener is kept open
+    between leases, so busy servers do not churn sockets; leases that are never
+    used are reclaimed after lease_timeout. Without a range every lease gets a
+    fresh ephemeral port, closed on release.
+    """
+    def __init__(self, port_range=None, host='', accept_timeout=PASV_ACCEPT_TIMEOUT,
+                 lease_timeout=PASV_LEASE_TIMEOUT, wait_timeout=PASV_WAIT_TIMEOUT):
+        self.host = host
+        self.port_range = port_range
+        self.accept_timeout = accept_timeout
+        self.lease_timeout = lease_timeout
+        self.wait_timeout = wait_timeout
+        self._cond = threading.Condition()
+        self._free = collections.deque(range(port_range[0], port_range[1] + 1)) if port_range else None
+        self._idle = {}  # port -> listening socket kept open between leases
+        self._leases = {}  # port -> PassiveLease
+        self.metrics = {
+            "leases": 0,
+            "released": 0,
+            "reclaimed": 0,
+            "exhausted": 0,
+            "waits": 0,
+            "wait_seconds_total": 0.0,
+            "bind_errors": 0,
+        }
+
+    def acquire(self):
+        with self._cond:
+            self._reclaim_expired()
+            if self._free is None:
+                sock = self._listen(0)
+                lease = PassiveLease(self, sock, sock.getsockname()[1])
+                self._leases[lease.port] = lease
+                self.metrics["leases"] += 1
+                return lease
+            if not self._free:
+                self._wait_for_port()
+            for _ in range(len(self._free)):
+                port = self._free.popleft()
+                sock = self._idle.pop(port, None)
+                if sock is None:
+                    try:
+                        sock = self._listen(port)
+                    except OSError:
+                        # Port taken by another process; try it again later.
+                        self.metrics["bind_errors"] += 1
+                        self._free.append(port)
+                        continue
+                else:
+                    _drain(sock)
+                lease = PassiveLease(self, sock, port)
+                self._leases[port] = lease
+                self.metrics["leases"] += 1
+                return lease
+            self.metrics["exhausted"] += 1
+            raise PoolExhausted("no free passive ports")
+
+    def _wait_for_port(self):
+        self.metrics["waits"] += 1
+        start = time.monotonic()
+        deadline = start + self.wait_timeout
+        while not self._free:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._cond.wait(min(remaining, 1.0))
+            self._reclaim_expired()
+        self.metrics["wait_seconds_total"] += time.monotonic() - start
+
+    def release(self, lease):
+        with self._cond:
+            if not lease.released:
+                self.metrics["released"] += 1
+                self._return(lease)
+
+    def _return(self, lease):
+        lease.released = True
+        if self._leases.get(lease.port) is lease:
+            del self._leases[lease.port]
+        if self._free is None:
+            lease.sock.close()
+            return
+        _drain(lease.sock)
+        self._idle[lease.port] = lease.sock
+        self._free.append(lease.port)
+        self._cond.notify()
+
+    def _reclaim_expired(self):
+        now = time.monotonic()
+        expired = [l for l in self._leases.values()
+                   if not l.accepting and now - l.leased_at > self.lease_timeout]
+        for lease in expired:
+            self.metrics["reclaimed"] += 1
+            self._return(lease)
+
+    def _listen(self, port):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((self.host, port))
+            sock.listen(1)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self.metrics)
+            stats["in_use"] = len(self._leases)
+            stats["free"] = len(self._free) if self._free is not None else None
+        return stats
+
+    def close(self):
+        with self._cond:
+            for lease in list(self._leases.values()):
+                lease.released = True
+                lease.sock.close()
+            self._leases.clear()
+            for sock in self._idle.values():
+                sock.close()
+            self._idle.clear()
+
+
+def _drain(sock):
+    """Drops connections queued on an idle listener by clients that are not ours."""
+    sock.setblocking(False)
+    try:
+        while True:
+            conn, _ = sock.accept()
+            conn.close()
+    except (BlockingIOError, OSError):
+        pass
+    finally:
+        sock.setblocking(True)
+
+
+passive_pool = PassivePortPool(PASV_PORT_RANGE)
+# Looked up at scrape time, so a pool swapped in by configure() is exported.
+registry.register_stats("pasv", lambda: passive_pool.stats(),
+                        counters=("leases", "released", "reclaimed", "exhausted", "waits", "wait_seconds_total", "bind_errors"))
+
+
+def configure(port_range=None, **kwargs):
+    """Replaces the shared pool, e.g. with the --pasv-ports range from the command line."""
+    global passive_pool
+    old, passive_pool = passive_pool, PassivePortPool(port_range, **kwargs)
+    old.close()
+    return passive_pool
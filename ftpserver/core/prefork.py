@@ -0,0 +1,125 @@
+import os
+import signal
+import time
+from ftpserver.utils.logger import logger, stop as stop_logging
+from ftpserver.utils.throttle import bandwidth
+from ftpserver.utils.filesystem import path_resolver
+from ftpserver.utils.listing_cache import listing_cache
+
+# Seconds a worker gets to finish its sessions after SIGTERM before it is killed.
+DRAIN_TIMEOUT = 30
+# A worker that dies sooner than this after starting is restarted only after
+# RESTART_BACKOFF seconds, so a crash at startup does not turn into a fork loop.
+MIN_WORKER_LIFETIME = 1.0
+RESTART_BACKOFF = 1.0
+
+
+class Supervisor:
+    """
+    Pre-forked multi-process server: forks `processes` workers, each running
+    the accept loop of its own FTPServer on a SO_REUSEPORT socket, so the
+    kernel spreads connections across them and CPU-bound work (bcrypt,
+    hashing, compression, TYPE A conversion) runs on every core.
+
+    Dead workers are restarted. On SIGTERM or SIGINT the supervisor forwards
+    SIGTERM to every worker; a worker stops accepting, lets its sessions run
+    for up to DRAIN_TIMEOUT seconds and exits. Stragglers are then killed.
+
+    Shared state: users.json (users and limits) is re-read by every worker
+    when it changes and written under an flock, bandwidth buckets live in
+    shared memory, and the path resolver and listing caches share their
+    invalidation generation, so a change made through one worker is seen by
+    all. Connection caps (--max-sessions, --max-per-ip) and metrics apply to
+    each worker separately; a worker keeps its slot number (0 .. processes-1)
+    across restarts, e.g. for its metrics port.
+    """
+    def __init__(self, make_server, processes, drain_timeout=DRAIN_TIMEOUT):
+        self.make_server = make_server  # Called with the slot in each worker; must return an FTPServer with reuse_port=True
+        self.processes = processes
+        self.drain_timeout = drain_timeout
+        self.workers = {}  # pid -> (start time, slot)
+        self._stopping = False
+
+    def run(self):
+        bandwidth.share_across_processes()
+        path_resolver.share_across_processes()
+        listing_cache.share_across_processes()
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        logger.info(f"Supervisor {os.getpid()} starting {self.processes} workers")
+        for slot in range(self.processes):
+            self._spawn(slot)
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            worker = self.workers.pop(pid, None)
+            if worker is None or self._stopping:
+                continue
+            started, slot = worker
+            logger.warning(f"Worker {pid} exited ({self._describe(status)}); restarting")
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                time.sleep(RESTART_BACKOFF)
+            if not self._stopping:
+                self._spawn(slot)
+        logger.info("Supervisor stopped")
+
+    def _spawn(self, slot):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = self._worker(slot)
+            except BaseException as e:
+                logger.error(f"Worker {os.getpid()} failed: {e}")
+            finally:
+                stop_logging()  # os._exit skips atexit; write out queued records first
+                os._exit(code)
+        self.workers[pid] = (time.monotonic(), slot)
+
+    def _worker(self, slot):
+        server = self.make_server(slot)
+        draining = []
+
+        def stop(signum, frame):
+            draining.append(time.monotonic())
+            server.stop()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C reaches the supervisor, which drains us
+        server.start()
+        if not draining:
+            return 1  # The accept loop ended without being asked to.
+        deadline = draining[0] + self.drain_timeout
+        while server.admission.stats()["active"] and time.monotonic() < deadline:
+            time.sleep(0.1)
+        return 0
+
+    def _request_stop(self, signum, frame):
+        if self._stopping:
+            return
+        self._stopping = True
+        logger.info(f"Supervisor draining {len(self.workers)} workers")
+        for pid in list(self.workers):
+            self._signal(pid, signal.SIGTERM)
+        signal.signal(signal.SIGALRM, self._kill_stragglers)
+        signal.alarm(int(self.drain_timeout) + 5)
+
+    def _kill_stragglers(self, signum, frame):
+        for pid in list(self.workers):
+            logger.warning(f"Worker {pid} did not drain in time; killing it")
+            self._signal(pid, signal.SIGKILL)
+
+    @staticmethod
+    def _signal(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    @staticmethod
+    def _describe(status):
+        if os.WIFSIGNALED(status):
+            return f"signal {os.WTERMSIG(status)}"
+        return f"exit code {os.waitstatus_to_exitcode(status)}"
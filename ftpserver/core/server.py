@@ -1,23 +1,156 @@
+import argparse
+import logging
 import socket
 import threading
+import time
+from functools import partial
 from ftpserver.core.client_handler import ClientHandler
+from ftpserver.core.async_server import AsyncFTPServer, DEFAULT_EXECUTOR_WORKERS
+from ftpserver.core import passive_ports
+from ftpserver.core.prefork import Supervisor
+from ftpserver.core.admission import (
+    AdmissionController, reject, MAX_SESSIONS, MAX_SESSIONS_PER_IP, LISTEN_BACKLOG,
+    IDLE_TIMEOUT, ACCEPT_BACKOFF, RESOURCE_ERRNOS,
+)
+from ftpserver.utils import logger as log
 from ftpserver.utils.logger import logger
+from ftpserver.utils.metrics import registry, MetricsServer, METRICS_HOST
+
+SERVER_MODES = ("threaded", "asyncio")
 
 class FTPServer:
-    def __init__(self, host='0.0.0.0', port=21):
+    def __init__(self, host='0.0.0.0', port=21, mode='threaded', workers=DEFAULT_EXECUTOR_WORKERS,
+                 max_sessions=MAX_SESSIONS, max_per_ip=MAX_SESSIONS_PER_IP,
+                 backlog=LISTEN_BACKLOG, idle_timeout=IDLE_TIMEOUT, reuse_port=False,
+                 metrics_port=0, metrics_host=METRICS_HOST):
+        if mode not in SERVER_MODES:
+            raise ValueError(f"Unknown server mode '{mode}'. Allowed: {', '.join(SERVER_MODES)}")
         self.host = host
         self.port = port
+        self.mode = mode
+        self.workers = workers
+        self.backlog = backlog
+        self.idle_timeout = idle_timeout or None
+        self.reuse_port = reuse_port  # Set by pre-forked workers that each bind the same port
+        self.admission = AdmissionController(max_sessions, max_per_ip)
+        registry.register_stats("sessions", self.admission.stats,
+                                counters=("admitted", "rejected_total", "rejected_per_ip"))
+        self.metrics_port = metrics_port  # Prometheus endpoint on metrics_host; 0 = off
+        self.metrics_host = metrics_host
+        self._metrics_server = None
+        self._stopping = threading.Event()
+        self._listener = None
+        self._async_server = None
 
     def start(self):
-        logger.info(f"Starting FTP Server on {self.host}:{self.port}")
+        logger.info(f"Starting FTP Server on {self.host}:{self.port} ({self.mode} mode)")
+        if self.metrics_port:
+            self._metrics_server = MetricsServer(self.metrics_host, self.metrics_port).start()
+            logger.info(f"Serving metrics on http://{self.metrics_host}:{self._metrics_server.port}/metrics")
+        if self.mode == "asyncio":
+            self._async_server = AsyncFTPServer(self.host, self.port, workers=self.workers,
+                                                admission=self.admission, backlog=self.backlog,
+                                                idle_timeout=self.idle_timeout, reuse_port=self.reuse_port)
+            if self._stopping.is_set():
+                return
+            self._async_server.start()
+            return
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
             server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if self.reuse_port:
+                server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             server_socket.bind((self.host, self.port))
-            server_socket.listen(5)
+            server_socket.listen(self.backlog)
+            self._listener = server_socket
             logger.info("Server is listening for connections...")
+            self._accept_loop(server_socket)
 
-            while True:
+    def _accept_loop(self, server_socket):
+        while not self._stopping.is_set():
+            try:
                 client_sock, addr = server_socket.accept()
-                logger.info(f"Connection from {addr}")
-                handler = ClientHandler(client_sock, addr)
+            except OSError as e:
+                if self._stopping.is_set():
+                    break
+                if e.errno in RESOURCE_ERRNOS:
+                    # Out of descriptors: leave connections in the backlog
+                    # until sessions finish instead of dying.
+                    logger.warning(f"accept failed ({e}); backing off")
+                    time.sleep(ACCEPT_BACKOFF)
+                    continue
+                raise
+            reply = self.admission.admit(addr[0])
+            if reply is not None:
+                reject(client_sock, reply)
+                continue
+            logger.info(f"Connection from {addr}")
+            handler = ClientHandler(client_sock, addr, idle_timeout=self.idle_timeout,
+                                    on_close=partial(self.admission.release, addr[0]))
+            try:
                 handler.start()
+            except RuntimeError as e:
+                # Cannot start another thread: shed this client.
+                logger.warning(f"cannot start handler ({e}); rejecting {addr}")
+                self.admission.release(addr[0])
+                reject(client_sock, b"421 Server busy, try again later\r\n")
+
+    def stop(self):
+        """Stops accepting connections; sessions already running finish on their own."""
+        self._stopping.set()
+        if self._metrics_server is not None:
+            self._metrics_server.stop()
+        if self._async_server is not None:
+            self._async_server.stop()
+        if self._listener is not None:
+            try:
+                self._listener.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._listener.close()
+
+def parse_port_range(text):
+    first, _, last = text.partition("-")
+    first, last = int(first), int(last or first)
+    if not 0 < first <= last < 65536:
+        raise argparse.ArgumentTypeError(f"invalid port range '{text}'")
+    return first, last
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Custom FTP server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=2121)
+    parser.add_argument("--mode", choices=SERVER_MODES, default="threaded",
+                        help="threaded: one thread per client; asyncio: one coroutine per client")
+    parser.add_argument("--workers", type=int, default=DEFAULT_EXECUTOR_WORKERS,
+                        help="executor size for blocking commands in asyncio mode")
+    parser.add_argument("--pasv-ports", type=parse_port_range, default=None, metavar="FIRST-LAST",
+                        help="port range for passive data connections (default: any ephemeral port)")
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS,
+                        help="most concurrent control connections (0 = unlimited)")
+    parser.add_argument("--max-per-ip", type=int, default=MAX_SESSIONS_PER_IP,
+                        help="most concurrent control connections per client address (0 = unlimited)")
+    parser.add_argument("--backlog", type=int, default=LISTEN_BACKLOG, help="listen() backlog")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT,
+                        help="seconds before an idle control connection is closed (0 = never)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="pre-fork this many worker processes sharing the port via SO_REUSEPORT")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="serve Prometheus metrics on this port (0 = off); "
+                             "pre-forked workers use consecutive ports from here")
+    parser.add_argument("--metrics-host", default=METRICS_HOST)
+    parser.add_argument("--log-level", choices=("DEBUG", "INFO", "WARNING", "ERROR"), default="INFO")
+    parser.add_argument("--audit-log", default=log.AUDIT_LOG_PATH, metavar="PATH",
+                        help="JSON-lines audit and transfer log, rotated at 50 MiB (empty = off)")
+    args = parser.parse_args(argv)
+    log.configure(getattr(logging, args.log_level), args.audit_log or None)
+    if args.pasv_ports:
+        passive_ports.configure(args.pasv_ports)
+    make_server = partial(FTPServer, host=args.host, port=args.port, mode=args.mode, workers=args.workers,
+                          max_sessions=args.max_sessions, max_per_ip=args.max_per_ip,
+                          backlog=args.backlog, idle_timeout=args.idle_timeout, metrics_host=args.metrics_host)
+    if args.processes > 1:
+        def make_worker(slot):
+            return make_server(reuse_port=True, metrics_port=args.metrics_port and args.metrics_port + slot)
+        Supervisor(make_worker, args.processes).run()
+    else:
+        make_server(metrics_port=args.metrics_port).start()
@@ -1,10 +1,20 @@
 from ftpserver.core.data_channel import DataChannel
+from ftpserver.utils.transfer import DEFLATE_LEVEL
 
 class FTPSession:
     def __init__(self):
+        self.id = None  # Assigned by the session registry when a dispatcher is created
         self.username = None
         self.logged_in = False
+        self.role = None
+        self.permissions = frozenset()  # Commands this user may run, set by PASS
         self.cwd = "/"
-        self.transfer_type = "A"
+        # Raw bytes until the client asks for TYPE A; RETR and STOR have
+        # always moved files unconverted and existing clients rely on it.
+        self.transfer_type = "I"
+        self.transfer_mode = "S"  # S (stream) or Z (deflate), set by MODE
+        self.deflate_level = DEFLATE_LEVEL  # zlib level for MODE Z, set by OPTS MODE Z LEVEL
+        self.allocate_size = None  # Bytes announced by ALLO for the next STOR
+        self.rest_offset = 0  # Byte offset set by REST for the next RETR/STOR
         self.data_channel = DataChannel()
         self._user_db = {}  # Add this line
\ No newline at end of file
@@ -0,0 +1,43 @@
+import itertools
+import threading
+import weakref
+
+
+class SessionRegistry:
+    """
+    Live control sessions of this process by id, for admin commands that act
+    on other sessions (PROFILE). Dispatchers are held weakly, so a session
+    drops out as soon as its connection handler is gone. With --processes
+    each worker only sees its own sessions.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._dispatchers = weakref.WeakValueDictionary()
+
+    def add(self, dispatcher):
+        """Registers a dispatcher and returns its session id."""
+        with self._lock:
+            session_id = next(self._ids)
+            self._dispatchers[session_id] = dispatcher
+        return session_id
+
+    def get(self, session_id):
+        with self._lock:
+            return self._dispatchers.get(session_id)
+
+    def find(self, target):
+        """Dispatchers for a session id ("7") or for every logged-in session of a username."""
+        with self._lock:
+            if target.isdigit():
+                dispatcher = self._dispatchers.get(int(target))
+                return [dispatcher] if dispatcher is not None else []
+            return [d for d in self._dispatchers.values()
+                    if d.session.logged_in and d.session.username == target]
+
+    def all(self):
+        with self._lock:
+            return sorted(self._dispatchers.items())
+
+
+sessions = SessionRegistry()
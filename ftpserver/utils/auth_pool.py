@@ -0,0 +1,66 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class VerifierBusy(Exception):
+    """Raised when the verification queue is full; callers should reply 421."""
+
+
+class PasswordVerifier:
+    """
+    Runs password checks on a dedicated, bounded thread pool.
+    - At most `workers` checks burn CPU at once; up to `max_pending` more may queue.
+    - Anything beyond that is rejected immediately with VerifierBusy.
+    - Successful checks can be remembered for `cache_ttl` seconds, keyed on the
+      username, the stored hash and an HMAC of the password (never the password itself).
+    """
+    def __init__(self, check, workers=2, max_pending=64, cache_ttl=0):
+        self._check = check
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ftp-auth")
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._cache_ttl = cache_ttl
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self._secret = os.urandom(32)
+
+    def verify(self, username, stored_hash, password):
+        digest = hmac.new(self._secret, password.encode(), hashlib.sha256).digest()
+        if self._cache_ttl and self._cached(username, stored_hash, digest):
+            return True
+        if not self._slots.acquire(blocking=False):
+            raise VerifierBusy()
+        try:
+            future = self._executor.submit(self._check, stored_hash, password)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        ok = future.result()
+        if ok and self._cache_ttl:
+            with self._cache_lock:
+                self._cache[username] = (stored_hash, digest, time.monotonic() + self._cache_ttl)
+        return ok
+
+    def _cached(self, username, stored_hash, digest):
+        entry = self._cache.get(username)
+        if entry is None:
+            return False
+        cached_hash, cached_digest, expires = entry
+        if time.monotonic() >= expires:
+            with self._cache_lock:
+                if self._cache.get(username) is entry:
+                    del self._cache[username]
+            return False
+        return cached_hash == stored_hash and hmac.compare_digest(cached_digest, digest)
+
+    def invalidate(self, username):
+        with self._cache_lock:
+            self._cache.pop(username, None)
+
+    def clear(self):
+        with self._cache_lock:
+            self._cache.clear()
@@ -0,0 +1,271 @@
+"""
+rsync-style block delta encoding.
+
+A signature describes a base file as fixed-size blocks, each with a weak
+rolling checksum (Adler-32) and a strong hash (BLAKE2b-128). Given a
+signature, generate_delta() scans a new version of the file with the rolling
+checksum and emits COPY instructions for blocks the base already has and
+LITERAL runs for everything else; apply_delta() rebuilds the new file from
+the base and that instruction stream. Files are streamed; neither side is
+ever loaded into memory.
+
+Wire formats (big-endian):
+    signature: header >IQQI (block_size, file_size, mtime_ns, count),
+               then count records of >I16s (weak, strong)
+    delta:     header >IQQ (block_size, base_size, base_mtime_ns), then ops:
+               b'C' >II (first block, block count)
+               b'L' >I  (length) followed by that many literal bytes
+               b'E'     end of stream
+"""
+import hashlib
+import os
+import struct
+import zlib
+
+DELTA_BLOCK_SIZE = 32 * 1024
+# Block sizes accepted from clients; the rolling window is held in memory.
+MIN_BLOCK_SIZE = 512
+MAX_BLOCK_SIZE = 1024 * 1024
+# Longest literal run buffered before it is flushed to the output.
+MAX_LITERAL = 1024 * 1024
+_READ_SIZE = 1024 * 1024
+
+SIG_HEADER = struct.Struct(">IQQI")
+SIG_BLOCK = struct.Struct(">I16s")
+DELTA_HEADER = struct.Struct(">IQQ")
+_COPY = struct.Struct(">II")
+_LEN = struct.Struct(">I")
+_MOD = 65521
+
+
+class DeltaError(Exception):
+    pass
+
+
+def _check_block_size(block_size):
+    if not MIN_BLOCK_SIZE <= block_size <= MAX_BLOCK_SIZE:
+        raise DeltaError(f"block size {block_size} out of range")
+
+
+def strong_hash(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def iter_block_sums(f, block_size=DELTA_BLOCK_SIZE):
+    """Yields (weak, strong) for consecutive blocks of a binary file object."""
+    buf = bytearray(block_size)
+    view = memoryview(buf)
+    while True:
+        n = f.readinto(buf)
+        if not n:
+            return
+        block = view[:n]
+        yield zlib.adler32(block), strong_hash(block)
+
+
+def encode_signature(blocks, block_size, file_size, mtime_ns):
+    blocks = list(blocks)
+    parts = [SIG_HEADER.pack(block_size, file_size, mtime_ns, len(blocks))]
+    parts.extend(SIG_BLOCK.pack(weak, strong) for weak, strong in blocks)
+    return b"".join(parts)
+
+
+def file_signature(path, block_size=DELTA_BLOCK_SIZE):
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        return encode_signature(iter_block_sums(f, block_size), block_size, st.st_size, st.st_mtime_ns)
+
+
+class Signature:
+    def __init__(self, data):
+        if len(data) < SIG_HEADER.size:
+            raise DeltaError("truncated signature")
+        self.block_size, self.file_size, self.mtime_ns, count = SIG_HEADER.unpack_from(data)
+        _check_block_size(self.block_size)
+        if len(data) != SIG_HEADER.size + count * SIG_BLOCK.size:
+            raise DeltaError("malformed signature")
+        self.blocks = [SIG_BLOCK.unpack_from(data, SIG_HEADER.size + i * SIG_BLOCK.size)
+                       for i in range(count)]
+        self.by_weak = {}
+        for index, (weak, strong) in enumerate(self.blocks):
+            self.by_weak.setdefault(weak, {}).setdefault(strong, index)
+
+    def block_length(self, index):
+        if index == len(self.blocks) - 1:
+            return self.file_size - index * self.block_size
+        return self.block_size
+
+    def find(self, weak, data):
+        """Index of a base block with this content, or None."""
+        candidates = self.by_weak.get(weak)
+        if candidates is None:
+            return None
+        index = candidates.get(strong_hash(data))
+        if index is not None and self.block_length(index) == len(data):
+            return index
+        return None
+
+
+class _DeltaWriter:
+    """Accumulates delta ops, merging runs of consecutive block copies."""
+    def __init__(self):
+        self.out = []
+        self.copy_start = 0
+        self.copy_count = 0
+
+    def literal(self, data):
+        if data:
+            self._flush_copy()
+            self.out.append(b'L' + _LEN.pack(len(data)))
+            self.out.append(data)
+
+    def copy(self, index):
+        if self.copy_count and self.copy_start + self.copy_count == index:
+            self.copy_count += 1
+        else:
+            self._flush_copy()
+            self.copy_start, self.copy_count = index, 1
+
+    def _flush_copy(self):
+        if self.copy_count:
+            self.out.append(b'C' + _COPY.pack(self.copy_start, self.copy_count))
+            self.copy_count = 0
+
+    def finish(self):
+        self._flush_copy()
+        self.out.append(b'E')
+
+    def drain(self):
+        out, self.out = self.out, []
+        return out
+
+
+def generate_delta(f, signature):
+    """
+    Yields the delta stream (bytes chunks) that turns the signature's base
+    into the contents of binary file object f. Matching blocks cost one
+    zlib.adler32 and a dict lookup; only unmatched regions are scanned byte
+    by byte with the rolling checksum. With an empty signature (no base)
+    nothing can match, so the file is sent as literals without scanning.
+    """
+    L = signature.block_size
+    yield DELTA_HEADER.pack(L, signature.file_size, signature.mtime_ns)
+    writer = _DeltaWriter()
+    if not signature.by_weak:
+        while True:
+            chunk = f.read(MAX_LITERAL)
+            if not chunk:
+                break
+            writer.literal(chunk)
+            yield from writer.drain()
+        writer.finish()
+        yield from writer.drain()
+        return
+    by_weak = signature.by_weak
+    buf = bytearray()
+    pos = 0   # start of the rolling window in buf
+    lit = 0   # first byte in buf not yet emitted
+    eof = False
+    weak = a = b = None
+    while True:
+        while not eof and len(buf) < pos + L + 1:
+            chunk = f.read(_READ_SIZE)
+            if chunk:
+                buf += chunk
+            else:
+                eof = True
+        avail = len(buf) - pos
+        if avail < L:
+            break
+        if weak is None:
+            weak = zlib.adler32(buf[pos:pos + L])
+            a, b = weak & 0xFFFF, weak >> 16
+        if weak in by_weak:
+            index = signature.find(weak, bytes(buf[pos:pos + L]))
+            if index is not None:
+                writer.literal(bytes(buf[lit:pos]))
+                writer.copy(index)
+                pos += L
+                lit = pos
+                weak = None
+                if pos >= MAX_LITERAL:
+                    del buf[:pos]
+                    pos = lit = 0
+                yield from writer.drain()
+                continue
+        if avail == L:
+            break  # The window already ends at EOF.
+        out_byte = buf[pos]
+        a = (a - out_byte + buf[pos + L]) % _MOD
+        b = (b - L * out_byte + a - 1) % _MOD
+        weak = (b << 16) | a
+        pos += 1
+        if pos - lit >= MAX_LITERAL:
+            writer.literal(bytes(buf[lit:pos]))
+            del buf[:pos]
+            pos = lit = 0
+            yield from writer.drain()
+    # The base's last block may be shorter than L; it can only match at EOF.
+    if signature.blocks:
+        last = len(signature.blocks) - 1
+        short = signature.block_length(last)
+        if 0 < short < L and len(buf) - short >= lit:
+            tail = bytes(buf[len(buf) - short:])
+            index = signature.find(zlib.adler32(tail), tail)
+            if index is not None:
+                writer.literal(bytes(buf[lit:len(buf) - short]))
+                writer.copy(index)
+                lit = len(buf)
+    writer.literal(bytes(buf[lit:]))
+    writer.finish()
+    yield from writer.drain()
+
+
+def _read_exact(stream, n):
+    data = stream.read(n)
+    if len(data) != n:
+        raise DeltaError("truncated delta stream")
+    return data
+
+
+def read_delta_header(stream):
+    """Returns (block_size, base_size, base_mtime_ns) from the start of a delta stream."""
+    header = DELTA_HEADER.unpack(_read_exact(stream, DELTA_HEADER.size))
+    _check_block_size(header[0])
+    return header
+
+
+def apply_delta(stream, base, out, block_size, base_size):
+    """
+    Reads ops (after the header) from a binary stream and writes the rebuilt
+    file to `out`, copying matched blocks from the seekable `base`.
+    Returns the number of bytes written.
+    """
+    written = 0
+    while True:
+        op = _read_exact(stream, 1)
+        if op == b'E':
+            return written
+        if op == b'C':
+            start, count = _COPY.unpack(_read_exact(stream, _COPY.size))
+            offset = start * block_size
+            length = min(count * block_size, base_size - offset)
+            if count == 0 or length <= 0:
+                raise DeltaError("copy outside the base file")
+            base.seek(offset)
+            while length:
+                data = base.read(min(length, _READ_SIZE))
+                if not data:
+                    raise DeltaError("base file shrank during delta")
+                out.write(data)
+                length -= len(data)
+                written += len(data)
+        elif op == b'L':
+            (length,) = _LEN.unpack(_read_exact(stream, _LEN.size))
+            while length:
+                data = _read_exact(stream, min(length, _READ_SIZE))
+                out.write(data)
+                length -= len(data)
+                written += len(data)
+        else:
+            raise DeltaError(f"unknown delta op {op!r}")
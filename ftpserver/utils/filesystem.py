@@ -1,16 +1,106 @@
 import os
+import threading
+from ftpserver.utils.generation import SharedGeneration
 
 BASE_DIR = os.path.abspath("server_files/users")  # Jail root
+# Most (cwd, path) resolutions kept; the cache is emptied when it grows past this.
+RESOLVE_CACHE_SIZE = 16384
+
+
+class PathResolver:
+    """
+    Maps (session cwd, client path) to a path inside the jail.
+
+    A path is accepted only if its lexically normalised form and its realpath
+    (every symlink along it followed) are both inside the jail, so a symlink
+    in the jail cannot lead out of it.
+
+    Accepted results are cached in a dict of dicts keyed by cwd and then path,
+    so a hit allocates nothing. Only paths that exist (dangling links do not)
+    are cached: a missing path may later be created as a symlink, e.g. by CP
+    copying a relative link, and must be checked again then. Commands that
+    rename, remove or copy trees (MV, RMDIR, RM-R, CP) call invalidate(),
+    which bumps the generation and drops the cache; a resolution that raced
+    with an invalidation is not stored. After share_across_processes() the
+    generation lives in shared memory and is compared on every lookup, so an
+    invalidation in one pre-forked worker empties every worker's cache.
+    Links made behind the server's back are checked when the cache next drops
+    the paths through them.
+    """
+    def __init__(self, root=BASE_DIR, max_entries=RESOLVE_CACHE_SIZE):
+        self.root = root
+        self.real_root = os.path.realpath(root)
+        self.max_entries = max_entries
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._cache = {}  # cwd -> {path: resolved}
+        self._size = 0
+        self._shared = None
+
+    def share_across_processes(self):
+        """Moves the generation to shared memory; call in the parent before forking workers."""
+        with self._lock:
+            self._shared = SharedGeneration()
+            self.generation = self._shared.get()
+            self._cache = {}
+            self._size = 0
+
+    def resolve(self, cwd, path):
+        shared = self._shared
+        if shared is not None and shared.get() != self.generation:
+            self._sync()
+        entries = self._cache.get(cwd)
+        if entries is not None:
+            resolved = entries.get(path)
+            if resolved is not None:
+                return resolved
+        generation = self.generation
+        resolved = self._check(cwd, path)
+        if not os.path.exists(resolved):
+            return resolved
+        with self._lock:
+            if generation == self.generation and (shared is None or shared.get() == generation):
+                if self._size >= self.max_entries:
+                    self._cache = {}
+                    self._size = 0
+                self._cache.setdefault(cwd, {})[path] = resolved
+                self._size += 1
+        return resolved
+
+    def _check(self, cwd, path):
+        new_path = os.path.normpath(os.path.join(self.root, cwd.strip("/"), path))
+        if os.path.commonpath([self.root, new_path]) != self.root:
+            raise ValueError("Access denied: Attempted directory traversal.")
+        real = os.path.realpath(new_path)
+        if real != self.real_root and not real.startswith(self.real_root + os.sep):
+            raise ValueError("Access denied: Path leads outside the jail.")
+        return new_path
+
+    def _sync(self):
+        """Another worker invalidated: adopt its generation and drop the cache."""
+        with self._lock:
+            self.generation = self._shared.get()
+            self._cache = {}
+            self._size = 0
+
+    def invalidate(self):
+        with self._lock:
+            if self._shared is not None:
+                self.generation = self._shared.bump()
+            else:
+                self.generation += 1
+            self._cache = {}
+            self._size = 0
+
+
+path_resolver = PathResolver()
 
 def resolve_path(cwd, path):
     """
     Safely resolve path relative to current working directory.
-    Prevents path traversal outside BASE_DIR.
+    Prevents path traversal, including through symlinks, outside BASE_DIR.
     """
-    new_path = os.path.normpath(os.path.join(BASE_DIR, cwd.strip("/"), path))
-    if os.path.commonpath([BASE_DIR, new_path]) != BASE_DIR:
-        raise ValueError("Access denied: Attempted directory traversal.")
-    return new_path
+    return path_resolver.resolve(cwd, path)
 
 def list_dir(path):
     return os.listdir(path)
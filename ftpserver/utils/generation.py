@@ -0,0 +1,27 @@
+import mmap
+import multiprocessing
+import struct
+
+
+class SharedGeneration:
+    """
+    A counter in an anonymous shared mapping, created before the server forks
+    its workers (see core.prefork). Per-process caches bump it when they
+    invalidate and compare it on every hit, so an invalidation in one worker
+    empties the same cache in all of them.
+    """
+    VALUE = struct.Struct("<Q")
+
+    def __init__(self):
+        self._map = mmap.mmap(-1, self.VALUE.size)
+        self._lock = multiprocessing.Lock()
+
+    def get(self):
+        return self.VALUE.unpack_from(self._map)[0]
+
+    def bump(self):
+        """Advances the counter and returns the new value."""
+        with self._lock:
+            value = self.get() + 1
+            self.VALUE.pack_into(self._map, 0, value)
+        return value
@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ftpserver.utils.filesystem import BASE_DIR
+from ftpserver.utils.delta import DELTA_BLOCK_SIZE, file_signature
+
+# Lives next to the jail, not inside it, so clients can never list or fetch it.
+INDEX_PATH = os.path.join(os.path.dirname(BASE_DIR), ".hashindex.sqlite")
+
+
+class ContentIndex:
+    """
+    Persistent map of every file under the jail to its size, mtime and block
+    signature (see utils.delta), stored in SQLite.
+    Mutating commands report changes here; signatures are recomputed on one
+    background thread so a STOR reply never waits for hashing. signature()
+    always checks size and mtime first, so a stale or missing row only costs
+    a recompute, never a wrong answer.
+    """
+    def __init__(self, db_path=INDEX_PATH, root=BASE_DIR, block_size=DELTA_BLOCK_SIZE):
+        self.db_path = db_path
+        self.root = root
+        self.block_size = block_size
+        self._db = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ftp-index")
+        self._scheduled = set()
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER,"
+                " block_size INTEGER, signature BLOB)"
+            )
+            self._db = db
+        return self._db
+
+    def _key(self, path):
+        return os.path.relpath(path, self.root)
+
+    def signature(self, path):
+        """Returns the encoded block signature of a file, recomputing it if the row is stale."""
+        st = os.stat(path)
+        key = self._key(path)
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT size, mtime_ns, block_size, signature FROM files WHERE path = ?", (key,)
+            ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns and row[2] == self.block_size:
+            return row[3]
+        return self._store(path, key)
+
+    def _store(self, path, key):
+        signature = file_signature(path, self.block_size)
+        st = os.stat(path)
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO files (path, size, mtime_ns, block_size, signature)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, st.st_size, st.st_mtime_ns, self.block_size, signature),
+                )
+        return signature
+
+    def file_changed(self, path):
+        """Schedules a background refresh of path (a file, or every file under a directory)."""
+        with self._lock:
+            if path in self._scheduled:
+                return
+            self._scheduled.add(path)
+        self._executor.submit(self._refresh, path)
+
+    def _refresh(self, path):
+        with self._lock:
+            self._scheduled.discard(path)
+        try:
+            if os.path.isdir(path):
+                for dirpath, _, filenames in os.walk(path):
+                    for name in filenames:
+                        full = os.path.join(dirpath, name)
+                        if not os.path.islink(full):
+                            self.signature(full)
+            elif os.path.isfile(path) and not os.path.islink(path):
+                self.signature(path)
+        except (OSError, sqlite3.Error):
+            pass  # Gone or unreadable by now; signature() will recompute on demand.
+
+    def moved(self, src, dst):
+        old, new = self._key(src), self._key(dst)
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.execute("DELETE FROM files WHERE path = ? OR substr(path, 1, ?) = ?",
+                           (new, len(new) + 1, new + os.sep))
+                db.execute("UPDATE files SET path = ? || substr(path, ?) WHERE path = ? OR substr(path, 1, ?) = ?",
+                           (new, len(old) + 1, old, len(old) + 1, old + os.sep))
+
+    def removed(self, path):
+        key = self._key(path)
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.execute("DELETE FROM files WHERE path = ? OR substr(path, 1, ?) = ?",
+                           (key, len(key) + 1, key + os.sep))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+content_index = ContentIndex()
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Threads hashing file contents; hashlib and zlib release the GIL on large
+# buffers, so these run in parallel with each other and with the sessions.
+HASH_WORKERS = 4
+HASH_CHUNK_SIZE = 1024 * 1024
+# Number of (file identity, algorithm) -> digest results remembered.
+HASH_CACHE_SIZE = 16384
+DEFAULT_ALGORITHM = "SHA-256"
+
+
+class _Crc32:
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return f"{self.value:08x}"
+
+
+ALGORITHMS = {
+    "SHA-256": hashlib.sha256,
+    "SHA-1": hashlib.sha1,
+    "CRC32": _Crc32,
+}
+
+
+def normalize_algorithm(name):
+    """Maps user input such as 'sha256' or 'SHA-256' to a key of ALGORITHMS."""
+    key = name.upper()
+    if key not in ALGORITHMS:
+        key = key.replace("SHA", "SHA-", 1) if key.startswith("SHA") and "-" not in key else key
+    if key not in ALGORITHMS:
+        raise ValueError(f"unsupported hash algorithm '{name}'. Allowed: {', '.join(ALGORITHMS)}")
+    return key
+
+
+class FileHasher:
+    """
+    Computes file digests on a thread pool with chunked reads, caching results
+    by (device, inode, size, mtime_ns, algorithm) so an unchanged file is
+    never read twice.
+    """
+    def __init__(self, workers=HASH_WORKERS, cache_size=HASH_CACHE_SIZE):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ftp-hash")
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def _key(self, st, algorithm):
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, algorithm)
+
+    def cached(self, st, algorithm):
+        key = self._key(st, algorithm)
+        with self._lock:
+            digest = self._cache.get(key)
+            if digest is not None:
+                self._cache.move_to_end(key)
+            return digest
+
+    def submit(self, path, algorithm, st=None):
+        """Returns a Future with the hex digest; already resolved on a cache hit."""
+        st = st or os.stat(path)
+        digest = self.cached(st, algorithm)
+        if digest is not None:
+            future = Future()
+            future.set_result(digest)
+            return future
+        return self._executor.submit(self._compute, path, algorithm, st)
+
+    def digest(self, path, algorithm, st=None):
+        return self.submit(path, algorithm, st).result()
+
+    def _compute(self, path, algorithm, st):
+        h = ALGORITHMS[algorithm]()
+        buf = bytearray(HASH_CHUNK_SIZE)
+        view = memoryview(buf)
+        with open(path, 'rb') as f:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                h.update(view[:n])
+            after = os.fstat(f.fileno())
+        digest = h.hexdigest()
+        # Only cache if the file did not change while we were reading it.
+        if self._key(after, algorithm) == self._key(st, algorithm):
+            with self._lock:
+                self._cache[self._key(st, algorithm)] = digest
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return digest
+
+
+file_hasher = FileHasher()
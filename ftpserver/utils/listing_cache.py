@@ -0,0 +1,111 @@
+import os
+import threading
+from collections import OrderedDict
+from ftpserver.utils.generation import SharedGeneration
+
+# Maximum number of rendered listings kept in memory (LS, NLST and LS-L of a
+# directory count as separate entries).
+LISTING_CACHE_SIZE = 256
+
+
+class ListingCache:
+    """
+    Size-bounded LRU of rendered directory listings, keyed on (resolved path, kind).
+    An entry is served only while the directory's inode and mtime are unchanged,
+    which costs one stat per request. Commands that change files inside a
+    directory without touching its mtime (STOR over an existing file, ECHO,
+    TOUCH) must call invalidate() themselves. After share_across_processes()
+    any invalidation bumps a generation in shared memory, and every
+    pre-forked worker drops its whole cache when it sees the bump.
+    """
+    def __init__(self, max_entries=LISTING_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (path, kind) -> (stamp, rendered)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._shared = None
+
+    def share_across_processes(self):
+        """Moves the generation to shared memory; call in the parent before forking workers."""
+        with self._lock:
+            self._shared = SharedGeneration()
+            self.generation = self._shared.get()
+            self._entries.clear()
+
+    def _sync(self):
+        """Drops the cache if another worker invalidated since the last call; under the lock."""
+        if self._shared is not None:
+            generation = self._shared.get()
+            if generation != self.generation:
+                self.generation = generation
+                self._entries.clear()
+
+    def lookup(self, path, kind):
+        """Returns the cached rendering of path if it is still fresh, else None."""
+        st = os.stat(path)
+        key = (path, kind)
+        with self._lock:
+            self._sync()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == (st.st_ino, st.st_mtime_ns):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        return None
+
+    def get(self, path, kind, render):
+        """Returns the cached rendering of path, calling render(path) on a miss."""
+        st = os.stat(path)
+        stamp = (st.st_ino, st.st_mtime_ns)
+        key = (path, kind)
+        with self._lock:
+            self._sync()
+            generation = self.generation
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        # Rendered outside the lock; the stamp was taken first, so a change
+        # made while rendering leaves a stale stamp and the next call re-renders.
+        rendered = render(path)
+        with self._lock:
+            self.misses += 1
+            self._sync()
+            if generation != self.generation:
+                return rendered  # Invalidated while rendering; do not store
+            self._entries[key] = (stamp, rendered)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return rendered
+
+    def invalidate(self, path, recursive=False):
+        """
+        Drops cached listings of the directory containing `path`; with
+        recursive=True also those of `path` itself and everything under it
+        (for removed, moved or replaced directories).
+        """
+        parent = os.path.dirname(path)
+        prefix = path.rstrip(os.sep) + os.sep
+        with self._lock:
+            if self._shared is not None:
+                generation = self._shared.bump()
+                if generation != self.generation + 1:
+                    self._entries.clear()  # Another worker invalidated too
+                self.generation = generation
+            else:
+                self.generation += 1
+            for key in list(self._entries):
+                p = key[0]
+                if p == parent or (recursive and (p == path or p.startswith(prefix))):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+listing_cache = ListingCache()
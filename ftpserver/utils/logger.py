@@ -1,12 +1,137 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import threading
+from ftpserver.utils.filesystem import BASE_DIR
+from ftpserver.utils.metrics import registry
+
+# Records waiting for the writer thread. When the queue is full new records
+# are dropped and counted instead of blocking the session that logged them.
+LOG_QUEUE_SIZE = 10000
+LOG_LEVEL = logging.INFO
+# JSON-lines audit trail (logins, admin and file-changing commands, transfers).
+AUDIT_LOG_PATH = os.path.join(os.path.dirname(BASE_DIR), "audit.log")
+AUDIT_MAX_BYTES = 50 << 20
+AUDIT_BACKUP_COUNT = 5
 
 logger = logging.getLogger("ftpserver")
-logger.setLevel(logging.DEBUG)
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+# Child of "ftpserver", so its records go through the same queue; its own
+# level keeps auditing on when the server log is turned down.
+audit_logger = logging.getLogger("ftpserver.audit")
+audit_logger.setLevel(logging.INFO)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the caller: records that do not fit are counted in `dropped`."""
+    def __init__(self, q):
+        super().__init__(q)
+        self._drop_lock = threading.Lock()
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record: time, event and the record's `audit` fields."""
+    def format(self, record):
+        entry = {"time": round(record.created, 3), "event": record.getMessage()}
+        entry.update(getattr(record, "audit", {}))
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+def _is_audit(record):
+    return record.name == audit_logger.name
+
+
+def _handlers(audit_path):
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter('[%(asctime)s] %(levelname)s: %(message)s'))
+    console.addFilter(lambda record: not _is_audit(record))
+    handlers = [console]
+    if audit_path:
+        # delay=True: the file is only created once there is something to write.
+        # Pre-forked workers append to the same file; lines stay whole, but
+        # only one of them should be expected to rotate it cleanly.
+        audit_file = logging.handlers.RotatingFileHandler(
+            audit_path, maxBytes=AUDIT_MAX_BYTES, backupCount=AUDIT_BACKUP_COUNT, delay=True)
+        audit_file.setFormatter(JsonLinesFormatter())
+        audit_file.addFilter(_is_audit)
+        handlers.append(audit_file)
+    return handlers
+
+
+# Sessions only pay for a put_nowait(); formatting and I/O happen on the
+# listener thread.
+queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+logger.addHandler(queue_handler)
+# Console only until configure() (called by server.main) attaches the audit
+# file, so importing the package never writes under the current directory.
+audit_logger.disabled = True
+_listener = logging.handlers.QueueListener(queue_handler.queue, *_handlers(None))
+_listener.start()
+
+
+def configure(level=None, audit_path=AUDIT_LOG_PATH):
+    """Sets the log level and the audit file (None disables auditing); call once at startup."""
+    global _listener
+    if level is not None:
+        logger.setLevel(level)
+    audit_logger.disabled = not audit_path
+    stop()
+    _listener = logging.handlers.QueueListener(queue_handler.queue, *_handlers(audit_path))
+    _listener.start()
+
+
+def audit(event, **fields):
+    """Queues one audit record; costs a single level check when auditing is off."""
+    if audit_logger.isEnabledFor(logging.INFO):
+        audit_logger.info(event, extra={"audit": fields})
+
+
+def flush():
+    """Waits until every queued record has been written."""
+    queue_handler.queue.join()
+
+
+def dropped_records():
+    return queue_handler.dropped
+
+
+registry.register_stats("log", lambda: {"dropped": dropped_records(), "queued": queue_handler.queue.qsize()},
+                        counters=("dropped",))
+
+
+def stop():
+    """Writes out what is queued and stops the listener thread."""
+    if _listener._thread is None:
+        return
+    try:
+        _listener.stop()
+    except queue.Full:
+        pass  # The sentinel did not fit; the daemon thread dies with the process.
+
 
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.DEBUG)
+def _restart_in_child():
+    # The listener thread does not survive fork() and may have held the
+    # queue's lock, so a forked worker starts over with its own queue.
+    global _listener
+    handlers = _listener.handlers
+    queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    queue_handler._drop_lock = threading.Lock()
+    queue_handler.dropped = 0
+    _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers)
+    _listener.start()
 
-formatter = logging.Formatter('[%(asctime)s] %(levelname)s: %(message)s')
-console_handler.setFormatter(formatter)
 
-logger.addHandler(console_handler)
+os.register_at_fork(after_in_child=_restart_in_child)
+atexit.register(stop)
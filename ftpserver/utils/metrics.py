@@ -0,0 +1,226 @@
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+THROUGHPUT_BUCKETS = tuple(float(1 << shift) for shift in range(16, 34, 2))  # 64 KiB/s .. 8 GiB/s
+# Address the Prometheus endpoint binds to; it is meant to be scraped locally.
+METRICS_HOST = "127.0.0.1"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{v}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """Monotonic count per label tuple; inc() is one lock round-trip."""
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, labels=()):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Gauge:
+    """Value read from `fn` at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name, help, fn):
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def samples(self):
+        yield self.name, "", self.fn()
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram per label tuple. observe() does a bisect and
+    a few additions under the lock; buckets are only summed up at scrape time.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._series = {}  # labels -> [per-bucket counts (last is +Inf), sum]
+
+    def observe(self, value, labels=()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def totals(self):
+        """Sorted (labels, count, sum) for every label tuple observed so far."""
+        with self._lock:
+            return sorted((labels, sum(counts), total) for labels, (counts, total) in self._series.items())
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        names = self.labelnames + ("le",)
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", _labels(names, labels + (bound,)), cumulative
+            yield f"{self.name}_sum", _labels(self.labelnames, labels), total
+            yield f"{self.name}_count", _labels(self.labelnames, labels), cumulative
+
+
+class StatsCollector:
+    """
+    Exports a component's stats() dict (see AdmissionController and
+    PassivePortPool): keys in `counters` as ftp_<prefix>_<key>_total
+    counters (without doubling a key's own _total), every other number as
+    a gauge.
+    """
+    def __init__(self, prefix, fn, counters=()):
+        self.prefix = prefix
+        self.fn = fn
+        self.counters = frozenset(counters)
+
+    def families(self):
+        for key, value in sorted(self.fn().items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key in self.counters:
+                name = f"ftp_{self.prefix}_{key}" + ("" if key.endswith("_total") else "_total")
+                yield name, "counter", [(name, "", value)]
+            else:
+                name = f"ftp_{self.prefix}_{key}"
+                yield name, "gauge", [(name, "", value)]
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = []
+        self._collectors = {}
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix, fn, counters=()):
+        """Exports fn()'s numbers under ftp_<prefix>_*; registering a prefix again replaces it."""
+        with self._lock:
+            self._collectors[prefix] = StatsCollector(prefix, fn, counters)
+
+    def render(self):
+        """The whole registry in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {value}" for name, labels, value in metric.samples())
+        for collector in collectors:
+            for name, kind, samples in collector.families():
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{n}{labels} {value}" for n, labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Short human-readable lines for STATS: histograms as count and mean."""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors.values())
+        lines = []
+        for metric in metrics:
+            if isinstance(metric, Histogram):
+                for labels, count, total in metric.totals():
+                    lines.append(f"{metric.name}{_labels(metric.labelnames, labels)} count={count} mean={total / count:.6g}")
+            else:
+                lines.extend(f"{name}{labels} {value}" for name, labels, value in metric.samples())
+        for collector in collectors:
+            for _, _, samples in collector.families():
+                lines.extend(f"{name}{labels} {value}" for name, labels, value in samples)
+        return lines
+
+
+registry = Registry()
+
+command_latency = registry.register(Histogram(
+    "ftp_command_duration_seconds", "Time to handle one control command.", labelnames=("command",)))
+transfer_bytes = registry.register(Counter(
+    "ftp_transfer_bytes_total", "Bytes moved over data connections.", labelnames=("command",)))
+transfer_duration = registry.register(Histogram(
+    "ftp_transfer_duration_seconds", "Time spent moving data for one transfer.", labelnames=("command",)))
+transfer_throughput = registry.register(Histogram(
+    "ftp_transfer_throughput_bytes_per_second", "Throughput of each transfer.",
+    buckets=THROUGHPUT_BUCKETS, labelnames=("command",)))
+data_connection_wait = registry.register(Histogram(
+    "ftp_data_connection_wait_seconds", "Time waiting for the data connection to be established.",
+    labelnames=("mode",)))
+registry.register(Gauge("ftp_threads", "Live threads in this process.", threading.active_count))
+
+
+def observe_transfer(command, size, seconds):
+    transfer_bytes.inc(size, (command,))
+    transfer_duration.observe(seconds, (command,))
+    if seconds > 0:
+        transfer_throughput.observe(size / seconds, (command,))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the server log.
+
+
+class MetricsServer:
+    """Serves GET /metrics for the shared registry on a daemon thread."""
+    def __init__(self, host=METRICS_HOST, port=0):
+        self.httpd = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
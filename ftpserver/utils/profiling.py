@@ -0,0 +1,106 @@
+import collections
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from ftpserver.utils.filesystem import BASE_DIR
+
+# Where PROFILE writes its output; outside the users' jail.
+PROFILE_DIR = os.path.join(os.path.dirname(BASE_DIR), "profiles")
+# Seconds between stack samples for PROFILE ... on sample.
+SAMPLE_INTERVAL = 0.005
+# Characters of a client-supplied username that may appear in a profile's file name.
+_UNSAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class CProfileRecorder:
+    """Deterministic profile of every command the session runs; written as pstats."""
+    suffix = ".pstats"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def wrap(self, dispatch):
+        def profiled(command_line):
+            return self.profile.runcall(dispatch, command_line)
+        return profiled
+
+    def write(self, path):
+        self.profile.dump_stats(path)
+
+
+class StackSampler:
+    """
+    Samples the stack of the thread running the session's current command
+    every `interval` seconds from a background thread, so the session itself
+    only pays for two attribute stores per command. Written in collapsed-stack
+    format ("outer;inner count" per line) for flame graph tools.
+    """
+    suffix = ".collapsed"
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._thread_id = None
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._sampler.start()
+
+    def wrap(self, dispatch):
+        def sampled(command_line):
+            self._thread_id = threading.get_ident()
+            try:
+                return dispatch(command_line)
+            finally:
+                self._thread_id = None
+        return sampled
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            thread_id = self._thread_id
+            frame = sys._current_frames().get(thread_id) if thread_id is not None else None
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        self._stopped.set()
+        self._sampler.join()
+        with open(path, "w") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+
+PROFILERS = {"cprofile": CProfileRecorder, "sample": StackSampler}
+
+
+def start_profiling(dispatcher, kind="cprofile"):
+    """
+    Routes the dispatcher's commands through a profiler. The wrapper is an
+    instance attribute shadowing CommandDispatcher.dispatch, so sessions that
+    are not profiled run exactly the code they always did.
+    """
+    recorder = PROFILERS[kind]()
+    dispatcher.profiler = recorder
+    dispatcher.dispatch = recorder.wrap(type(dispatcher).dispatch.__get__(dispatcher))
+    return recorder
+
+
+def stop_profiling(dispatcher, directory=PROFILE_DIR):
+    """Restores normal dispatch and writes the profile; returns its path."""
+    recorder = dispatcher.profiler
+    del dispatcher.dispatch
+    dispatcher.profiler = None
+    session = dispatcher.session
+    os.makedirs(directory, exist_ok=True)
+    user = _UNSAFE_NAME.sub("_", session.username or "-")  # Set by USER, even before login
+    name = f"session-{session.id}-{user}-{time.strftime('%Y%m%d-%H%M%S')}{recorder.suffix}"
+    path = os.path.join(directory, name)
+    recorder.write(path)
+    return path
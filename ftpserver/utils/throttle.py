@@ -0,0 +1,195 @@
+import hashlib
+import math
+import mmap
+import multiprocessing
+import struct
+import threading
+import time
+
+# Largest burst a bucket allows, in seconds' worth of its rate.
+BURST_SECONDS = 1.0
+
+
+class TokenBucket:
+    """
+    Byte-rate limiter shared by every transfer it applies to.
+    consume() reserves tokens under a short lock and sleeps outside it, so
+    concurrent transfers on one bucket split its rate between them.
+    set_rate() takes effect on the next consume(), including for transfers
+    that are already running.
+    """
+    def __init__(self, rate):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self.tokens = rate * BURST_SECONDS
+        self.updated = time.monotonic()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.rate = rate
+            self.tokens = min(self.tokens, rate * BURST_SECONDS)
+
+    def reserve(self, n):
+        """Takes n tokens (possibly going into debt) and returns the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            capacity = self.rate * BURST_SECONDS
+            self.tokens = min(capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= n
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def consume(self, n):
+        wait = self.reserve(n)
+        if wait:
+            time.sleep(wait)
+
+
+class SharedBucketTable:
+    """
+    Token buckets in an anonymous shared mapping, created before the server
+    forks its workers (see core.prefork) so that every worker charges the
+    same buckets. Slots are found by open addressing on a 64-bit digest of
+    the bucket name, and all reads and updates happen under one
+    cross-process lock.
+    """
+    SLOT = struct.Struct("<Qddd")  # key, rate, tokens, updated
+
+    def __init__(self, slots=4096):
+        self.slots = slots
+        self._map = mmap.mmap(-1, slots * self.SLOT.size)
+        self._lock = multiprocessing.Lock()
+
+    def _find(self, key):
+        """Slot index for key, claiming an empty slot if needed; None if the table is full."""
+        start = key % self.slots
+        for i in range(self.slots):
+            index = (start + i) % self.slots
+            slot_key = self.SLOT.unpack_from(self._map, index * self.SLOT.size)[0]
+            if slot_key == key:
+                return index
+            if slot_key == 0:
+                self.SLOT.pack_into(self._map, index * self.SLOT.size, key, 0.0, 0.0, time.monotonic())
+                return index
+        return None
+
+    def bucket(self, name, rate):
+        key = int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "little") or 1
+        with self._lock:
+            index = self._find(key)
+        if index is None:
+            return TokenBucket(rate)
+        bucket = SharedTokenBucket(self, index)
+        bucket.set_rate(rate)
+        return bucket
+
+
+class SharedTokenBucket:
+    """TokenBucket with its state in a SharedBucketTable slot."""
+    def __init__(self, table, index):
+        self.table = table
+        self.offset = index * table.SLOT.size
+
+    @property
+    def rate(self):
+        return self.table.SLOT.unpack_from(self.table._map, self.offset)[1]
+
+    def set_rate(self, rate):
+        slot = self.table.SLOT
+        with self.table._lock:
+            key, old_rate, tokens, updated = slot.unpack_from(self.table._map, self.offset)
+            if old_rate == 0:
+                tokens = rate * BURST_SECONDS
+            slot.pack_into(self.table._map, self.offset, key, rate, min(tokens, rate * BURST_SECONDS), updated)
+
+    def reserve(self, n):
+        slot = self.table.SLOT
+        with self.table._lock:
+            key, rate, tokens, updated = slot.unpack_from(self.table._map, self.offset)
+            now = time.monotonic()
+            tokens = min(rate * BURST_SECONDS, tokens + (now - updated) * rate) - n
+            slot.pack_into(self.table._map, self.offset, key, rate, tokens, now)
+        return -tokens / rate if tokens < 0 else 0.0
+
+    def consume(self, n):
+        wait = self.reserve(n)
+        if wait:
+            time.sleep(wait)
+
+
+class Throttle:
+    """The buckets one transfer is subject to; consume() waits for the slowest."""
+    def __init__(self, buckets):
+        self.buckets = buckets
+
+    def consume(self, n):
+        wait = max(bucket.reserve(n) for bucket in self.buckets)
+        if wait:
+            time.sleep(wait)
+
+
+class BandwidthLimiter:
+    """
+    Process-wide buckets: one global, plus one per username shared by all of
+    that user's sessions (so opening more connections does not buy more
+    bandwidth). Rates are in bytes per second; None or 0 means unlimited.
+    After share_across_processes() the buckets live in shared memory, so the
+    limits hold across pre-forked workers too.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._global = None
+        self._users = {}
+        self._table = None
+
+    def share_across_processes(self, slots=4096):
+        """Moves buckets to shared memory; call in the parent before forking workers."""
+        with self._lock:
+            self._table = SharedBucketTable(slots)
+            self._global = None
+            self._users = {}
+
+    def _bucket(self, current, rate, name):
+        if not rate:
+            return None
+        if current is None:
+            if self._table is not None:
+                return self._table.bucket(name, rate)
+            return TokenBucket(rate)
+        if current.rate != rate:
+            current.set_rate(rate)
+        return current
+
+    def throttle(self, username, global_rate=None, user_rate=None):
+        """Returns a Throttle for one transfer, or None when no limit applies."""
+        if not global_rate and not user_rate:
+            return None
+        with self._lock:
+            self._global = self._bucket(self._global, global_rate, "\0global")
+            bucket = self._bucket(self._users.get(username), user_rate, f"user:{username}")
+            if bucket is None:
+                self._users.pop(username, None)
+            else:
+                self._users[username] = bucket
+            buckets = [b for b in (self._global, bucket) if b is not None]
+        return Throttle(buckets)
+
+
+bandwidth = BandwidthLimiter()
+
+
+def parse_rate(text):
+    """Parses "off", "0", "512K", "10M" or "1G" into bytes per second (None for unlimited)."""
+    text = text.strip().upper()
+    if text in ("OFF", "NONE", "0"):
+        return None
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    multiplier = units.get(text[-1:], 1)
+    number = text[:-1] if text[-1:] in units else text
+    value = float(number) * multiplier
+    if not math.isfinite(value):
+        raise ValueError(f"invalid rate '{text}'")
+    rate = int(value)
+    if rate <= 0:
+        raise ValueError(f"invalid rate '{text}'")
+    return rate
@@ -0,0 +1,319 @@
+import os
+import secrets
+import stat
+import zlib
+from contextlib import contextmanager
+
+# Size of the reusable buffer used when a transfer cannot go through sendfile.
+TRANSFER_BUFFER_SIZE = 256 * 1024
+
+# Size of the reusable receive buffer for uploads.
+RECEIVE_BUFFER_SIZE = 1024 * 1024
+
+# Largest ALLO a client may request; more than this, or than the filesystem
+# has free, is refused so a client cannot reserve the disk before sending data.
+MAX_ALLOCATE_SIZE = 16 * 1024 * 1024 * 1024
+
+# zlib level for MODE Z transfers until a client sends OPTS MODE Z LEVEL n.
+DEFLATE_LEVEL = 6
+
+# Files with these extensions are already compressed; MODE Z sends them as
+# stored (level 0) deflate blocks instead of burning CPU for nothing.
+COMPRESSED_EXTENSIONS = frozenset({
+    ".gz", ".tgz", ".bz2", ".xz", ".txz", ".zst", ".lz4", ".zip", ".7z", ".rar",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".mp3", ".mp4", ".mkv", ".avi",
+    ".mov", ".ogg", ".flac", ".pdf", ".docx", ".xlsx", ".pptx", ".jar", ".whl",
+})
+
+
+def free_space(path):
+    """Bytes available to unprivileged users on the filesystem holding path."""
+    st = os.statvfs(path)
+    return st.f_bavail * st.f_frsize
+
+
+def _create_part_file(directory, name):
+    """
+    Creates a hidden, uniquely named temp file for an upload. Unlike mkstemp's
+    0600, mode 0666 lets the kernel apply the process umask, so the upload
+    ends up with the permissions any newly created file would get.
+    """
+    while True:
+        tmp_path = os.path.join(directory, f".{name}.{secrets.token_hex(4)}.part")
+        try:
+            return os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), tmp_path
+        except FileExistsError:
+            continue
+
+
+def _can_sendfile(f):
+    if not hasattr(os, 'sendfile'):
+        return False
+    try:
+        return stat.S_ISREG(os.fstat(f.fileno()).st_mode)
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def send_file(conn, f, offset=0, count=None, buffer_size=None, throttle=None):
+    """
+    Streams a binary file object to a socket without loading it into memory.
+    Regular files go through sendfile (zero-copy); anything else is copied
+    through one reusable buffer. Sends `count` bytes from `offset`, or
+    everything up to EOF when count is None. A throttle (utils.throttle) is
+    charged for every chunk. Returns the number of bytes sent.
+    """
+    if count == 0:
+        return 0  # socket.sendfile() rejects a zero count
+    buffer_size = buffer_size or TRANSFER_BUFFER_SIZE
+    if _can_sendfile(f):
+        if throttle is None:
+            return conn.sendfile(f, offset, count)
+        return _sendfile_throttled(conn, f, offset, count, buffer_size, throttle)
+    return _send_buffered(conn, f, offset, count, buffer_size, throttle)
+
+
+def _sendfile_throttled(conn, f, offset, count, chunk_size, throttle):
+    sent = 0
+    while count is None or sent < count:
+        size = chunk_size if count is None else min(chunk_size, count - sent)
+        throttle.consume(size)
+        n = conn.sendfile(f, offset + sent, size)
+        if not n:
+            break
+        sent += n
+    return sent
+
+
+def _send_buffered(conn, f, offset, count, buffer_size, throttle=None):
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+    if offset:
+        f.seek(offset)
+    sent = 0
+    while count is None or sent < count:
+        chunk = view if count is None or count - sent >= buffer_size else view[:count - sent]
+        n = f.readinto(chunk)
+        if not n:
+            break
+        if throttle:
+            throttle.consume(n)
+        conn.sendall(view[:n])
+        sent += n
+    return sent
+
+
+def send_lines(conn, lines, buffer_size=None):
+    """
+    Streams an iterable of text lines to a socket, newline-terminated, in
+    chunks of up to about buffer_size bytes so the whole text never sits in
+    memory. Chunks start small and double, so the first bytes leave early.
+    Returns the number of bytes sent.
+    """
+    max_chunk = buffer_size or TRANSFER_BUFFER_SIZE
+    limit = min(4096, max_chunk)
+    batch = []
+    pending = 0
+    sent = 0
+    for line in lines:
+        batch.append(line)
+        pending += len(line) + 1
+        if pending >= limit:
+            data = ("\n".join(batch) + "\n").encode()
+            conn.sendall(data)
+            sent += len(data)
+            batch = []
+            pending = 0
+            limit = min(limit * 2, max_chunk)
+    if batch:
+        data = ("\n".join(batch) + "\n").encode()
+        conn.sendall(data)
+        sent += len(data)
+    return sent
+
+
+def receive_file(conn, f, buffer_size=None, throttle=None):
+    """
+    Copies everything from a socket into a binary file object through one
+    reusable buffer (recv_into, no per-chunk bytes objects). Returns the
+    number of bytes written.
+    """
+    buf = bytearray(buffer_size or RECEIVE_BUFFER_SIZE)
+    view = memoryview(buf)
+    received = 0
+    while True:
+        n = conn.recv_into(buf)
+        if not n:
+            break
+        if throttle:
+            throttle.consume(n)
+        f.write(view[:n])
+        received += n
+    return received
+
+
+class LineEndingTranslator:
+    """
+    Streaming TYPE A newline conversion. Outbound turns the file's line
+    endings into CRLF (existing CRLFs are kept, not doubled); inbound turns
+    CRLF back into LF. Each chunk is converted with bytes.replace, and a
+    trailing CR is held back until the next chunk, so a CRLF split across
+    two chunks is still seen as one.
+    """
+    def __init__(self, outbound):
+        self.outbound = outbound
+        self._pending = b""
+
+    def convert(self, data):
+        data = self._pending + data
+        if data.endswith(b"\r"):
+            data, self._pending = data[:-1], b"\r"
+        else:
+            self._pending = b""
+        if b"\r" not in data:
+            # Common case, found by memchr: plain LF text needs one pass or none.
+            return data.replace(b"\n", b"\r\n") if self.outbound else data
+        if self.outbound:
+            return data.replace(b"\r\n", b"\n").replace(b"\n", b"\r\n")
+        return data.replace(b"\r\n", b"\n")
+
+    def flush(self):
+        data, self._pending = self._pending, b""
+        return data
+
+
+def send_ascii(conn, f, offset=0, buffer_size=None, throttle=None):
+    """TYPE A send: streams a file with LF line endings converted to CRLF. Returns bytes sent."""
+    translator = LineEndingTranslator(outbound=True)
+    buf = bytearray(buffer_size or TRANSFER_BUFFER_SIZE)
+    view = memoryview(buf)
+    if offset:
+        f.seek(offset)
+    sent = 0
+    while True:
+        n = f.readinto(buf)
+        if not n:
+            break
+        data = translator.convert(view[:n].tobytes())
+        if throttle:
+            throttle.consume(len(data))
+        conn.sendall(data)
+        sent += len(data)
+    data = translator.flush()
+    conn.sendall(data)
+    return sent + len(data)
+
+
+def receive_ascii(conn, f, buffer_size=None, throttle=None):
+    """TYPE A receive: writes an upload with CRLF line endings converted to LF. Returns bytes written."""
+    translator = LineEndingTranslator(outbound=False)
+    buf = bytearray(buffer_size or RECEIVE_BUFFER_SIZE)
+    view = memoryview(buf)
+    written = 0
+    while True:
+        n = conn.recv_into(buf)
+        if not n:
+            break
+        if throttle:
+            throttle.consume(n)
+        data = translator.convert(view[:n].tobytes())
+        f.write(data)
+        written += len(data)
+    data = translator.flush()
+    f.write(data)
+    return written + len(data)
+
+
+def is_precompressed(path):
+    return os.path.splitext(path)[1].lower() in COMPRESSED_EXTENSIONS
+
+
+def send_deflated(conn, f, level=DEFLATE_LEVEL, offset=0, buffer_size=None, translator=None, throttle=None):
+    """
+    MODE Z send: streams a binary file object through a zlib compressor, one
+    buffer at a time, ending with a complete zlib stream. A translator (TYPE
+    A) converts each chunk before compression. Returns the number of
+    compressed bytes sent.
+    """
+    compressor = zlib.compressobj(level)
+    buf = bytearray(buffer_size or TRANSFER_BUFFER_SIZE)
+    view = memoryview(buf)
+    if offset:
+        f.seek(offset)
+    sent = 0
+    while True:
+        n = f.readinto(buf)
+        if not n:
+            break
+        chunk = translator.convert(view[:n].tobytes()) if translator else view[:n]
+        data = compressor.compress(chunk)
+        if data:
+            if throttle:
+                throttle.consume(len(data))
+            conn.sendall(data)
+            sent += len(data)
+    data = compressor.compress(translator.flush()) if translator else b""
+    data += compressor.flush()
+    conn.sendall(data)
+    return sent + len(data)
+
+
+def receive_inflated(conn, f, buffer_size=None, translator=None, throttle=None):
+    """
+    MODE Z receive: decompresses a zlib stream from a socket into a binary
+    file object. Output is produced at most buffer_size bytes at a time, so a
+    small, highly compressible upload cannot balloon in memory. A translator
+    (TYPE A) converts the decompressed data before it is written. Returns the
+    number of bytes written; raises ValueError if the stream is cut short.
+    """
+    buffer_size = buffer_size or RECEIVE_BUFFER_SIZE
+    decompressor = zlib.decompressobj()
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+    written = 0
+    while True:
+        n = conn.recv_into(buf)
+        if not n:
+            break
+        if throttle:
+            throttle.consume(n)
+        data = decompressor.decompress(view[:n], buffer_size)
+        while data:
+            out = translator.convert(data) if translator else data
+            f.write(out)
+            written += len(out)
+            data = decompressor.decompress(decompressor.unconsumed_tail, buffer_size)
+    data = decompressor.flush()
+    if translator:
+        data = translator.convert(data) + translator.flush()
+    f.write(data)
+    written += len(data)
+    if not decompressor.eof:
+        raise ValueError("compressed stream ended early")
+    return written
+
+
+@contextmanager
+def atomic_upload(file_path, allocate=None):
+    """
+    Yields a binary file object backed by a hidden temp file next to file_path.
+    On success the temp file is trimmed to what was written and renamed over
+    file_path, so readers never see a partial upload; on error it is removed.
+    `allocate` (e.g. from ALLO) preallocates that many bytes up front.
+    """
+    directory, name = os.path.split(file_path)
+    fd, tmp_path = _create_part_file(directory, name)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if allocate and hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(f.fileno(), 0, allocate)
+                except OSError:
+                    pass  # Filesystem does not support it; grow as we write.
+            yield f
+            f.truncate(f.tell())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
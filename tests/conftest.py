@@ -0,0 +1,129 @@
+import os
+import socket
+import threading
+import time
+import pytest
+from ftpserver.commands import delta_sync, directory_ops, file_actions
+from ftpserver.core.command_dispatcher import CommandDispatcher
+from ftpserver.core.server import FTPServer
+from ftpserver.core.session import FTPSession
+from ftpserver.utils.hash_index import ContentIndex
+
+JAIL_ROOT = os.path.abspath('server_files/users')
+
+@pytest.fixture(autouse=True)
+def content_index(tmp_path, monkeypatch):
+    """Keeps the content index of every test in tmp_path instead of server_files/."""
+    index = ContentIndex(str(tmp_path / "hashindex.sqlite"))
+    for module in (delta_sync, directory_ops, file_actions):
+        monkeypatch.setattr(module, "content_index", index)
+    yield index
+    index.close()
+
+@pytest.fixture
+def jail_file():
+    os.makedirs(JAIL_ROOT, exist_ok=True)
+    created = []
+    def make(name, data):
+        path = os.path.join(JAIL_ROOT, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        created.append(path)
+        return path
+    yield make
+    for path in created:
+        if os.path.exists(path):
+            os.remove(path)
+
+# The helpers below are served as fixtures so test modules never import
+# from each other; each fixture returns the plain function.
+
+def _admin_dispatcher():
+    session = FTPSession()
+    session.username = 'admin'
+    session.logged_in = True
+    session.role = 'admin'
+    return CommandDispatcher(session)
+
+def _passive_client(dispatcher):
+    """Issues PASV and returns a connected data socket."""
+    reply = dispatcher.dispatch('PASV')
+    nums = reply[reply.index('(') + 1:reply.index(')')].split(',')
+    port = (int(nums[4]) << 8) + int(nums[5])
+    return socket.create_connection(('127.0.0.1', port))
+
+def _recv_all(sock):
+    chunks = []
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            return b''.join(chunks)
+        chunks.append(data)
+
+def _retrieve(dispatcher, command):
+    data_sock = _passive_client(dispatcher)
+    result = {}
+    def reader():
+        with data_sock:
+            result['data'] = _recv_all(data_sock)
+    t = threading.Thread(target=reader)
+    t.start()
+    reply = dispatcher.dispatch(command)
+    t.join(5)
+    return reply, result.get('data')
+
+def _store(dispatcher, command, payload):
+    data_sock = _passive_client(dispatcher)
+    def writer():
+        with data_sock:
+            data_sock.sendall(payload)
+    t = threading.Thread(target=writer)
+    t.start()
+    reply = dispatcher.dispatch(command)
+    t.join(5)
+    return reply
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _start_server(**kwargs):
+    port = _free_port()
+    server = FTPServer(host='127.0.0.1', port=port, **kwargs)
+    threading.Thread(target=server.start, daemon=True).start()
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        try:
+            return socket.create_connection(('127.0.0.1', port), timeout=5)
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+@pytest.fixture
+def admin_dispatcher():
+    return _admin_dispatcher
+
+@pytest.fixture
+def passive_client():
+    return _passive_client
+
+@pytest.fixture
+def recv_all():
+    return _recv_all
+
+@pytest.fixture
+def retrieve():
+    return _retrieve
+
+@pytest.fixture
+def store():
+    return _store
+
+@pytest.fixture
+def free_port():
+    return _free_port
+
+@pytest.fixture
+def start_server():
+    return _start_server
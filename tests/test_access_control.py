@@ -0,0 +1,150 @@
+import json
+import os
+import pytest
+from ftpserver.commands import access_control
+from ftpserver.commands.access_control import UserStore
+from ftpserver.core.session import FTPSession
+from ftpserver.core.command_dispatcher import CommandDispatcher
+
+HASH = "$2b$12$DojZTFNaIJlt9ydhx6JSxufWL3K6/nb7QNPSGYytAUpUfSedJopRe"  # "123"
+
+def write_users(path, users):
+    with open(path, 'w') as f:
+        json.dump({'users': users}, f)
+
+@pytest.fixture
+def user_store(tmp_path, monkeypatch):
+    path = tmp_path / 'users.json'
+    write_users(path, [
+        {'username': 'admin', 'password': HASH, 'role': 'admin', 'permissions': []},
+        {'username': 'bob', 'password': HASH, 'role': 'user', 'permissions': ['LS']},
+        {'username': 'broken', 'password': 'plaintext', 'role': 'user', 'permissions': []},
+    ])
+    user_store = UserStore(str(path))
+    monkeypatch.setattr(access_control, 'user_store', user_store)
+    return user_store
+
+def test_store_lookup_skips_invalid_hashes(user_store):
+    assert user_store.get('bob')['permissions'] == ['LS']
+    assert user_store.get('broken') is None
+    assert user_store.get('nobody') is None
+
+def test_store_reloads_when_file_changes(user_store):
+    assert user_store.get('carol') is None
+    write_users(user_store.path, [{'username': 'carol', 'password': HASH, 'role': 'user', 'permissions': []}])
+    assert user_store.get('carol')['role'] == 'user'
+    assert user_store.get('bob') is None
+
+def test_store_does_not_reparse_unchanged_file(user_store, monkeypatch):
+    user_store.get('bob')
+    monkeypatch.setattr(access_control.json, 'load', lambda f: pytest.fail("re-parsed users.json"))
+    assert user_store.get('bob') is not None
+
+def test_failed_transaction_leaves_file_untouched(user_store):
+    before = open(user_store.path).read()
+    with pytest.raises(RuntimeError):
+        with user_store.transaction() as users:
+            users.pop('bob')
+            raise RuntimeError("boom")
+    assert open(user_store.path).read() == before
+    assert user_store.get('bob') is not None
+
+def test_admin_commands_update_store(user_store, admin_dispatcher):
+    dispatcher = admin_dispatcher()
+    assert dispatcher.dispatch('GRANT bob RETR') == 'granted RETR to bob\n'
+    assert dispatcher.dispatch('SETROLE bob admin') == 'role for bob set to admin\n'
+    with open(user_store.path) as f:
+        bob = [u for u in json.load(f)['users'] if u['username'] == 'bob'][0]
+    assert bob['permissions'] == ['LS', 'RETR'] and bob['role'] == 'admin'
+    assert dispatcher.dispatch('DELUSER bob') == 'user bob deleted\n'
+    assert user_store.get('bob') is None
+    assert dispatcher.dispatch('SETROLE bob user') == 'setrole: user not found\n'
+    assert not [n for n in os.listdir(os.path.dirname(user_store.path)) if n.startswith('.users-')]
+
+def test_verifier_rejects_when_saturated():
+    import threading
+    from ftpserver.utils.auth_pool import PasswordVerifier, VerifierBusy
+    started, release = threading.Event(), threading.Event()
+    def slow_check(stored_hash, password):
+        started.set()
+        return release.wait(5)
+    verifier = PasswordVerifier(slow_check, workers=1, max_pending=0)
+    t = threading.Thread(target=verifier.verify, args=('bob', HASH, 'x'))
+    t.start()
+    started.wait(5)
+    with pytest.raises(VerifierBusy):
+        verifier.verify('carol', HASH, 'y')
+    release.set()
+    t.join()
+    assert verifier.verify('carol', HASH, 'y')
+
+def test_verifier_cache_and_invalidation():
+    from ftpserver.utils.auth_pool import PasswordVerifier
+    calls = []
+    verifier = PasswordVerifier(lambda h, p: calls.append(p) or p == 'good', cache_ttl=60)
+    assert verifier.verify('bob', HASH, 'good')
+    assert verifier.verify('bob', HASH, 'good')
+    assert calls == ['good']
+    assert not verifier.verify('bob', HASH, 'bad')
+    assert verifier.verify('bob', 'other-hash', 'good')
+    assert len(calls) == 3
+    verifier.invalidate('bob')
+    verifier.verify('bob', 'other-hash', 'good')
+    assert len(calls) == 4
+
+def test_pass_returns_421_when_verifier_busy(user_store, monkeypatch):
+    from ftpserver.utils.auth_pool import VerifierBusy
+    def busy(*args):
+        raise VerifierBusy()
+    monkeypatch.setattr(access_control.password_verifier, 'verify', busy)
+    dispatcher = CommandDispatcher(FTPSession())
+    assert dispatcher.dispatch('USER bob') == 'user accepted\n'
+    assert dispatcher.dispatch('PASS 123').startswith('421')
+    assert not dispatcher.session.logged_in
+
+def test_pass_logs_in_through_verifier(user_store):
+    dispatcher = CommandDispatcher(FTPSession())
+    dispatcher.dispatch('USER bob')
+    assert dispatcher.dispatch('PASS 123') == 'user logged in as user\n'
+    assert dispatcher.session.permissions == frozenset({'LS'})
+
+def test_setlimit_persists_limits_and_builds_throttles(user_store, admin_dispatcher):
+    dispatcher = admin_dispatcher()
+    bob = FTPSession()
+    bob.username = 'bob'
+    assert access_control.transfer_throttle(bob) is None
+    assert dispatcher.dispatch('SETLIMIT ROLE user 1M') == 'limit for role user set to 1048576 bytes/s\n'
+    assert dispatcher.dispatch('SETLIMIT GLOBAL 10M') == 'limit for global set to 10485760 bytes/s\n'
+    assert dispatcher.dispatch('SETLIMIT USER bob 512K') == 'limit for user bob set to 524288 bytes/s\n'
+    with open(user_store.path) as f:
+        data = json.load(f)
+    assert data['limits'] == {'roles': {'user': 1048576}, 'global': 10485760}
+    assert [u['rate_limit'] for u in data['users'] if u['username'] == 'bob'] == [524288]
+    assert sorted(b.rate for b in access_control.transfer_throttle(bob).buckets) == [524288, 10485760]
+
+    assert dispatcher.dispatch('SETLIMIT USER bob off') == 'limit for user bob removed\n'
+    assert sorted(b.rate for b in access_control.transfer_throttle(bob).buckets) == [1048576, 10485760]
+    dispatcher.dispatch('SETLIMIT ROLE user off')
+    dispatcher.dispatch('SETLIMIT GLOBAL off')
+    assert access_control.transfer_throttle(bob) is None
+    assert 'limits' not in json.load(open(user_store.path))
+    assert dispatcher.dispatch('SETLIMIT USER nobody 1M') == 'setlimit: user not found\n'
+    assert dispatcher.dispatch('SETLIMIT GLOBAL fast') == "setlimit: invalid rate 'fast'\n"
+    for rate in ('inf', '1e400K', 'nan', '-infM'):
+        assert dispatcher.dispatch(f'SETLIMIT GLOBAL {rate}') == f"setlimit: invalid rate '{rate}'\n"
+    assert dispatcher.dispatch('SETLIMIT ROLE 1M').startswith('setlimit: usage')
+
+def test_transactions_from_several_processes_do_not_lose_updates(user_store):
+    pids = []
+    for i in range(4):
+        pid = os.fork()
+        if pid == 0:
+            child_store = UserStore(user_store.path)
+            for j in range(5):
+                with child_store.transaction() as users:
+                    users[f'u{i}-{j}'] = {'username': f'u{i}-{j}', 'password': HASH, 'role': 'user', 'permissions': []}
+            os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    assert sum(1 for u in user_store.all() if u['username'].startswith('u')) == 20
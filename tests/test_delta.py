@@ -0,0 +1,149 @@
+import io
+import os
+import random
+import socket
+import threading
+import pytest
+from ftpserver.utils import delta
+from ftpserver.utils.hash_index import ContentIndex
+from ftpserver.client.ftp_client import FTPClient
+from ftpserver.client.delta import delta_download, delta_upload
+
+JAIL_ROOT = os.path.abspath('server_files/users')
+
+def edited(data, rng):
+    data = bytearray(data)
+    for _ in range(5):
+        pos = rng.randrange(len(data))
+        data[pos:pos + rng.randrange(1, 200)] = os.urandom(rng.randrange(0, 300))
+    return bytes(data)
+
+def make_delta(base, new, block_size=4096):
+    sig = delta.encode_signature(delta.iter_block_sums(io.BytesIO(base), block_size),
+                                 block_size, len(base), 0)
+    return b"".join(delta.generate_delta(io.BytesIO(new), delta.Signature(sig)))
+
+def rebuild(base, stream):
+    stream = io.BytesIO(stream)
+    block_size, base_size, _ = delta.read_delta_header(stream)
+    out = io.BytesIO()
+    delta.apply_delta(stream, io.BytesIO(base), out, block_size, base_size)
+    return out.getvalue()
+
+def test_delta_round_trip_sends_only_changes():
+    rng = random.Random(7)
+    for size in (0, 1, 4095, 4096, 4097, 300_000):
+        base = rng.randbytes(size)
+        new = edited(base, rng) if size else b"fresh"
+        stream = make_delta(base, new)
+        assert rebuild(base, stream) == new
+    stream = make_delta(base, new)
+    assert len(stream) < len(new) // 10
+
+def test_apply_delta_rejects_copy_outside_base():
+    bad = delta.DELTA_HEADER.pack(4096, 10, 0) + b'C' + delta._COPY.pack(5, 1) + b'E'
+    with pytest.raises(delta.DeltaError):
+        rebuild(b"x" * 10, bad)
+
+def test_block_size_out_of_range_is_rejected():
+    for block_size in (0, 100, 2**32 - 1):
+        with pytest.raises(delta.DeltaError):
+            delta.Signature(delta.SIG_HEADER.pack(block_size, 0, 0, 0))
+        with pytest.raises(delta.DeltaError):
+            delta.read_delta_header(io.BytesIO(delta.DELTA_HEADER.pack(block_size, 0, 0) + b'E'))
+
+def test_empty_signature_sends_file_as_literals():
+    new = os.urandom(3 * delta.MAX_LITERAL + 10)
+    stream = make_delta(b"", new)
+    assert rebuild(b"", stream) == new
+    ops = io.BytesIO(stream[delta.DELTA_HEADER.size:])
+    while (op := ops.read(1)) == b'L':
+        (length,) = delta._LEN.unpack(ops.read(delta._LEN.size))
+        ops.seek(length, io.SEEK_CUR)
+    assert op == b'E' and not ops.read()
+
+def test_content_index_tracks_changes_moves_and_removals(tmp_path):
+    root = tmp_path / "jail"
+    (root / "d").mkdir(parents=True)
+    path = root / "d" / "a.bin"
+    path.write_bytes(os.urandom(10_000))
+    index = ContentIndex(str(tmp_path / "index.sqlite"), str(root), block_size=4096)
+    try:
+        first = index.signature(str(path))
+        assert index.signature(str(path)) == first
+        path.write_bytes(os.urandom(20_000))
+        assert delta.Signature(index.signature(str(path))).file_size == 20_000
+        os.rename(root / "d", root / "e")
+        index.moved(str(root / "d"), str(root / "e"))
+        db = index._conn()
+        assert [r[0] for r in db.execute("SELECT path FROM files")] == [os.path.join("e", "a.bin")]
+        index.removed(str(root / "e"))
+        assert db.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 0
+    finally:
+        index.close()
+
+def test_delta_sig_retr_and_stor_commands(jail_file, admin_dispatcher, passive_client, recv_all, retrieve):
+    rng = random.Random(3)
+    server_data = rng.randbytes(200_000)
+    path = jail_file('delta.bin', server_data)
+    dispatcher = admin_dispatcher()
+
+    reply, sig = retrieve(dispatcher, 'DELTA-SIG delta.bin')
+    assert reply == 'signature sent\n'
+    assert delta.Signature(sig).file_size == len(server_data)
+
+    client_data = edited(server_data, rng)
+    data_sock = passive_client(dispatcher)
+    result = {}
+    def client_side():
+        with data_sock:
+            data_sock.sendall(delta.encode_signature(delta.iter_block_sums(io.BytesIO(client_data)),
+                                                     delta.DELTA_BLOCK_SIZE, len(client_data), 0))
+            data_sock.shutdown(socket.SHUT_WR)
+            result['delta'] = recv_all(data_sock)
+    t = threading.Thread(target=client_side)
+    t.start()
+    assert dispatcher.dispatch('DELTA-RETR delta.bin') == 'delta sent\n'
+    t.join(5)
+    assert rebuild(client_data, result['delta']) == server_data
+
+    new_data = edited(server_data, rng)
+    upload = b"".join(delta.generate_delta(io.BytesIO(new_data), delta.Signature(sig)))
+    data_sock = passive_client(dispatcher)
+    def writer():
+        with data_sock:
+            data_sock.sendall(upload)
+    t = threading.Thread(target=writer)
+    t.start()
+    assert dispatcher.dispatch('DELTA-STOR delta.bin') == 'file stored\n'
+    t.join(5)
+    with open(path, 'rb') as f:
+        assert f.read() == new_data
+
+    # The signature is stale now, so a second upload of the same delta is refused.
+    data_sock = passive_client(dispatcher)
+    t = threading.Thread(target=writer)
+    t.start()
+    assert dispatcher.dispatch('DELTA-STOR delta.bin').startswith('delta-stor: file changed')
+    t.join(5)
+
+def test_delta_client_download_and_upload(jail_file, tmp_path, start_server):
+    rng = random.Random(11)
+    remote = rng.randbytes(2_000_000)
+    jail_file('sync.bin', remote)
+    local = tmp_path / 'sync.bin'
+    sock = start_server()
+    port = sock.getpeername()[1]
+    sock.close()
+    with FTPClient('127.0.0.1', port) as client:
+        client.login('admin', '123')
+        assert delta_download(client, 'sync.bin', str(local)) > len(remote)
+        assert local.read_bytes() == remote
+        local.write_bytes(edited(remote, rng))
+        assert delta_upload(client, str(local), 'sync.bin') < len(remote) // 5
+        with open(os.path.join(JAIL_ROOT, 'sync.bin'), 'rb') as f:
+            assert f.read() == local.read_bytes()
+        remote_copy = tmp_path / 'copy.bin'
+        remote_copy.write_bytes(remote)
+        assert delta_download(client, 'sync.bin', str(remote_copy)) < len(remote) // 5
+        assert remote_copy.read_bytes() == local.read_bytes()
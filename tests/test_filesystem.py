@@ -0,0 +1,93 @@
+import os
+import shutil
+import pytest
+from ftpserver.utils.filesystem import PathResolver, path_resolver
+
+JAIL_ROOT = os.path.abspath('server_files/users')
+
+@pytest.fixture
+def jail(tmp_path):
+    root = tmp_path / 'jail'
+    (root / 'docs').mkdir(parents=True)
+    (root / 'docs' / 'a.txt').write_text('inside')
+    (tmp_path / 'secret.txt').write_text('outside')
+    return tmp_path, PathResolver(str(root))
+
+def test_symlink_out_of_jail_is_denied(jail):
+    tmp_path, resolver = jail
+    os.symlink(tmp_path / 'secret.txt', tmp_path / 'jail' / 'leak')
+    os.symlink(tmp_path, tmp_path / 'jail' / 'docs' / 'up')
+    with pytest.raises(ValueError):
+        resolver.resolve('/', 'leak')
+    with pytest.raises(ValueError):
+        resolver.resolve('/docs', 'up/secret.txt')
+    with pytest.raises(ValueError):
+        resolver.resolve('/', '../secret.txt')
+
+def test_symlink_inside_jail_and_new_files_are_allowed(jail):
+    tmp_path, resolver = jail
+    os.symlink('docs/a.txt', tmp_path / 'jail' / 'alias')
+    assert resolver.resolve('/', 'alias') == str(tmp_path / 'jail' / 'alias')
+    assert resolver.resolve('/docs', 'new/file.bin') == str(tmp_path / 'jail' / 'docs' / 'new' / 'file.bin')
+
+def test_cache_hits_until_invalidated(jail):
+    tmp_path, resolver = jail
+    first = resolver.resolve('/docs', 'a.txt')
+    assert resolver.resolve('/docs', 'a.txt') is first
+    # Replace docs with a link out of the jail: the cached answer stands until invalidate().
+    os.rename(tmp_path / 'jail' / 'docs', tmp_path / 'jail' / 'docs-old')
+    os.symlink(tmp_path, tmp_path / 'jail' / 'docs')
+    assert resolver.resolve('/docs', 'a.txt') is first
+    generation = resolver.generation
+    resolver.invalidate()
+    assert resolver.generation == generation + 1
+    with pytest.raises(ValueError):
+        resolver.resolve('/docs', 'a.txt')
+
+def test_invalidation_in_another_worker_drops_the_cache(jail):
+    tmp_path, resolver = jail
+    resolver.share_across_processes()
+    first = resolver.resolve('/docs', 'a.txt')
+    assert resolver.resolve('/docs', 'a.txt') is first
+    os.rename(tmp_path / 'jail' / 'docs', tmp_path / 'jail' / 'docs-old')
+    os.symlink(tmp_path, tmp_path / 'jail' / 'docs')
+    pid = os.fork()  # Another pre-forked worker runs MV/CP/RMDIR/RM-R
+    if pid == 0:
+        try:
+            resolver.invalidate()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    with pytest.raises(ValueError):
+        resolver.resolve('/docs', 'a.txt')
+
+def test_mv_invalidates_and_cp_keeps_links(admin_dispatcher):
+    base = os.path.join(JAIL_ROOT, 'fs-test')
+    os.makedirs(os.path.join(base, 'deep'), exist_ok=True)
+    try:
+        os.symlink('../../../secret-outside', os.path.join(base, 'deep', 'link'))
+        dispatcher = admin_dispatcher()
+        assert dispatcher.dispatch('CAT fs-test/deep/link').startswith('cat: ')
+        generation = path_resolver.generation
+        assert dispatcher.dispatch('MV fs-test/deep fs-test-moved') == 'file moved\n'
+        assert path_resolver.generation == generation + 1
+        assert 'Access denied' in dispatcher.dispatch('CAT fs-test-moved/link')
+        assert dispatcher.dispatch('CP fs-test-moved fs-test/copy') == 'file copied\n'
+        assert os.path.islink(os.path.join(base, 'copy', 'link'))
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+        shutil.rmtree(os.path.join(JAIL_ROOT, 'fs-test-moved'), ignore_errors=True)
+
+def test_cp_of_relative_link_cannot_escape_through_cache(admin_dispatcher):
+    base = os.path.join(JAIL_ROOT, 'esc')
+    os.makedirs(os.path.join(base, 'a', 'b', 'c'), exist_ok=True)
+    try:
+        # Inside the jail where it is; points at the repo's README.md once copied to esc/y.
+        os.symlink('../../../../README.md', os.path.join(base, 'a', 'b', 'c', 'link'))
+        dispatcher = admin_dispatcher()
+        assert not dispatcher.dispatch('SIZE esc/y/link').startswith('213')  # resolved while missing
+        assert dispatcher.dispatch('CP esc/a/b/c esc/y') == 'file copied\n'
+        assert os.path.realpath(os.path.join(base, 'y', 'link')) == os.path.abspath('README.md')
+        assert 'Access denied' in dispatcher.dispatch('CAT esc/y/link')
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
@@ -0,0 +1,149 @@
+import os
+import time
+import pytest
+from ftpserver.utils.listing_cache import ListingCache, listing_cache
+
+JAIL_ROOT = os.path.abspath('server_files/users')
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    listing_cache.clear()
+    yield
+    listing_cache.clear()
+
+def test_cache_serves_until_directory_changes(tmp_path):
+    cache = ListingCache(max_entries=2)
+    calls = []
+    def render(path):
+        calls.append(path)
+        return ",".join(sorted(os.listdir(path)))
+    (tmp_path / 'a').write_text('x')
+    assert cache.get(str(tmp_path), 'LS', render) == 'a'
+    assert cache.get(str(tmp_path), 'LS', render) == 'a'
+    assert len(calls) == 1
+    time.sleep(0.01)
+    (tmp_path / 'b').write_text('x')
+    assert cache.get(str(tmp_path), 'LS', render) == 'a,b'
+    assert len(calls) == 2
+
+def test_cache_is_lru_bounded(tmp_path):
+    cache = ListingCache(max_entries=2)
+    for kind in ('LS', 'NLST', 'LS-L'):
+        cache.get(str(tmp_path), kind, lambda p: kind)
+    assert len(cache._entries) == 2
+    assert (str(tmp_path), 'LS') not in cache._entries
+
+def test_invalidate_parent_and_subtree():
+    cache = ListingCache()
+    for path in ('/j', '/j/d', '/j/d/sub', '/j/dx'):
+        cache._entries[(path, 'LS')] = (None, path)
+    cache.invalidate('/j/d/file.txt')
+    assert ('/j/d', 'LS') not in cache._entries
+    cache.invalidate('/j/d', recursive=True)
+    assert sorted(k[0] for k in cache._entries) == ['/j/dx']
+
+def test_invalidation_in_another_worker_drops_the_cache(tmp_path):
+    cache = ListingCache()
+    cache.share_across_processes()
+    assert cache.get(str(tmp_path), 'LS-L', lambda p: 'old') == 'old'
+    assert cache.get(str(tmp_path), 'LS-L', lambda p: 'new') == 'old'
+    pid = os.fork()
+    if pid == 0:
+        try:
+            cache.invalidate(str(tmp_path / 'f.txt'))
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    assert cache.get(str(tmp_path), 'LS-L', lambda p: 'new') == 'new'
+
+def test_mutating_commands_invalidate_listing(jail_file, admin_dispatcher):
+    jail_file('listed.txt', b'1')
+    dispatcher = admin_dispatcher()
+    assert 'listed.txt' in dispatcher.dispatch('LS-L')
+    with open(os.path.join(JAIL_ROOT, 'listed.txt'), 'wb') as f:
+        f.write(b'12345')
+    dispatcher.dispatch('ECHO "1234567" > listed.txt')
+    line = [l for l in dispatcher.dispatch('LS-L').splitlines() if l.endswith('listed.txt')][0]
+    assert ' 7 ' in line
+    dispatcher.dispatch('RM listed.txt')
+    assert 'listed.txt' not in dispatcher.dispatch('LS')
+
+def test_ls_l_streams_over_data_channel(jail_file, admin_dispatcher, retrieve):
+    for i in range(50):
+        jail_file(f'stream-{i:02d}.txt', b'x' * i)
+    dispatcher = admin_dispatcher()
+    reply, data = retrieve(dispatcher, 'LS-L')
+    assert reply == 'listing sent\n'
+    lines = data.decode().splitlines()
+    names = sorted(l.split()[-1] for l in lines if 'stream-' in l)
+    assert names == [f'stream-{i:02d}.txt' for i in range(50)]
+    assert data.decode() == dispatcher.dispatch('LS-L')
+    reply, cached = retrieve(dispatcher, 'LS-L')
+    assert cached == data
+
+def test_send_lines_chunks_output(recv_all):
+    import socket
+    import threading
+    from ftpserver.utils.transfer import send_lines
+    a, b = socket.socketpair()
+    result = {}
+    reader = threading.Thread(target=lambda: result.update(data=recv_all(b)))
+    reader.start()
+    with a:
+        sent = send_lines(a, (f'line {i}' for i in range(10000)), buffer_size=1024)
+    reader.join(5)
+    b.close()
+    received = result['data']
+    assert sent == len(received)
+    assert received.decode().splitlines() == [f'line {i}' for i in range(10000)]
+
+def test_mlsd_and_mlst_facts(jail_file, admin_dispatcher, retrieve):
+    path = jail_file('facts.bin', b'x' * 42)
+    os.utime(path, (0, 86400 + 3661))
+    os.makedirs(os.path.join(JAIL_ROOT, 'factsdir'), exist_ok=True)
+    dispatcher = admin_dispatcher()
+    try:
+        reply, data = retrieve(dispatcher, 'MLSD')
+        assert reply == 'listing sent\n'
+        entries = {}
+        for line in data.decode().splitlines():
+            facts, name = line.split(' ', 1)
+            entries[name] = dict(f.split('=', 1) for f in facts.rstrip(';').split(';'))
+        assert entries['facts.bin']['type'] == 'file'
+        assert entries['facts.bin']['size'] == '42'
+        assert entries['facts.bin']['modify'] == '19700102010101'
+        assert 'r' in entries['facts.bin']['perm']
+        assert entries['factsdir']['type'] == 'dir'
+        st = os.stat(path)
+        assert entries['facts.bin']['unique'] == f'{st.st_dev:x}g{st.st_ino:x}'
+        reply = dispatcher.dispatch('MLST facts.bin')
+        assert reply.startswith('250-Listing facts.bin\r\n type=file;size=42;modify=19700102010101;')
+        assert reply.endswith(' facts.bin\r\n250 End\r\n')
+        assert dispatcher.dispatch('MLST nothere').startswith('550')
+    finally:
+        os.rmdir(os.path.join(JAIL_ROOT, 'factsdir'))
+
+def test_hash_and_tree_manifest(jail_file, admin_dispatcher, retrieve):
+    import hashlib
+    import zlib
+    from ftpserver.utils.hashing import file_hasher
+    jail_file('tree-a.txt', b'alpha')
+    os.makedirs(os.path.join(JAIL_ROOT, 'treedir', 'sub'), exist_ok=True)
+    nested = os.path.join(JAIL_ROOT, 'treedir', 'sub', 'b.txt')
+    with open(nested, 'wb') as f:
+        f.write(b'bravo')
+    dispatcher = admin_dispatcher()
+    try:
+        digest = hashlib.sha256(b'alpha').hexdigest()
+        assert dispatcher.dispatch('HASH tree-a.txt') == f'213 SHA-256 0-5 {digest} tree-a.txt\r\n'
+        assert dispatcher.dispatch('HASH tree-a.txt crc32').split()[3] == f"{zlib.crc32(b'alpha'):08x}"
+        assert dispatcher.dispatch('HASH tree-a.txt md4').startswith('504')
+        assert dispatcher.dispatch('TREE treedir').startswith('425')
+        reply, data = retrieve(dispatcher, 'TREE treedir sha1')
+        assert reply == 'manifest sent\n'
+        path, size, modify, sha1 = data.decode().strip().split('\t')
+        assert (path, size, sha1) == ('sub/b.txt', '5', hashlib.sha1(b'bravo').hexdigest())
+        assert file_hasher.cached(os.stat(nested), 'SHA-1') == sha1
+    finally:
+        import shutil
+        shutil.rmtree(os.path.join(JAIL_ROOT, 'treedir'))
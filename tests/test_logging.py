@@ -0,0 +1,61 @@
+import json
+import logging
+import queue
+import pytest
+from ftpserver.utils import logger as log
+from ftpserver.utils.metrics import registry
+from ftpserver.core.session import FTPSession
+from ftpserver.core.command_dispatcher import CommandDispatcher
+
+@pytest.fixture
+def audit_file(tmp_path):
+    path = tmp_path / 'audit.log'
+    log.configure(audit_path=str(path))
+    def records():
+        log.flush()
+        return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+    yield records
+    log.configure(audit_path=None)
+
+def test_transfers_and_commands_are_audited(audit_file, jail_file, admin_dispatcher, retrieve, store):
+    jail_file('audit.bin', b'x' * 1000)
+    dispatcher = admin_dispatcher()
+    assert retrieve(dispatcher, 'RETR audit.bin') == ('file sent\n', b'x' * 1000)
+    assert store(dispatcher, 'STOR audit.bin', b'y' * 10) == 'file stored\n'
+    dispatcher.dispatch('MKDIR audit.d')
+    dispatcher.dispatch('RMDIR audit.d')
+    anonymous = CommandDispatcher(FTPSession())
+    anonymous.dispatch('USER admin')
+    anonymous.dispatch('PASS not-the-password')
+    anonymous.dispatch('RM audit.bin')
+    retr, stor, mkdir, rmdir, login, denied = audit_file()
+    assert retr['event'] == 'transfer' and retr['command'] == 'RETR'
+    assert retr['user'] == 'admin' and retr['bytes'] == 1000 and retr['path'].endswith('audit.bin')
+    assert stor['command'] == 'STOR' and stor['bytes'] == 10 and stor['duration'] >= 0
+    assert mkdir['event'] == 'command' and mkdir['path'] == 'audit.d' and rmdir['command'] == 'RMDIR'
+    assert login['command'] == 'PASS' and login['result'] == 'pass: incorrect password'
+    assert 'not-the-password' not in json.dumps(login)
+    assert denied == {'time': denied['time'], 'event': 'denied', 'user': 'admin', 'command': 'RM'}
+
+def test_audit_off_writes_nothing(audit_file, admin_dispatcher):
+    log.configure(audit_path=None)
+    admin_dispatcher().dispatch('MKDIR')
+    assert audit_file() == []
+
+def test_full_queue_drops_and_counts():
+    handler = log.DroppingQueueHandler(queue.Queue(1))
+    record = logging.LogRecord('ftpserver', logging.INFO, __file__, 1, 'msg', None, None)
+    for _ in range(3):
+        handler.handle(record)
+    assert handler.dropped == 2 and handler.queue.qsize() == 1
+
+def test_drop_counter_is_exported(monkeypatch, admin_dispatcher):
+    monkeypatch.setattr(log.queue_handler, 'dropped', 7)
+    assert 'ftp_log_dropped_total 7\n' in registry.render()
+    assert 'ftp_log_dropped_total 7' in admin_dispatcher().dispatch('STATS')
+
+def test_disabled_debug_is_not_queued():
+    before = log.queue_handler.queue.qsize() + log.dropped_records()
+    assert not log.logger.isEnabledFor(logging.DEBUG)
+    log.logger.debug('not %s', 'formatted')
+    assert log.queue_handler.queue.qsize() + log.dropped_records() <= before
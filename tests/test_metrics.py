@@ -0,0 +1,52 @@
+import urllib.request
+from ftpserver.core.session import FTPSession
+from ftpserver.core.command_dispatcher import CommandDispatcher
+from ftpserver.utils import metrics
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    latency = registry.register(metrics.Histogram('t_seconds', 'test', buckets=(0.1, 1), labelnames=('command',)))
+    for value in (0.05, 0.5, 0.7, 5):
+        latency.observe(value, ('RETR',))
+    registry.register_stats('pool', lambda: {'leases': 3, 'in_use': 1, 'free': None}, counters=('leases',))
+    text = registry.render()
+    assert 't_seconds_bucket{command="RETR",le="0.1"} 1\n' in text
+    assert 't_seconds_bucket{command="RETR",le="1"} 3\n' in text
+    assert 't_seconds_bucket{command="RETR",le="+Inf"} 4\n' in text
+    assert 't_seconds_count{command="RETR"} 4\n' in text
+    assert '# TYPE ftp_pool_leases_total counter\nftp_pool_leases_total 3\n' in text
+    assert 'ftp_pool_in_use 1\n' in text and 'ftp_pool_free' not in text
+    assert latency.totals() == [(('RETR',), 4, 6.25)]
+
+def test_dispatch_and_transfers_are_measured(jail_file, admin_dispatcher, retrieve):
+    jail_file('metrics.bin', b'm' * 5000)
+    before = dict((labels, count) for labels, count, _ in metrics.command_latency.totals())
+    dispatcher = admin_dispatcher()
+    dispatcher.dispatch('PWD')
+    assert retrieve(dispatcher, 'RETR metrics.bin') == ('file sent\n', b'm' * 5000)
+    after = dict((labels, count) for labels, count, _ in metrics.command_latency.totals())
+    assert after[('PWD',)] == before.get(('PWD',), 0) + 1
+    assert after[('RETR',)] == before.get(('RETR',), 0) + 1
+    stats = dispatcher.dispatch('STATS')
+    assert stats.endswith('End of STATS\r\n')
+    assert 'ftp_command_duration_seconds{command="RETR"} count=' in stats
+    assert 'ftp_data_connection_wait_seconds{mode="passive"} count=' in stats
+    assert 'ftp_transfer_bytes_total{command="RETR"}' in stats and 'ftp_pasv_in_use' in stats
+
+def test_stats_is_admin_only():
+    session = FTPSession()
+    session.logged_in = True
+    session.role = 'user'
+    session.permissions = frozenset({'STATS'})
+    assert CommandDispatcher(session).dispatch('STATS') == 'permission denied\n'
+
+def test_metrics_endpoint_serves_registry():
+    server = metrics.MetricsServer(port=0).start()
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.port}/metrics', timeout=5) as response:
+            assert response.headers['Content-Type'] == metrics.CONTENT_TYPE
+            body = response.read().decode()
+        assert '# TYPE ftp_command_duration_seconds histogram' in body
+        assert 'ftp_threads ' in body
+    finally:
+        server.stop()
@@ -0,0 +1,78 @@
+import os
+import pstats
+import time
+from ftpserver.core.session import FTPSession
+from ftpserver.core.command_dispatcher import CommandDispatcher
+
+def user_dispatcher(name):
+    session = FTPSession()
+    session.username = name
+    session.logged_in = True
+    session.role = 'user'
+    session.permissions = frozenset({'PWD', 'NOOP', 'LS'})
+    return CommandDispatcher(session)
+
+def written_path(reply):
+    assert reply.startswith('profile written to ')
+    return reply[len('profile written to '):].strip()
+
+def test_profile_cprofile_by_user(admin_dispatcher):
+    admin = admin_dispatcher()
+    target, other = user_dispatcher('prof-a'), user_dispatcher('prof-b')
+    assert admin.dispatch('PROFILE prof-a on') == f'profiling session {target.session.id}\n'
+    assert 'dispatch' in vars(target) and 'dispatch' not in vars(other)
+    assert f'{target.session.id} prof-a profiling\r\n' in admin.dispatch('PROFILE')
+    assert admin.dispatch('PROFILE prof-a on') == 'profile: already profiling\n'
+    target.dispatch('PWD')
+    target.dispatch('LS')
+    path = written_path(admin.dispatch('PROFILE prof-a off'))
+    try:
+        assert path.endswith('.pstats') and 'dispatch' not in vars(target)
+        functions = {name for _, _, name in pstats.Stats(path).stats}
+        assert 'handle' in functions and 'dispatch' in functions
+    finally:
+        os.remove(path)
+    assert admin.dispatch('PROFILE prof-a off') == 'profile: not profiling\n'
+
+def test_profile_sampling_by_session_id(admin_dispatcher):
+    admin = admin_dispatcher()
+    target = user_dispatcher('prof-c')
+    sid = target.session.id
+    assert admin.dispatch(f'PROFILE {sid} on sample') == f'profiling session {sid}\n'
+    deadline = time.monotonic() + 0.2
+    while time.monotonic() < deadline:
+        target.dispatch('LS')
+    path = written_path(admin.dispatch(f'PROFILE {sid} off'))
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+        assert path.endswith('.collapsed') and lines
+        assert any('command_dispatcher.py:dispatch;' in line for line in lines)
+        assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    finally:
+        os.remove(path)
+
+def test_profile_requires_admin_and_known_session(admin_dispatcher):
+    admin = admin_dispatcher()
+    assert admin.dispatch('PROFILE nobody-here on') == 'profile: no such session\n'
+    assert admin.dispatch('PROFILE x on perf').startswith('profile: usage')
+    assert user_dispatcher('prof-d').dispatch('PROFILE prof-d on') == 'permission denied\n'
+
+def test_profile_of_unsafe_username_stays_in_profile_dir(admin_dispatcher, monkeypatch):
+    from ftpserver.commands import informational
+    from ftpserver.utils.profiling import PROFILE_DIR
+    admin = admin_dispatcher()
+    target = user_dispatcher('../no/such dir')
+    sid = target.session.id
+    admin.dispatch(f'PROFILE {sid} on')
+    path = written_path(admin.dispatch(f'PROFILE {sid} off'))
+    try:
+        assert os.path.dirname(path) == PROFILE_DIR
+        assert f'session-{sid}-.._no_such_dir-' in os.path.basename(path)
+    finally:
+        os.remove(path)
+    def fail(dispatcher):
+        raise PermissionError(13, 'Permission denied')
+    monkeypatch.setattr(informational, 'stop_profiling', fail)
+    admin.dispatch(f'PROFILE {sid} on')
+    assert admin.dispatch(f'PROFILE {sid} off') == 'profile: [Errno 13] Permission denied\n'
@@ -0,0 +1,182 @@
+import socket
+import threading
+import time
+from ftpserver.core.server import FTPServer
+
+def test_asyncio_mode_serves_commands(start_server):
+    sock = start_server(mode='asyncio')
+    with sock:
+        assert sock.recv(1024).startswith(b'220')
+        sock.sendall(b'NOOP\r\n')
+        assert sock.recv(1024) == b'permission denied for NOOP\r\n'
+        sock.sendall(b'HELP\r\n')
+        data = b''
+        while b'End of HELP' not in data:
+            data += sock.recv(4096)
+        assert b'Available commands' in data
+
+def test_unknown_mode_rejected():
+    try:
+        FTPServer(mode='forking')
+    except ValueError as e:
+        assert 'forking' in str(e)
+    else:
+        assert False, "expected ValueError"
+
+def test_line_reader_framing():
+    from ftpserver.core.line_reader import LineReader, LineTooLong
+    reader = LineReader(max_length=16)
+    assert reader.feed(b'USER a\r\nPASS b\r\nPW') == ['USER a', 'PASS b']
+    assert reader.feed(b'D\r') == []
+    assert reader.feed(b'\nNOOP\n') == ['PWD', 'NOOP']
+    try:
+        reader.feed(b'X' * 17)
+    except LineTooLong:
+        pass
+    else:
+        assert False, "expected LineTooLong"
+
+def recv_until(sock, marker):
+    data = b''
+    while marker not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+def test_pipelined_commands_get_one_reply_each(start_server):
+    for mode in ('threaded', 'asyncio'):
+        sock = start_server(mode=mode)
+        with sock:
+            assert sock.recv(1024).startswith(b'220')
+            sock.sendall(b'NOOP\r\nNOOP\r\nHE')
+            time.sleep(0.05)
+            sock.sendall(b'LP\r\n')
+            data = recv_until(sock, b'End of HELP')
+            assert data.count(b'permission denied for NOOP') == 2
+            assert b'Available commands' in data
+            sock.sendall(b'X' * 10000 + b'\r\n')
+            assert recv_until(sock, b'\r\n').startswith(b'500')
+
+def test_striped_download_reassembles_file(tmp_path, start_server):
+    import os
+    from ftpserver.client.striped import striped_download, split_segments
+    assert split_segments(10, 3) == [(0, 4), (4, 3), (7, 3)]
+    jail = os.path.abspath('server_files/users')
+    os.makedirs(jail, exist_ok=True)
+    payload = os.urandom(1_000_003)
+    remote = os.path.join(jail, 'striped.bin')
+    with open(remote, 'wb') as f:
+        f.write(payload)
+    sock = start_server()
+    port = sock.getpeername()[1]
+    sock.close()
+    try:
+        local = tmp_path / 'striped.bin'
+        total = striped_download('127.0.0.1', port, 'admin', '123', 'striped.bin', str(local), streams=3)
+        assert total == len(payload)
+        assert local.read_bytes() == payload
+        with open(remote, 'wb'):
+            pass
+        assert striped_download('127.0.0.1', port, 'admin', '123', 'striped.bin', str(local), streams=3) == 0
+        assert local.read_bytes() == b''
+    finally:
+        os.remove(remote)
+
+def test_admission_limits_idle_timeout_and_stop(free_port):
+    from ftpserver.core.admission import AdmissionController
+    control = AdmissionController(max_sessions=3, max_per_ip=2)
+    assert control.admit('10.0.0.1') is None
+    assert control.admit('10.0.0.1') is None
+    assert control.admit('10.0.0.1').startswith(b'421')
+    assert control.admit('10.0.0.2') is None
+    assert control.admit('10.0.0.3').startswith(b'421 Too many connections,')
+    control.release('10.0.0.1')
+    assert control.admit('10.0.0.3') is None
+    assert control.stats()['active'] == 3
+
+    for mode in ('threaded', 'asyncio'):
+        port = free_port()
+        server = FTPServer(host='127.0.0.1', port=port, mode=mode, max_per_ip=2, idle_timeout=0.5)
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        deadline = time.time() + 5
+        while True:
+            try:
+                first = socket.create_connection(('127.0.0.1', port), timeout=5)
+                break
+            except OSError:
+                assert time.time() < deadline
+                time.sleep(0.05)
+        second = socket.create_connection(('127.0.0.1', port), timeout=5)
+        third = socket.create_connection(('127.0.0.1', port), timeout=5)
+        with first, second, third:
+            assert first.recv(1024).startswith(b'220')
+            assert second.recv(1024).startswith(b'220')
+            assert third.recv(1024) == b'421 Too many connections from your address\r\n'
+            # Both admitted sessions time out while idle, which frees their slots.
+            assert recv_until(first, b'\r\n') == b'421 Idle timeout, closing control connection\r\n'
+            assert recv_until(second, b'\r\n').startswith(b'421 Idle')
+        deadline = time.time() + 5
+        while server.admission.stats()['active'] and time.time() < deadline:
+            time.sleep(0.05)
+        assert server.admission.stats()['active'] == 0
+        server.stop()
+        thread.join(5)
+        assert not thread.is_alive()
+
+def _children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return set(map(int, f.read().split()))
+
+def test_prefork_supervisor_restarts_and_drains_workers(free_port):
+    import os
+    import signal
+    import subprocess
+    import sys
+    port = free_port()
+    code = "import sys; from ftpserver.core.server import main; main(sys.argv[1:])"
+    proc = subprocess.Popen([sys.executable, '-c', code, '--host', '127.0.0.1', '--port', str(port),
+                             '--processes', '2'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 10
+        while len(_children(proc.pid)) < 2:
+            assert time.time() < deadline
+            time.sleep(0.05)
+        workers = _children(proc.pid)
+        victim = workers.pop()
+        os.kill(victim, signal.SIGKILL)
+        while True:
+            current = _children(proc.pid)
+            if len(current) == 2 and victim not in current:
+                break
+            assert time.time() < deadline + 5
+            time.sleep(0.05)
+        for _ in range(4):
+            while True:
+                try:
+                    sock = socket.create_connection(('127.0.0.1', port), timeout=5)
+                    break
+                except OSError:
+                    assert time.time() < deadline + 5
+                    time.sleep(0.05)
+            with sock:
+                assert sock.recv(1024).startswith(b'220')
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(timeout=10) == 0
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+
+def test_shared_bucket_is_charged_across_processes():
+    import os
+    from ftpserver.utils.throttle import SharedBucketTable
+    table = SharedBucketTable(slots=8)
+    bucket = table.bucket('user:bob', 1000)
+    pid = os.fork()
+    if pid == 0:
+        table.bucket('user:bob', 1000).reserve(5000)
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert bucket.reserve(1) > 3
@@ -0,0 +1,210 @@
+import io
+import os
+import socket
+import threading
+import time
+import zlib
+import pytest
+from ftpserver.utils import transfer
+
+JAIL_ROOT = os.path.abspath('server_files/users')
+
+def test_send_file_buffered_and_sendfile_paths(recv_all):
+    payload = os.urandom(100_000)
+    a, b = socket.socketpair()
+    with a, b:
+        sent = transfer.send_file(a, io.BytesIO(payload), offset=10, count=50_000, buffer_size=4096)
+        a.shutdown(socket.SHUT_WR)
+        assert sent == 50_000
+        assert recv_all(b) == payload[10:50_010]
+
+def test_retr_streams_file(jail_file, admin_dispatcher, retrieve):
+    payload = os.urandom(3 * transfer.TRANSFER_BUFFER_SIZE + 17)
+    jail_file('retr.bin', payload)
+    reply, data = retrieve(admin_dispatcher(), 'RETR retr.bin')
+    assert reply == 'file sent\n'
+    assert data == payload
+
+def test_stor_with_allo_is_atomic_and_trimmed(jail_file, admin_dispatcher, store):
+    path = jail_file('stor.bin', b'old contents')
+    payload = os.urandom(2 * transfer.RECEIVE_BUFFER_SIZE + 5)
+    dispatcher = admin_dispatcher()
+    assert dispatcher.dispatch(f'ALLO {len(payload) * 2}').startswith('200')
+    assert store(dispatcher, 'STOR stor.bin', payload) == 'file stored\n'
+    assert dispatcher.session.allocate_size is None
+    with open(path, 'rb') as f:
+        assert f.read() == payload
+    assert not [n for n in os.listdir(JAIL_ROOT) if n.endswith('.part')]
+    assert dispatcher.dispatch('ALLO 99999999999999').startswith('552')
+    assert dispatcher.dispatch(f'ALLO {transfer.free_space(JAIL_ROOT) + 1}').startswith('552')
+    assert dispatcher.session.allocate_size is None
+
+def test_atomic_upload_discards_on_error(jail_file):
+    path = jail_file('keep.bin', b'original')
+    with pytest.raises(RuntimeError):
+        with transfer.atomic_upload(path) as f:
+            f.write(b'partial')
+            raise RuntimeError("connection lost")
+    with open(path, 'rb') as f:
+        assert f.read() == b'original'
+    assert os.listdir(JAIL_ROOT).count('keep.bin') == 1
+    assert not [n for n in os.listdir(JAIL_ROOT) if n.endswith('.part')]
+
+def test_atomic_upload_honours_umask(jail_file):
+    path = jail_file('umask.bin', b'')
+    old = os.umask(0o027)
+    try:
+        with transfer.atomic_upload(path) as f:
+            f.write(b'data')
+    finally:
+        os.umask(old)
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+def test_rest_resumes_retr_and_stor(jail_file, admin_dispatcher, retrieve, store):
+    payload = os.urandom(50_000)
+    path = jail_file('resume.bin', payload[:20_000] + b'garbage')
+    dispatcher = admin_dispatcher()
+    assert dispatcher.dispatch('REST 20000').startswith('350')
+    assert store(dispatcher, 'STOR resume.bin', payload[20_000:]) == 'file stored\n'
+    with open(path, 'rb') as f:
+        assert f.read() == payload
+    assert dispatcher.dispatch('SIZE resume.bin') == '213 50000\r\n'
+    assert dispatcher.dispatch('REST 49000').startswith('350')
+    reply, data = retrieve(dispatcher, 'RETR resume.bin')
+    assert reply == 'file sent\n'
+    assert data == payload[49_000:]
+    assert dispatcher.session.rest_offset == 0
+
+def test_retr_range_with_nothing_to_send(jail_file, admin_dispatcher, retrieve):
+    jail_file('empty.bin', b'')
+    jail_file('range.bin', b'0123456789')
+    dispatcher = admin_dispatcher()
+    for command in ('RETR-RANGE empty.bin 0 0', 'RETR-RANGE empty.bin 0 100',
+                    'RETR-RANGE range.bin 10 5', 'RETR-RANGE range.bin 1 0'):
+        assert retrieve(dispatcher, command) == ('file sent\n', b'')
+    assert retrieve(dispatcher, 'RETR-RANGE range.bin 8 5') == ('file sent\n', b'89')
+    a, b = socket.socketpair()
+    with a, b:
+        with open(os.path.join(JAIL_ROOT, 'range.bin'), 'rb') as f:
+            assert transfer.send_file(a, f, offset=3, count=0) == 0
+
+def test_size_and_mdtm(jail_file, admin_dispatcher):
+    path = jail_file('meta.bin', b'12345')
+    os.utime(path, (0, 86400 + 3661))
+    dispatcher = admin_dispatcher()
+    assert dispatcher.dispatch('SIZE meta.bin') == '213 5\r\n'
+    assert dispatcher.dispatch('MDTM meta.bin') == '213 19700102010101\r\n'
+    assert dispatcher.dispatch('SIZE missing.bin').startswith('550')
+    assert dispatcher.dispatch('REST abc').startswith('501')
+
+def test_passive_pool_reuses_listeners_and_reclaims():
+    from ftpserver.core.passive_ports import PassivePortPool, PoolExhausted
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    pool = PassivePortPool((port, port), host='127.0.0.1', lease_timeout=60, wait_timeout=0)
+    try:
+        lease = pool.acquire()
+        listener = lease.sock
+        with pytest.raises(PoolExhausted):
+            pool.acquire()
+        lease.release()
+        lease2 = pool.acquire()
+        assert lease2.sock is listener
+        pool.lease_timeout = 0
+        lease3 = pool.acquire()
+        assert lease2.released and not lease3.released
+        with pytest.raises(ConnectionError):
+            lease2.accept()
+        stats = pool.stats()
+        assert stats['exhausted'] == 1 and stats['reclaimed'] == 1 and stats['in_use'] == 1
+    finally:
+        pool.close()
+
+def test_passive_accept_timeout():
+    from ftpserver.core.passive_ports import PassivePortPool
+    pool = PassivePortPool(accept_timeout=0.05)
+    lease = pool.acquire()
+    with pytest.raises(TimeoutError):
+        lease.accept()
+    lease.release()
+    assert pool.stats()['in_use'] == 0
+
+def test_mode_z_compresses_retr_and_inflates_stor(jail_file, admin_dispatcher, retrieve, store):
+    text = b"2026-10-18 10:00:00 INFO request served in 3ms\n" * 20000
+    jail_file('app.log', text)
+    jail_file('app.log.gz', text)
+    dispatcher = admin_dispatcher()
+    assert dispatcher.dispatch('MODE Z') == '200 Mode set to Z\r\n'
+    assert dispatcher.dispatch('OPTS MODE Z LEVEL 10').startswith('501')
+    assert dispatcher.dispatch('OPTS MODE Z LEVEL 9') == '200 MODE Z LEVEL set to 9\r\n'
+
+    reply, data = retrieve(dispatcher, 'RETR app.log')
+    assert reply == 'file sent\n'
+    assert len(data) < len(text) // 50
+    assert zlib.decompress(data) == text
+    # Already-compressed extensions go out as stored deflate blocks.
+    reply, data = retrieve(dispatcher, 'RETR app.log.gz')
+    assert len(data) > len(text)
+    assert zlib.decompress(data) == text
+
+    path = jail_file('upload.log', b'')
+    assert store(dispatcher, 'STOR upload.log', zlib.compress(text)) == 'file stored\n'
+    with open(path, 'rb') as f:
+        assert f.read() == text
+    assert store(dispatcher, 'STOR upload.log', zlib.compress(b'new')[:-3]).startswith('stor: ')
+    with open(path, 'rb') as f:
+        assert f.read() == text
+
+    assert dispatcher.dispatch('MODE S') == '200 Mode set to S\r\n'
+    assert dispatcher.dispatch('MODE B').startswith('504')
+    assert retrieve(dispatcher, 'RETR app.log')[1] == text
+
+def test_line_ending_translator_handles_cr_split_across_chunks():
+    out = transfer.LineEndingTranslator(outbound=True)
+    data = b"a\nb\r\nc\rd\n"
+    converted = b"".join(out.convert(data[i:i + 1]) for i in range(len(data))) + out.flush()
+    assert converted == b"a\r\nb\r\nc\rd\r\n"
+    back = transfer.LineEndingTranslator(outbound=False)
+    chunks = [converted[:4], converted[4:5], converted[5:]]
+    assert b"".join(back.convert(c) for c in chunks) + back.flush() == b"a\nb\nc\rd\n"
+
+def test_type_a_converts_line_endings(jail_file, admin_dispatcher, retrieve, store):
+    text = b"line one\nline two\r\n" * 50000 + b"last\r"
+    jail_file('notes.txt', text)
+    dispatcher = admin_dispatcher()
+    assert retrieve(dispatcher, 'RETR notes.txt')[1] == text
+    assert dispatcher.dispatch('TYPE A') == '200 Type set to A\r\n'
+    wire = b"line one\r\nline two\r\n" * 50000 + b"last\r"
+    assert retrieve(dispatcher, 'RETR notes.txt')[1] == wire
+    path = jail_file('upload.txt', b'')
+    assert store(dispatcher, 'STOR upload.txt', wire) == 'file stored\n'
+    with open(path, 'rb') as f:
+        assert f.read() == b"line one\nline two\n" * 50000 + b"last\r"
+    dispatcher.dispatch('MODE Z')
+    assert zlib.decompress(retrieve(dispatcher, 'RETR notes.txt')[1]) == wire
+    assert store(dispatcher, 'STOR upload.txt', zlib.compress(b"x\r\ny\r\n")) == 'file stored\n'
+    with open(path, 'rb') as f:
+        assert f.read() == b"x\ny\n"
+    assert dispatcher.dispatch('TYPE E').startswith('504')
+    assert dispatcher.dispatch('TYPE L 8') == '200 Type set to I\r\n'
+
+def test_throttled_send_file_respects_rate(jail_file, recv_all):
+    from ftpserver.utils.throttle import TokenBucket, Throttle, BURST_SECONDS
+    rate = 4 * 1024 * 1024
+    payload = os.urandom(rate * 2)
+    path = jail_file('throttled.bin', payload)
+    a, b = socket.socketpair()
+    result = {}
+    reader = threading.Thread(target=lambda: result.setdefault('data', recv_all(b)))
+    reader.start()
+    start = time.monotonic()
+    with open(path, 'rb') as f, a:
+        transfer.send_file(a, f, throttle=Throttle([TokenBucket(rate)]), buffer_size=256 * 1024)
+    elapsed = time.monotonic() - start
+    reader.join(5)
+    b.close()
+    assert result['data'] == payload
+    # The first second's worth is burst; the rest is paced at `rate`.
+    assert elapsed >= (len(payload) - rate * BURST_SECONDS) / rate * 0.9